@@ -0,0 +1,86 @@
+"""
+Instrumentos da triagem
+Definição declarativa das perguntas; compilada uma vez por src/questionario.py
+
+Cada instrumento é uma etapa do fluxo (valor de EtapaTriagem):
+- campo: atributo de AvaliacaoSintomas que recebe a resposta
+- limite_critico: resposta >= limite ativa o protocolo urgente (sim = 1)
+- limite_gravidade: resposta >= limite torna a triagem concluída URGENTE
+  (padrão: limite_critico)
+- contador: atributo da sessão com o índice da pergunta atual
+- proxima_etapa: etapa seguinte ao concluir (None = finalizar a triagem)
+"""
+
+INSTRUMENTOS = (
+    {
+        "etapa": "motivos_busca",
+        "rotulo": "MOTIVO",
+        "contador": "pergunta_motivo_atual",
+        "resposta": {
+            "tipo": "sim_nao",
+            "sim": ("sim", "s", "yes", "y", "1"),
+            "nao": ("não", "nao", "n", "no", "0"),
+        },
+        "cabecalho": (
+            "📋 **MOTIVOS DA BUSCA**\n"
+            "\n"
+            "Vou fazer {total} perguntas sobre o que te trouxe aqui.\n"
+            "Responda apenas **SIM** ou **NÃO** para cada uma."
+        ),
+        "instrucao": "*Responda: SIM ou NÃO*",
+        # None: repetir cabeçalho e pergunta atual
+        "resposta_invalida": None,
+        "proxima_etapa": "sintomas_escala",
+        "perguntas": (
+            {"campo": "ansiedade_excessiva", "texto": "Você tem sentido ansiedade excessiva?"},
+            {"campo": "tristeza_constante", "texto": "Você tem sentido tristeza constante?"},
+            {"campo": "pensamentos_suicidas", "texto": "⚠️ Você tem tido pensamentos suicidas?", "limite_critico": 1},
+            {"campo": "agressividade", "texto": "Você tem sentido agressividade?"},
+            {"campo": "crises_panico", "texto": "Você tem tido crises de pânico?"},
+            {"campo": "uso_substancias", "texto": "Você tem feito uso de substâncias (álcool/drogas)?"},
+            {"campo": "alucinacoes_delirios", "texto": "⚠️ Você tem tido alucinações ou delírios?", "limite_critico": 1},
+            {"campo": "problemas_sono", "texto": "Você tem problemas de sono?"},
+            {"campo": "problemas_alimentares", "texto": "Você tem problemas alimentares?"},
+            {"campo": "luto_recente", "texto": "Você passou por um luto recente?"},
+            {"campo": "violencia_domestica", "texto": "⚠️ Você sofreu violência doméstica?", "limite_critico": 1},
+            {"campo": "dificuldade_relacionamentos", "texto": "Você tem dificuldades nos relacionamentos?"},
+        ),
+    },
+    {
+        "etapa": "sintomas_escala",
+        "rotulo": "SINTOMA",
+        "contador": "pergunta_sintoma_atual",
+        "resposta": {
+            "tipo": "escala",
+            "minimo": 0,
+            "maximo": 4,
+        },
+        "cabecalho": (
+            "📊 **ESCALA DE SINTOMAS**\n"
+            "\n"
+            "Agora vou avaliar a intensidade dos seus sintomas.\n"
+            "Para cada pergunta, responda de **0 a 4**:\n"
+            "\n"
+            "• **0** = Nada/Nunca\n"
+            "• **1** = Pouco/Raramente  \n"
+            "• **2** = Moderado/Às vezes\n"
+            "• **3** = Bastante/Frequentemente\n"
+            "• **4** = Muito/Sempre"
+        ),
+        "instrucao": "*Responda de 0 a 4*",
+        "resposta_invalida": "Por favor, responda apenas com um número de **0 a 4**.",
+        "proxima_etapa": None,
+        "perguntas": (
+            {"campo": "ansiedade", "texto": "Qual o nível da sua ansiedade nas últimas 2 semanas?"},
+            {"campo": "tristeza", "texto": "Qual o nível da sua tristeza/depressão?"},
+            {"campo": "irritabilidade", "texto": "Qual o nível da sua irritabilidade?"},
+            {"campo": "insonia", "texto": "Qual o nível dos seus problemas de sono?"},
+            {"campo": "ideacao_suicida", "texto": "⚠️ Qual a intensidade de pensamentos sobre morte/suicídio?", "limite_critico": 3},
+            {"campo": "tentativa_suicidio", "texto": "⚠️ Já tentou se machucar ou se matar? (0=nunca, 4=recentemente)", "limite_critico": 3, "limite_gravidade": 1},
+            {"campo": "alucinacoes", "texto": "⚠️ Qual a frequência de ver/ouvir coisas que outros não veem?", "limite_critico": 3},
+            {"campo": "choro", "texto": "Qual a frequência de episódios de choro?"},
+            {"campo": "isolamento", "texto": "Qual o nível do seu isolamento social?"},
+            {"campo": "abuso_substancias", "texto": "Qual o nível do uso de álcool/drogas?"},
+        ),
+    },
+)
@@ -0,0 +1,34 @@
+"""
+Configuração do gunicorn para main_render.py
+Lida automaticamente por `gunicorn main_render:app` (e por SERVIDOR=gunicorn);
+perfil de ajuste no README
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '7860')}"
+
+# Processos: um request lento (ou preso no GIL) só ocupa o seu worker
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+
+# Threads por worker: atendem o SSE de /chat/stream e esperas de E/S sem
+# ocupar um processo inteiro
+threads = int(os.environ.get("WEB_THREADS", 4))
+worker_class = "gthread" if threads > 1 else "sync"
+
+# Carregar o app no master antes do fork: as páginas e respostas montadas na
+# inicialização são compartilhadas (copy-on-write) entre os workers. Com
+# preload, `kill -HUP` recicla os workers mas não relê o código
+preload_app = os.environ.get("WEB_PRELOAD", "True").lower() == "true"
+
+# Reinício gracioso: quem está no meio de uma resposta tem graceful_timeout
+# para terminar; workers são reciclados aos poucos contra vazamento de memória
+timeout = int(os.environ.get("WEB_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("WEB_KEEPALIVE", 5))
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get("WEB_ACCESSLOG") or None
+errorlog = "-"
@@ -16,6 +16,8 @@ sys.path.append(str(Path(__file__).parent.parent / "src"))
 from dotenv import load_dotenv
 load_dotenv()
 
+from intencoes import RoteadorIntencoes
+
 # Tentar importar chatbot real
 try:
     from chatbot import LlamaTriagemBot
@@ -77,11 +79,20 @@ custom_css = """
 }
 """
 
+# Intenções das respostas demo, da maior para a menor prioridade; "*" marca
+# radical ("morre*" também casa "morreria")
+INTENCOES_DEMO = (
+    ("emergencia", ("suicid*", "matar*", "morre*")),
+    ("dificuldades", ("triste*", "depress*", "ansiedade*")),
+    ("saudacao", ("olá",)),
+)
+
 class GradioInterfaceReal:
     """Interface Gradio com chatbot real"""
     
     def __init__(self):
         print("🚀 Inicializando interface com LLaMA...")
+        self.intencoes = RoteadorIntencoes(INTENCOES_DEMO)
         
         if CHATBOT_REAL_DISPONIVEL:
             # Usar chatbot real
@@ -102,39 +113,41 @@ class GradioInterfaceReal:
             
         print(f"🤖 Modo: {self.modo}")
         
-    def process_message(self, message, history, user_id):
-        """Processar mensagem - REAL ou DEMO"""
+    async def process_message(self, message, history, user_id):
+        """Processar mensagem - REAL ou DEMO (gerador assíncrono: a resposta aparece em streaming)"""
         if not message.strip():
-            return history, ""
+            yield history, ""
+            return
         
-        # Adicionar mensagem do usuário (formato messages)
+        # Adicionar mensagem do usuário e resposta vazia (formato messages)
         history.append({"role": "user", "content": message})
+        history.append({"role": "assistant", "content": ""})
+        yield history, ""
         
         try:
             if self.modo == "REAL" and self.chatbot:
-                # Usar chatbot REAL com LLaMA
-                response = self.chatbot.processar_mensagem(message, user_id)
+                # Usar chatbot REAL com LLaMA, token a token
+                async for pedaco in self.chatbot.aprocessar_mensagem_stream(message, user_id):
+                    history[-1]["content"] += pedaco
+                    yield history, ""
                 print(f"🤖 Resposta LLaMA gerada para: {message[:30]}...")
             else:
                 # Fallback para modo demo
-                response = self.demo_response(message)
+                history[-1]["content"] = self.demo_response(message)
                 print(f"🎭 Resposta demo gerada para: {message[:30]}...")
             
-            # Adicionar resposta do bot (formato messages)
-            history.append({"role": "assistant", "content": response})
-            
         except Exception as e:
             print(f"❌ Erro no processamento: {e}")
             error_response = f"❌ Erro no processamento: {str(e)}\n\nTentando novamente..."
-            history.append({"role": "assistant", "content": error_response})
+            history[-1]["content"] = error_response
         
-        return history, ""
+        yield history, ""
     
     def demo_response(self, message):
         """Resposta demo aprimorada"""
-        message_lower = message.lower()
+        intencao = self.intencoes.classificar(message)
         
-        if any(word in message_lower for word in ['suicídio', 'matar', 'morrer']):
+        if intencao == "emergencia":
             return """🚨 **PROTOCOLO URGENTE ATIVADO** 🚨
 
 ✅ Dr. José seria notificado IMEDIATAMENTE
@@ -145,7 +158,7 @@ class GradioInterfaceReal:
 
 *Modo demonstração - em caso real, protocolos seriam ativados automaticamente.*"""
         
-        elif any(word in message_lower for word in ['triste', 'depressão', 'ansiedade']):
+        elif intencao == "dificuldades":
             return """Entendo que você está enfrentando dificuldades emocionais.
 
 **Para uma triagem completa, o sistema real:**
@@ -161,7 +174,7 @@ class GradioInterfaceReal:
 
 *Configure LLaMA para funcionalidade completa!*"""
         
-        elif 'olá' in message_lower:
+        elif intencao == "saudacao":
             return f"""🏥 **Olá! Sistema de Triagem Psicológica**
 
 **Status atual:** {self.modo}
@@ -191,12 +204,16 @@ Continue me contando mais sobre como você está se sentindo."""
         now = datetime.now()
         
         if self.modo == "REAL":
+            sessoes = self.chatbot.metricas_sessoes()
+            status = self.chatbot.status()
             stats = f"""📊 **Estatísticas do Sistema Real** 
 *Atualizado: {now.strftime('%H:%M')}*
 
-🤖 **Status LLaMA:** Ativo
+🤖 **Status LLaMA:** {status['estado_modelo'].capitalize()}
 📋 **Protocolos:** Implementados
 💾 **Banco de dados:** Funcionando
+👥 **Sessões ativas:** {sessoes['sessoes_ativas']} (~{sessoes['bytes_por_sessao']} bytes/sessão)
+♻️ **Cache de respostas:** {status['cache_respostas']['taxa_acerto']:.0%} de acertos ({status['cache_respostas']['itens']} itens)
 
 **Triagens hoje:** Em tempo real
 **Modelo:** {os.getenv('MODEL_NAME', 'Não configurado')}
@@ -219,9 +236,11 @@ Continue me contando mais sobre como você está se sentindo."""
     def get_system_info(self):
         """Informações do sistema"""
         if self.modo == "REAL":
-            return """🤖 **SISTEMA REAL ATIVO**
+            modelo = "✅ Modelo de IA pronto" if self.chatbot.status()["modelo_pronto"] else "⏳ Modelo de IA carregando em segundo plano"
+            return f"""🤖 **SISTEMA REAL ATIVO**
 
 ✅ Chatbot CURAI carregado
+{modelo}
 ✅ Protocolos médicos ativos
 ✅ Banco de dados conectado
 ✅ Detecção de emergência ativa
@@ -4,10 +4,24 @@ Sistema de Triagem Psicológica - VERSÃO FLASK SIMPLES
 """
 
 import os
-from flask import Flask, render_template_string, request, jsonify
+import gzip
+import hashlib
+import json
+import importlib.util
+import runpy
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from flask import Flask, Response, request, jsonify, stream_with_context
 from datetime import datetime
 from dotenv import load_dotenv
 
+# Adicionar src ao path
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from intencoes import RoteadorIntencoes
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -15,7 +29,27 @@ load_dotenv()
 PORT = int(os.environ.get("PORT", 7860))
 HOST = "0.0.0.0"
 
-app = Flask(__name__)
+# Servidor de __main__: flask (desenvolvimento), gunicorn (produção, Linux)
+# ou waitress (produção, Windows). Ajustes em gunicorn.conf.py / README
+SERVIDOR = os.environ.get("SERVIDOR", "flask").lower()
+
+# Pacote brotli habilita a variante .br (senão só gzip)
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+
+# CSS/JS da página (servidos com nome versionado pelo conteúdo)
+STATIC_DIR = Path(__file__).parent / "static"
+CACHE_PAGINA = "no-cache"                            # revalida com ETag
+CACHE_ATIVOS = "public, max-age=31536000, immutable"  # URL muda com o conteúdo
+
+# Intenções das respostas demo, da maior para a menor prioridade; "*" marca
+# radical ("morte*" também casa "mortes"), para não perder flexões de risco
+INTENCOES_DEMO = (
+    ("emergencia", ("suicid*", "matar*", "morte*", "morre*")),
+    ("dificuldades", ("triste*", "deprimid*", "ansiedade*", "angústia*", "preocupad*")),
+    ("saudacao", ("olá", "oi", "hello", "bom dia", "boa tarde", "boa noite")),
+    ("dor", ("dor", "doendo", "machuca", "sofrendo")),
+    ("agradecimento", ("obrigado", "obrigada", "valeu", "thanks")),
+)
 
 class TriagemRender:
     """Sistema simplificado para Render"""
@@ -30,13 +64,13 @@ class TriagemRender:
         print(f"🤖 Modo: {self.modo}")
         print(f"📱 Telegram: {'✅' if self.telegram_ativo else '❌'}")
         print(f"🤗 HuggingFace: {'✅' if self.hf_token else '❌'}")
-    
-    def demo_response(self, message):
-        """Resposta demo inteligente"""
-        message_lower = message.lower()
         
-        if any(word in message_lower for word in ['suicídio', 'suicidio', 'matar', 'morte', 'morrer']):
-            return """🚨 **PROTOCOLO DE EMERGÊNCIA ATIVADO** 🚨
+        self.intencoes = RoteadorIntencoes(INTENCOES_DEMO)
+        
+        # Respostas demo montadas uma vez: só dependem do modo e das
+        # integrações, que não mudam depois da inicialização
+        self.respostas_demo = {
+            "emergencia": """🚨 **PROTOCOLO DE EMERGÊNCIA ATIVADO** 🚨
 
 **IMPORTANTE:** Você não está sozinho!
 
@@ -50,10 +84,9 @@ class TriagemRender:
 • Protocolos de segurança ativados
 • Histórico seguro mantido
 
-*Esta é uma versão demonstrativa. Em emergências reais, sempre ligue 192.*"""
-        
-        elif any(word in message_lower for word in ['triste', 'deprimido', 'ansiedade', 'angústia', 'preocupado']):
-            return f"""💙 Entendo que você está passando por dificuldades.
+*Esta é uma versão demonstrativa. Em emergências reais, sempre ligue 192.*""",
+            
+            "dificuldades": f"""💙 Entendo que você está passando por dificuldades.
 
 **Sistema de Triagem - {self.modo}:**
 🤖 Análise de sentimentos ativa
@@ -65,10 +98,9 @@ class TriagemRender:
 • Me conte mais sobre seus sentimentos
 • Está acontecendo algo específico?
 
-*Sistema disponível 24/7 para apoio.*"""
-        
-        elif any(word in message_lower for word in ['olá', 'oi', 'hello', 'bom dia', 'boa tarde', 'boa noite']):
-            return f"""🏥 **Bem-vindo ao Sistema de Triagem Psicológica** 
+*Sistema disponível 24/7 para apoio.*""",
+            
+            "saudacao": f"""🏥 **Bem-vindo ao Sistema de Triagem Psicológica** 
 
 **Status do Sistema:** {self.modo} ☁️
 **Disponibilidade:** 24/7 Global
@@ -80,10 +112,9 @@ class TriagemRender:
 • Conte como está se sentindo hoje
 • Compartilhe suas preocupações
 
-*Este é um ambiente seguro e confidencial.*"""
-        
-        elif any(word in message_lower for word in ['dor', 'doendo', 'machuca', 'sofrendo']):
-            return """😔 Sinto muito que você esteja com dor.
+*Este é um ambiente seguro e confidencial.*""",
+            
+            "dor": """😔 Sinto muito que você esteja com dor.
 
 **Tipos de suporte disponível:**
 🧠 Emocional: Conversas de apoio
@@ -95,10 +126,9 @@ class TriagemRender:
 • É física ou emocional?
 • Há quanto tempo isso começou?
 
-Estou aqui para ouvir e ajudar."""
-        
-        elif any(word in message_lower for word in ['obrigado', 'obrigada', 'valeu', 'thanks']):
-            return """😊 Fico feliz em poder ajudar!
+Estou aqui para ouvir e ajudar.""",
+            
+            "agradecimento": """😊 Fico feliz em poder ajudar!
 
 **Lembre-se:**
 • Este sistema está sempre disponível
@@ -108,11 +138,10 @@ Estou aqui para ouvir e ajudar."""
 **Continue voltando sempre que precisar.**
 Este é seu espaço de apoio e cuidado.
 
-*Cuide-se! 💙*"""
-        
-        else:
-            truncated_msg = message[:50] + '...' if len(message) > 50 else message
-            return f"""**Processando sua mensagem:** "{truncated_msg}"
+*Cuide-se! 💙*""",
+            
+            # Prefixado com a mensagem do usuário em demo_response
+            "outros": f"""
 
 **Sistema:** {self.modo} ☁️
 **Análise:** Aguardando mais informações
@@ -123,10 +152,21 @@ Este é seu espaço de apoio e cuidado.
 • O que está te preocupando?
 • Em que posso ajudar hoje?
 
-*Seu bem-estar é nossa prioridade.*"""
-
-# Inicializar sistema
-triagem = TriagemRender()
+*Seu bem-estar é nossa prioridade.*""",
+        }
+    
+    def responder_stream(self, message):
+        """Resposta em pedaços (linha a linha) para o endpoint SSE"""
+        yield from self.demo_response(message).splitlines(keepends=True)
+    
+    def demo_response(self, message):
+        """Resposta demo inteligente"""
+        intencao = self.intencoes.classificar(message)
+        if intencao is not None:
+            return self.respostas_demo[intencao]
+        
+        truncated_msg = message[:50] + '...' if len(message) > 50 else message
+        return f'**Processando sua mensagem:** "{truncated_msg}"' + self.respostas_demo["outros"]
 
 # Template HTML
 HTML_TEMPLATE = """
@@ -136,121 +176,7 @@ HTML_TEMPLATE = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>🏥 Sistema de Triagem Psicológica</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body { 
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        .container { max-width: 1200px; margin: 0 auto; }
-        .header {
-            background: rgba(255,255,255,0.95);
-            padding: 2rem;
-            border-radius: 15px;
-            text-align: center;
-            margin-bottom: 2rem;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-        }
-        .main-content {
-            display: grid;
-            grid-template-columns: 2fr 1fr;
-            gap: 2rem;
-        }
-        .chat-container {
-            background: rgba(255,255,255,0.95);
-            border-radius: 15px;
-            padding: 2rem;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-        }
-        .status-panel {
-            background: rgba(255,255,255,0.95);
-            border-radius: 15px;
-            padding: 2rem;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-            height: fit-content;
-        }
-        .chat-messages {
-            height: 400px;
-            overflow-y: auto;
-            border: 2px solid #e9ecef;
-            border-radius: 10px;
-            padding: 1rem;
-            margin-bottom: 1rem;
-            background: #f8f9fa;
-        }
-        .message {
-            margin-bottom: 1rem;
-            padding: 1rem;
-            border-radius: 10px;
-        }
-        .user-message {
-            background: #007bff;
-            color: white;
-            margin-left: 2rem;
-        }
-        .bot-message {
-            background: #e9ecef;
-            margin-right: 2rem;
-        }
-        .input-container {
-            display: flex;
-            gap: 1rem;
-        }
-        .message-input {
-            flex: 1;
-            padding: 1rem;
-            border: 2px solid #dee2e6;
-            border-radius: 10px;
-            font-size: 16px;
-        }
-        .send-btn, .emergency-btn, .clear-btn {
-            padding: 1rem 2rem;
-            border: none;
-            border-radius: 10px;
-            font-weight: bold;
-            cursor: pointer;
-            transition: all 0.3s;
-        }
-        .send-btn {
-            background: #28a745;
-            color: white;
-        }
-        .emergency-btn {
-            background: #dc3545;
-            color: white;
-            margin-top: 1rem;
-        }
-        .clear-btn {
-            background: #6c757d;
-            color: white;
-            margin-top: 1rem;
-        }
-        .send-btn:hover { background: #218838; }
-        .emergency-btn:hover { background: #c82333; }
-        .clear-btn:hover { background: #5a6268; }
-        .status-item {
-            display: flex;
-            justify-content: space-between;
-            margin-bottom: 0.5rem;
-            padding: 0.5rem;
-            background: #f8f9fa;
-            border-radius: 5px;
-        }
-        .emergency-box {
-            background: #fff5f5;
-            border: 2px solid #fed7d7;
-            border-radius: 10px;
-            padding: 1.5rem;
-            margin-top: 2rem;
-        }
-        @media (max-width: 768px) {
-            .main-content {
-                grid-template-columns: 1fr;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ css_url }}">
 </head>
 <body>
     <div class="container">
@@ -335,100 +261,178 @@ HTML_TEMPLATE = """
         </div>
     </div>
 
-    <script>
-        function handleKeyPress(event) {
-            if (event.key === 'Enter') {
-                sendMessage();
-            }
-        }
+    <script src="{{ js_url }}"></script>
+</body>
+</html>
+"""
+
+@dataclass(frozen=True)
+class Ativo:
+    """Conteúdo estático pronto para servir: bytes, pré-compressões e ETags"""
+    tipo: str
+    corpo: bytes
+    gzip: bytes
+    brotli: Optional[bytes]
+    etag: str
+    
+    @classmethod
+    def compilar(cls, corpo: bytes, tipo: str) -> "Ativo":
+        compactado_br = None
+        if BROTLI_AVAILABLE:
+            import brotli
+            compactado_br = brotli.compress(corpo, quality=11)
+        return cls(
+            tipo=tipo,
+            corpo=corpo,
+            gzip=gzip.compress(corpo, compresslevel=9, mtime=0),
+            brotli=compactado_br,
+            etag=hashlib.sha256(corpo).hexdigest()[:20]
+        )
+    
+    def responder(self, cache_control: str) -> Response:
+        """Resposta com a melhor codificação aceita (ou 304 pelo ETag)"""
+        codificacao, corpo = None, self.corpo
+        if self.brotli is not None and request.accept_encodings["br"]:
+            codificacao, corpo = "br", self.brotli
+        elif request.accept_encodings["gzip"]:
+            codificacao, corpo = "gzip", self.gzip
         
-        function sendMessage() {
-            const input = document.getElementById('messageInput');
-            const message = input.value.trim();
-            
-            if (!message) return;
-            
-            // Adicionar mensagem do usuário
-            addMessage(message, 'user');
-            input.value = '';
-            
-            // Enviar para o servidor
-            fetch('/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({message: message})
-            })
-            .then(response => response.json())
-            .then(data => {
-                addMessage(data.response, 'bot');
-            })
-            .catch(error => {
-                addMessage('❌ Erro de conexão. Tente novamente.', 'bot');
-            });
-        }
+        # ETag forte por representação: cada codificação tem a sua
+        etag = f"{self.etag}-{codificacao}" if codificacao else self.etag
+        cabecalhos = {"ETag": f'"{etag}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
         
-        function addMessage(message, sender) {
-            const chatMessages = document.getElementById('chatMessages');
-            const messageDiv = document.createElement('div');
-            messageDiv.className = `message ${sender}-message`;
-            
-            if (sender === 'user') {
-                messageDiv.innerHTML = `<strong>👤 Você:</strong><br>${message}`;
-            } else {
-                messageDiv.innerHTML = `<strong>🤖 Assistente:</strong><br>${message}`;
-            }
-            
-            chatMessages.appendChild(messageDiv);
-            chatMessages.scrollTop = chatMessages.scrollHeight;
-        }
+        if etag in request.if_none_match:
+            return Response(status=304, headers=cabecalhos)
         
-        function clearChat() {
-            const chatMessages = document.getElementById('chatMessages');
-            chatMessages.innerHTML = `
-                <div class="message bot-message">
-                    <strong>🤖 Assistente:</strong><br>
-                    💬 <strong>Nova conversa iniciada!</strong><br><br>
-                    Como posso ajudar você hoje?<br><br>
-                    <em>Este é um ambiente seguro e confidencial.</em> 💙
-                </div>
-            `;
-        }
+        resposta = Response(corpo, mimetype=self.tipo, headers=cabecalhos)
+        if codificacao:
+            resposta.headers["Content-Encoding"] = codificacao
+        return resposta
+
+def compilar_ativos() -> dict:
+    """CSS/JS de static/ por nome versionado (triagem.<hash>.css)"""
+    ativos = {}
+    for caminho, tipo in ((STATIC_DIR / "triagem.css", "text/css"),
+                          (STATIC_DIR / "triagem.js", "text/javascript")):
+        ativo = Ativo.compilar(caminho.read_bytes(), tipo)
+        ativos[f"{caminho.stem}.{ativo.etag[:12]}{caminho.suffix}"] = ativo
+    return ativos
+
+def criar_app(triagem: TriagemRender = None) -> Flask:
+    """App factory: `gunicorn "main_render:criar_app()"` cria um app por chamada;
+    `main_render:app` usa a instância do módulo (obter_app)"""
+    triagem = triagem or TriagemRender()
+    app = Flask(__name__, static_folder=None)
+    app.config["TRIAGEM"] = triagem
+    
+    # A página só depende da configuração (fixa após a inicialização):
+    # renderizada e comprimida uma vez; cada acesso é uma cópia de bytes
+    ativos = compilar_ativos()
+    urls = {nome.split(".")[-1]: f"/assets/{nome}" for nome in ativos}
+    html = app.jinja_env.from_string(HTML_TEMPLATE).render(
+        modo=triagem.modo,
+        telegram_status='✅ Ativo' if triagem.telegram_ativo else '⚠️ Config',
+        ia_status='✅ Ativo' if triagem.hf_token else '⚠️ Config',
+        css_url=urls["css"],
+        js_url=urls["js"]
+    )
+    pagina = Ativo.compilar(html.encode("utf-8"), "text/html")
+    
+    @app.route('/')
+    def index():
+        return pagina.responder(CACHE_PAGINA)
+    
+    @app.route('/assets/<nome>')
+    def ativo(nome):
+        if nome not in ativos:
+            return Response(status=404)
+        return ativos[nome].responder(CACHE_ATIVOS)
+    
+    @app.route('/health')
+    def health():
+        """Health/readiness para o Render (responde antes de qualquer modelo)"""
+        return jsonify({
+            'status': 'ok',
+            'pronto': True,
+            'modo': triagem.modo,
+            'telegram': triagem.telegram_ativo,
+            'ia': triagem.hf_token
+        })
+    
+    @app.route('/chat', methods=['POST'])
+    def chat():
+        data = request.get_json()
+        message = data.get('message', '')
         
-        function emergency() {
-            addMessage('🚨 EMERGÊNCIA', 'user');
-            addMessage(`🚨 <strong>PROTOCOLO DE EMERGÊNCIA</strong> 🚨<br><br>
-                📞 <strong>LIGUE AGORA:</strong><br>
-                • SAMU: 192<br>
-                • CVV: 188<br>
-                • Polícia: 190<br><br>
-                <strong>VOCÊ NÃO ESTÁ SOZINHO!</strong><br><br>
-                Se você está tendo pensamentos suicidas ou está em perigo, ligue para um desses números AGORA.<br><br>
-                💙 Estamos aqui para você.`, 'bot');
-        }
-    </script>
-</body>
-</html>
-"""
+        try:
+            response = triagem.demo_response(message)
+            return jsonify({'response': response})
+        except Exception as e:
+            return jsonify({'response': f'❌ Erro: {str(e)}'})
+    
+    @app.route('/chat/stream', methods=['POST'])
+    def chat_stream():
+        """Server-Sent Events: um evento por pedaço da resposta"""
+        data = request.get_json()
+        message = data.get('message', '')
+        
+        def eventos():
+            try:
+                for pedaco in triagem.responder_stream(message):
+                    yield f"data: {json.dumps({'token': pedaco})}\n\n"
+            except Exception as e:
+                yield f"data: {json.dumps({'token': f'❌ Erro: {str(e)}'})}\n\n"
+            yield "event: fim\ndata: {}\n\n"
+        
+        return Response(
+            stream_with_context(eventos()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    return app
 
-@app.route('/')
-def index():
-    return render_template_string(HTML_TEMPLATE, 
-                                modo=triagem.modo,
-                                telegram_status='✅ Ativo' if triagem.telegram_ativo else '⚠️ Config',
-                                ia_status='✅ Ativo' if triagem.hf_token else '⚠️ Config')
-
-@app.route('/chat', methods=['POST'])
-def chat():
-    data = request.get_json()
-    message = data.get('message', '')
+def servir_gunicorn(app: Flask):
+    """Workers pré-forkados (gthread) com a configuração de gunicorn.conf.py"""
+    from gunicorn.app.base import BaseApplication
     
-    try:
-        response = triagem.demo_response(message)
-        return jsonify({'response': response})
-    except Exception as e:
-        return jsonify({'response': f'❌ Erro: {str(e)}'})
+    class Servidor(BaseApplication):
+        def load_config(self):
+            configuracao = runpy.run_path(str(Path(__file__).with_name("gunicorn.conf.py")))
+            for chave, valor in configuracao.items():
+                if chave in self.cfg.settings and valor is not None:
+                    self.cfg.set(chave, valor)
+            self.cfg.set("bind", f"{HOST}:{PORT}")
+        
+        def load(self):
+            return app
+    
+    Servidor().run()
+
+def servir_waitress(app: Flask):
+    """Um processo com pool de threads (alternativa sem fork, ex.: Windows)"""
+    from waitress import serve
+    serve(app, host=HOST, port=PORT, threads=int(os.environ.get("WEB_THREADS", 8)),
+          channel_timeout=int(os.environ.get("WEB_TIMEOUT", 60)))
+
+# Instância do módulo, criada no primeiro acesso a `main_render.app`: só
+# importar o módulo (ex.: `gunicorn "main_render:criar_app()"`) não monta
+# um segundo TriagemRender
+_app: Optional[Flask] = None
+
+def obter_app() -> Flask:
+    """App do módulo (`gunicorn main_render:app`), criado uma única vez"""
+    global _app
+    if _app is None:
+        _app = criar_app()
+    return _app
+
+def __getattr__(nome: str):
+    if nome == "app":
+        return obter_app()
+    if nome == "triagem":
+        return obter_app().config["TRIAGEM"]
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
 
 if __name__ == "__main__":
     print("🚀 Sistema de Triagem - Render Deploy (Flask)")
@@ -452,5 +456,17 @@ if __name__ == "__main__":
         print("✅ Configuração completa")
         print("🤖 Modo produção parcial")
     
-    print("🚀 Iniciando servidor Flask...")
-    app.run(host=HOST, port=PORT, debug=False)
\ No newline at end of file
+    if SERVIDOR in ("gunicorn", "waitress") and importlib.util.find_spec(SERVIDOR) is None:
+        print(f"⚠️ {SERVIDOR} não instalado (pip install {SERVIDOR}); usando servidor Flask")
+        SERVIDOR = "flask"
+    
+    app = obter_app()
+    if SERVIDOR == "gunicorn":
+        print("🚀 Iniciando gunicorn (multi-worker)...")
+        servir_gunicorn(app)
+    elif SERVIDOR == "waitress":
+        print("🚀 Iniciando waitress (multi-thread)...")
+        servir_waitress(app)
+    else:
+        print("🚀 Iniciando servidor Flask...")
+        app.run(host=HOST, port=PORT, debug=False)
\ No newline at end of file
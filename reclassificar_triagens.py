@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Reclassificação em lote do histórico de triagens
+Aplica os limites de gravidade atuais (ou outros, via --limites) a todas as
+triagens gravadas e mostra quantas mudariam de nível
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Adicionar src ao path
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from chatbot import (
+    CAMPOS_ESCALA, CAMPOS_MOTIVOS, COLUNAS_SINTOMAS_V4, NIVEIS,
+    AvaliacaoCompacta, DatabaseManager, GravidadeNivel, ProtocolosMedicos,
+)
+
+def interpretar_limites(texto: str):
+    """"32,8;24,6;16,4" -> limites de URGENTE, INTENSO e MODERADO"""
+    faixas = [faixa.split(",") for faixa in texto.split(";")]
+    niveis = [nivel for nivel, _, _ in ProtocolosMedicos.LIMITES_GRAVIDADE]
+    if len(faixas) != len(niveis):
+        raise argparse.ArgumentTypeError(f"Informe {len(niveis)} faixas 'pontuação,motivos' separadas por ';'")
+    return tuple((nivel, int(pontos), int(motivos)) for nivel, (pontos, motivos) in zip(niveis, faixas))
+
+def gerar_base_sintetica(db: DatabaseManager, total: int):
+    """Popular uma base de teste com `total` triagens aleatórias"""
+    conn = db.conexao()
+    agora = datetime.now()
+    
+    def linhas():
+        for indice in range(total):
+            avaliacao = AvaliacaoCompacta(
+                random.getrandbits(len(CAMPOS_MOTIVOS)),
+                bytes(random.choices(range(3), k=len(CAMPOS_ESCALA)))
+            )
+            sintomas = avaliacao.para_avaliacao()
+            nivel = random.choice(NIVEIS).value
+            yield (f"{indice:011d}", "{}", "{}", nivel, avaliacao.pontuacao_total,
+                   avaliacao.sintomas_criticos, avaliacao.contagem_motivos_positivos,
+                   (agora - timedelta(minutes=indice)).isoformat(), False,
+                   *(int(getattr(sintomas, campo)) for campo in COLUNAS_SINTOMAS_V4))
+    
+    with conn:
+        conn.executemany(db.SQL_INSERIR_TRIAGEM, linhas())
+        conn.execute(db.SQL_RECONTAR_NIVEIS)
+
+def imprimir_relatorio(relatorio: dict):
+    print(f"📊 Triagens analisadas: {relatorio['total']:,}")
+    print(f"🔁 Mudariam de nível: {relatorio['alteradas']:,}"
+          f" ({'gravado' if relatorio['aplicado'] else 'simulação'})")
+    print(f"⏱️ Carga + classificação: {relatorio['segundos_carga']}s | total: {relatorio['segundos_total']}s")
+    
+    print("\n   antes → depois")
+    for antes, destinos in relatorio['matriz'].items():
+        for depois, quantidade in destinos.items():
+            if antes != depois:
+                print(f"   {antes:>8} → {depois:<8} {quantidade:>10,}")
+    
+    print("\n   nível       antes     depois")
+    for nivel in GravidadeNivel:
+        print(f"   {nivel.value:>8} {relatorio['antes'][nivel.value]:>10,} {relatorio['depois'][nivel.value]:>10,}")
+    
+    if relatorio['exemplos']:
+        print(f"\n🔎 Exemplos de ids alterados: {relatorio['exemplos']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Reclassificar o histórico de triagens")
+    parser.add_argument("--db", help="Caminho do banco (padrão: data/database/triagem.db)")
+    parser.add_argument("--limites", type=interpretar_limites,
+                        help="Novos limites 'pontos,motivos' de URGENTE;INTENSO;MODERADO (ex.: 30,8;22,6;14,4)")
+    parser.add_argument("--aplicar", action="store_true", help="Gravar os novos níveis (padrão: só simular)")
+    parser.add_argument("--sintetico", type=int, metavar="N",
+                        help="Antes de reclassificar, inserir N triagens aleatórias em --db (benchmark)")
+    args = parser.parse_args()
+    
+    # Triagens sintéticas nunca no banco de produção (o padrão de --db)
+    if args.sintetico and not args.db:
+        parser.error("--sintetico exige --db apontando para um banco de teste")
+    
+    db = DatabaseManager(args.db)
+    
+    if args.sintetico:
+        inicio = time.perf_counter()
+        gerar_base_sintetica(db, args.sintetico)
+        print(f"🧪 {args.sintetico:,} triagens sintéticas inseridas em {time.perf_counter() - inicio:.1f}s")
+    
+    relatorio = db.reclassificar_triagens(args.limites, aplicar=args.aplicar)
+    imprimir_relatorio(relatorio)
+
+if __name__ == "__main__":
+    main()
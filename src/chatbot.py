@@ -5,12 +5,19 @@ VERSÃO MELHORADA COM 22 PERGUNTAS ESTRUTURADAS
 """
 
 import json
+import asyncio
 import sqlite3
 import datetime
+import importlib.util
 import re
 import os
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+import threading
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, asdict, fields
 from enum import Enum
 from pathlib import Path
 
@@ -21,35 +28,79 @@ from loguru import logger
 from dotenv import load_dotenv
 load_dotenv()
 
-# Configurar logging
 DATA_DIR = Path("data")
-DATA_DIR.mkdir(exist_ok=True)
-(DATA_DIR / "logs").mkdir(exist_ok=True)
-
-logger.add(
-    DATA_DIR / "logs" / "chatbot_{time:YYYY-MM-DD}.log",
-    rotation="1 day",
-    retention="30 days",
-    level="INFO"
+
+_INICIALIZADO = False
+_LOCK_INICIALIZACAO = threading.Lock()
+
+def inicializar():
+    """Efeitos colaterais do módulo: diretórios de dados e log em arquivo
+    
+    Chamado pelo LlamaTriagemBot e pelos pontos de entrada; importar o
+    módulo não cria arquivos nem registra handlers (idempotente).
+    """
+    global _INICIALIZADO
+    with _LOCK_INICIALIZACAO:
+        if _INICIALIZADO:
+            return
+        
+        (DATA_DIR / "logs").mkdir(parents=True, exist_ok=True)
+        
+        logger.add(
+            DATA_DIR / "logs" / "chatbot_{time:YYYY-MM-DD}.log",
+            rotation="1 day",
+            retention="30 days",
+            level="INFO"
+        )
+        _INICIALIZADO = True
+
+# Dependências LLaMA: só verifica se estão instaladas; transformers/torch
+# levam segundos para importar e só são carregados junto com o modelo
+LLAMA_AVAILABLE = (
+    importlib.util.find_spec("transformers") is not None
+    and importlib.util.find_spec("torch") is not None
 )
+if not LLAMA_AVAILABLE:
+    logger.warning("⚠️ Transformers não disponível. Usando modo simulação.")
 
-# Dependências LLaMA
-try:
-    from transformers import (
-        AutoTokenizer, 
-        AutoModelForCausalLM, 
-        pipeline
-    )
+def importar_transformers():
+    """Módulo transformers (importação adiada)"""
+    import transformers
+    return transformers
+
+def importar_torch():
+    """Módulo torch (importação adiada)"""
     import torch
-    LLAMA_AVAILABLE = True
-    logger.info("🤖 Transformers carregado com sucesso")
-except ImportError:
-    logger.warning("⚠️ Transformers não disponível. Usando modo simulação.")
-    LLAMA_AVAILABLE = False
+    return torch
+
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+def importar_numpy():
+    """Módulo numpy (importação adiada)"""
+    import numpy
+    return numpy
+
+# Módulos irmãos: `import src.chatbot` (raiz no path, como em tests/) ou
+# `import chatbot` (src/ no path, como em main.py e nas interfaces)
+if __package__:
+    from .detector_crise import detector_crise
+    from .sessoes import LocksSessao, criar_armazem_sessoes
+    from .inferencia import AgendadorInferencia, carregar_modelo_cpu
+    from .questionario import QUESTIONARIO, Instrumento, validar_campos
+    from .respostas import CacheRespostas, resposta
+else:
+    from detector_crise import detector_crise
+    from sessoes import LocksSessao, criar_armazem_sessoes
+    from inferencia import AgendadorInferencia, carregar_modelo_cpu
+    from questionario import QUESTIONARIO, Instrumento, validar_campos
+    from respostas import CacheRespostas, resposta
 
 # Dependências Telegram
 try:
-    from telegram_notifier import notificar_urgente, notificar_intenso
+    if __package__:
+        from .telegram_notifier import obter_notifier, EntregadorOutbox, AgendadorRelatorio
+    else:
+        from telegram_notifier import obter_notifier, EntregadorOutbox, AgendadorRelatorio
     TELEGRAM_DISPONIVEL = True
     logger.info("📱 Sistema Telegram carregado")
 except ImportError:
@@ -116,12 +167,8 @@ class AvaliacaoSintomas:
     @property
     def sintomas_criticos(self) -> bool:
         """Verifica sintomas críticos"""
-        return (self.pensamentos_suicidas or 
-                self.alucinacoes_delirios or 
-                self.violencia_domestica or
-                self.ideacao_suicida > 2 or
-                self.tentativa_suicidio > 0 or
-                self.alucinacoes > 2)
+        return (any(getattr(self, campo) for campo in MOTIVOS_CRITICOS) or
+                any(getattr(self, campo) > limite for campo, limite in LIMITES_CRITICOS_ESCALA.items()))
     
     @property
     def contagem_motivos_positivos(self) -> int:
@@ -136,6 +183,239 @@ class AvaliacaoSintomas:
         ]
         return sum(motivos)
 
+# Ordem fixa dos campos (serialização compacta da sessão)
+CAMPOS_MOTIVOS = tuple(f.name for f in fields(AvaliacaoSintomas) if f.type is bool)
+CAMPOS_ESCALA = tuple(f.name for f in fields(AvaliacaoSintomas) if f.type is int)
+ETAPAS = tuple(EtapaTriagem)
+NIVEIS = tuple(GravidadeNivel)
+
+# Critérios de sintomas críticos, do limite_gravidade dos questionários
+# (config/prompts.py): motivos que bastam sozinhos e, na escala, o valor que
+# precisa ser ultrapassado
+_LIMITES_GRAVIDADE = {
+    pergunta.campo: pergunta.limite_gravidade
+    for instrumento in QUESTIONARIO.values()
+    for pergunta in instrumento.perguntas
+    if pergunta.limite_gravidade is not None
+}
+MOTIVOS_CRITICOS = tuple(campo for campo in CAMPOS_MOTIVOS if campo in _LIMITES_GRAVIDADE)
+LIMITES_CRITICOS_ESCALA = {
+    campo: _LIMITES_GRAVIDADE[campo] - 1 for campo in CAMPOS_ESCALA if campo in _LIMITES_GRAVIDADE
+}
+
+class AvaliacaoCompacta:
+    """AvaliacaoSintomas em 12 bytes: máscara dos 12 motivos + 10 bytes da escala
+
+    Imutável; os agregados são calculados uma vez na construção. Expõe os
+    mesmos pontuacao_total / sintomas_criticos / contagem_motivos_positivos
+    da dataclass, então serve direto em ProtocolosMedicos.
+    """
+    
+    __slots__ = (
+        "mascara",
+        "escala",
+        "pontuacao_total",
+        "contagem_motivos_positivos",
+        "sintomas_criticos",
+    )
+    
+    FORMATO = struct.Struct(f"!H{len(CAMPOS_ESCALA)}s")
+    MASCARA_CRITICA = sum(1 << CAMPOS_MOTIVOS.index(campo) for campo in MOTIVOS_CRITICOS)
+    # Limite por posição da escala (255 = nunca crítico)
+    LIMITES_ESCALA = bytes(LIMITES_CRITICOS_ESCALA.get(campo, 255) for campo in CAMPOS_ESCALA)
+    
+    def __init__(self, mascara: int = 0, escala: bytes = bytes(len(CAMPOS_ESCALA))):
+        if len(escala) != len(CAMPOS_ESCALA):
+            raise ValueError(f"Escala com {len(escala)} valores (esperado {len(CAMPOS_ESCALA)})")
+        self.mascara = mascara
+        self.escala = bytes(escala)
+        self.pontuacao_total = sum(self.escala)
+        self.contagem_motivos_positivos = bin(mascara).count("1")
+        self.sintomas_criticos = bool(mascara & self.MASCARA_CRITICA) or any(
+            valor > limite for valor, limite in zip(self.escala, self.LIMITES_ESCALA)
+        )
+    
+    @classmethod
+    def de_avaliacao(cls, sintomas: AvaliacaoSintomas) -> "AvaliacaoCompacta":
+        mascara = 0
+        for bit, campo in enumerate(CAMPOS_MOTIVOS):
+            if getattr(sintomas, campo):
+                mascara |= 1 << bit
+        return cls(mascara, bytes(getattr(sintomas, campo) for campo in CAMPOS_ESCALA))
+    
+    def para_avaliacao(self) -> AvaliacaoSintomas:
+        valores = {campo: bool(self.mascara >> bit & 1) for bit, campo in enumerate(CAMPOS_MOTIVOS)}
+        valores.update(zip(CAMPOS_ESCALA, self.escala))
+        return AvaliacaoSintomas(**valores)
+    
+    def para_bytes(self) -> bytes:
+        return self.FORMATO.pack(self.mascara, self.escala)
+    
+    @classmethod
+    def de_bytes(cls, dados: bytes) -> "AvaliacaoCompacta":
+        return cls(*cls.FORMATO.unpack_from(dados))
+    
+    def __eq__(self, outra) -> bool:
+        if not isinstance(outra, AvaliacaoCompacta):
+            return NotImplemented
+        return self.mascara == outra.mascara and self.escala == outra.escala
+    
+    def __hash__(self) -> int:
+        return hash((self.mascara, self.escala))
+    
+    def __repr__(self) -> str:
+        return f"AvaliacaoCompacta(mascara={self.mascara:#05x}, escala={list(self.escala)})"
+
+def pontuar_lote(registros) -> Dict:
+    """Agregados de muitas avaliações de uma vez (NumPy)
+
+    `registros`: sequência de AvaliacaoCompacta.para_bytes() ou os bytes já
+    concatenados. Retorna arrays pontuacao_total, contagem_motivos_positivos
+    e sintomas_criticos, na ordem dos registros.
+    """
+    np = importar_numpy()
+    
+    dados = registros if isinstance(registros, (bytes, bytearray, memoryview)) else b"".join(registros)
+    tabela = np.frombuffer(dados, dtype=np.dtype([
+        ("mascara", ">u2"),
+        ("escala", "u1", (len(CAMPOS_ESCALA),)),
+    ]))
+    mascara = tabela["mascara"].astype(np.uint16)
+    escala = tabela["escala"]
+    limites = np.frombuffer(AvaliacaoCompacta.LIMITES_ESCALA, dtype=np.uint8)
+    
+    return {
+        "pontuacao_total": escala.sum(axis=1, dtype=np.int32),
+        "contagem_motivos_positivos": ((mascara[:, None] >> np.arange(len(CAMPOS_MOTIVOS), dtype=np.uint16)) & 1).sum(axis=1),
+        "sintomas_criticos": ((mascara & AvaliacaoCompacta.MASCARA_CRITICA) != 0) | (escala > limites).any(axis=1),
+    }
+
+# Colunas de sintomas criadas pela migração 4 do banco. Lista fixa: um campo
+# novo em AvaliacaoSintomas precisa de uma migração nova, não de editar esta
+COLUNAS_SINTOMAS_V4 = (
+    "ansiedade_excessiva", "tristeza_constante", "pensamentos_suicidas",
+    "agressividade", "crises_panico", "uso_substancias", "alucinacoes_delirios",
+    "problemas_sono", "problemas_alimentares", "luto_recente",
+    "violencia_domestica", "dificuldade_relacionamentos",
+    "ansiedade", "tristeza", "irritabilidade", "insonia", "ideacao_suicida",
+    "tentativa_suicidio", "alucinacoes", "choro", "isolamento", "abuso_substancias",
+)
+if set(COLUNAS_SINTOMAS_V4) != set(CAMPOS_MOTIVOS + CAMPOS_ESCALA):
+    raise ValueError("Campos de AvaliacaoSintomas sem coluna no banco: adicionar uma migração")
+
+# Os questionários (config/prompts.py) só gravam em campos da avaliação
+validar_campos(QUESTIONARIO, CAMPOS_MOTIVOS + CAMPOS_ESCALA)
+
+# Etapas com respostas de roteiro; nas demais a resposta vem do modelo
+ETAPAS_ROTEIRO = frozenset({
+    EtapaTriagem.INICIO,
+    EtapaTriagem.DADOS_PESSOAIS,
+    *(EtapaTriagem(etapa) for etapa in QUESTIONARIO),
+})
+
+# Preâmbulo fixo das respostas livres do modelo
+PREAMBULO_TRIAGEM = """
+Como assistente de triagem psicológica especializado, responda com empatia e profissionalismo.
+
+Contexto: Sistema de triagem de saúde mental com protocolos médicos.
+"""
+
+class SessaoTriagem:
+    """Estado da triagem de um usuário (__slots__: sem __dict__ por sessão)"""
+    
+    __slots__ = (
+        "etapa",
+        "paciente",
+        "sintomas",
+        "pergunta_motivo_atual",
+        "pergunta_sintoma_atual",
+        "eh_acompanhamento",
+        "historico",
+        "inicio",
+    )
+    
+    def __init__(self):
+        self.etapa = EtapaTriagem.INICIO
+        self.paciente = DadosPaciente()
+        self.sintomas = AvaliacaoSintomas()
+        self.pergunta_motivo_atual = 0
+        self.pergunta_sintoma_atual = 0
+        self.eh_acompanhamento = False
+        self.historico = []
+        # Início da triagem (epoch); 0 = desconhecido
+        self.inicio = time.time()
+    
+    # etapa, pergunta motivo, pergunta sintoma, acompanhamento, bitmask dos
+    # 12 motivos, 10 bytes da escala, idade (-1 = não informada)
+    _CABECALHO = struct.Struct(f"!BBBBH{len(CAMPOS_ESCALA)}Bh")
+    _SEM_TEXTO = 0xFFFF
+    # Depois dos textos; sessões gravadas antes dele não o têm
+    _INICIO = struct.Struct("!d")
+    
+    def para_bytes(self) -> bytes:
+        """Serialização binária compacta (para backends externos)"""
+        avaliacao = AvaliacaoCompacta.de_avaliacao(self.sintomas)
+        
+        partes = [self._CABECALHO.pack(
+            ETAPAS.index(self.etapa),
+            self.pergunta_motivo_atual,
+            self.pergunta_sintoma_atual,
+            self.eh_acompanhamento,
+            avaliacao.mascara,
+            *avaliacao.escala,
+            -1 if self.paciente.idade is None else self.paciente.idade
+        )]
+        
+        for texto in (self.paciente.nome, self.paciente.cpf,
+                      self.paciente.telefone, self.paciente.email):
+            if texto is None:
+                partes.append(struct.pack("!H", self._SEM_TEXTO))
+            else:
+                codificado = texto.encode("utf-8")
+                partes.append(struct.pack("!H", len(codificado)) + codificado)
+        
+        partes.append(self._INICIO.pack(self.inicio))
+        return b"".join(partes)
+    
+    @classmethod
+    def de_bytes(cls, dados: bytes) -> "SessaoTriagem":
+        """Reconstruir a sessão a partir de para_bytes()"""
+        valores = cls._CABECALHO.unpack_from(dados)
+        etapa, motivo, sintoma, acompanhamento, mascara = valores[:5]
+        escala, idade = valores[5:-1], valores[-1]
+        
+        sessao = cls()
+        sessao.etapa = ETAPAS[etapa]
+        sessao.pergunta_motivo_atual = motivo
+        sessao.pergunta_sintoma_atual = sintoma
+        sessao.eh_acompanhamento = bool(acompanhamento)
+        sessao.sintomas = AvaliacaoCompacta(mascara, bytes(escala)).para_avaliacao()
+        
+        textos = []
+        posicao = cls._CABECALHO.size
+        for _ in range(4):
+            (tamanho,) = struct.unpack_from("!H", dados, posicao)
+            posicao += 2
+            if tamanho == cls._SEM_TEXTO:
+                textos.append(None)
+            else:
+                textos.append(dados[posicao:posicao + tamanho].decode("utf-8"))
+                posicao += tamanho
+        
+        if len(dados) >= posicao + cls._INICIO.size:
+            (sessao.inicio,) = cls._INICIO.unpack_from(dados, posicao)
+        else:
+            sessao.inicio = 0.0
+        
+        sessao.paciente = DadosPaciente(
+            nome=textos[0],
+            cpf=textos[1],
+            telefone=textos[2],
+            idade=None if idade < 0 else idade,
+            email=textos[3]
+        )
+        return sessao
+
 @dataclass
 class TriagemResultado:
     paciente: DadosPaciente
@@ -146,12 +426,21 @@ class TriagemResultado:
     data_triagem: datetime.datetime
     eh_acompanhamento: bool = False
     comparacao_anterior: Optional[str] = None
+    duracao_segundos: Optional[float] = None
 
 class ProtocolosMedicos:
     """Protocolos médicos baseados no fluxograma"""
     
+    # Faixas de gravidade, da mais grave para a mais leve:
+    # (nível, pontuação mínima da escala, motivos positivos mínimos)
+    LIMITES_GRAVIDADE = (
+        (GravidadeNivel.URGENTE, 32, 8),
+        (GravidadeNivel.INTENSO, 24, 6),
+        (GravidadeNivel.MODERADO, 16, 4),
+    )
+    
     @staticmethod
-    def determinar_gravidade(sintomas: AvaliacaoSintomas) -> GravidadeNivel:
+    def determinar_gravidade(sintomas: AvaliacaoSintomas, limites=None) -> GravidadeNivel:
         """Determinar gravidade com base em motivos + escala"""
         
         # Críticos sempre = URGENTE
@@ -165,14 +454,25 @@ class ProtocolosMedicos:
         motivos_positivos = sintomas.contagem_motivos_positivos
         
         # Algoritmo combinado
-        if pontuacao_escala >= 32 or motivos_positivos >= 8:
-            return GravidadeNivel.URGENTE
-        elif pontuacao_escala >= 24 or motivos_positivos >= 6:
-            return GravidadeNivel.INTENSO
-        elif pontuacao_escala >= 16 or motivos_positivos >= 4:
-            return GravidadeNivel.MODERADO
-        else:
-            return GravidadeNivel.LEVE
+        for nivel, pontuacao_minima, motivos_minimos in limites or ProtocolosMedicos.LIMITES_GRAVIDADE:
+            if pontuacao_escala >= pontuacao_minima or motivos_positivos >= motivos_minimos:
+                return nivel
+        
+        return GravidadeNivel.LEVE
+    
+    @staticmethod
+    def classificar_lote(pontuacao, motivos, criticos, limites=None):
+        """determinar_gravidade vetorizada: arrays NumPy -> índices em NIVEIS"""
+        np = importar_numpy()
+        limites = limites or ProtocolosMedicos.LIMITES_GRAVIDADE
+        
+        condicoes = [np.asarray(criticos, dtype=bool)]
+        escolhas = [NIVEIS.index(GravidadeNivel.URGENTE)]
+        for nivel, pontuacao_minima, motivos_minimos in limites:
+            condicoes.append((pontuacao >= pontuacao_minima) | (motivos >= motivos_minimos))
+            escolhas.append(NIVEIS.index(nivel))
+        
+        return np.select(condicoes, escolhas, default=NIVEIS.index(GravidadeNivel.LEVE)).astype(np.uint8)
     
     @staticmethod
     def gerar_protocolo(nivel: GravidadeNivel) -> Tuple[List[str], List[str]]:
@@ -253,19 +553,20 @@ class ProtocolosMedicos:
 class DatabaseManager:
     """Gerenciamento de banco de dados"""
     
-    def __init__(self, db_path: str = None):
-        if db_path is None:
-            db_path = DATA_DIR / "database" / "triagem.db"
-        
-        self.db_path = Path(db_path)
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.init_db()
+    # Pragmas aplicados a cada conexão nova (WAL permite leitores concorrentes
+    # enquanto um worker grava, e synchronous=NORMAL evita fsync por commit)
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-8000",
+        "PRAGMA temp_store=MEMORY",
+    )
     
-    def init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
+    # Migrações versionadas: (versão, descrição, comandos). Nunca editar uma
+    # migração já publicada - adicionar uma nova versão no final.
+    MIGRACOES = (
+        (1, "tabela triagens", (
+            """
             CREATE TABLE IF NOT EXISTS triagens (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 cpf TEXT NOT NULL,
@@ -278,92 +579,699 @@ class DatabaseManager:
                 data_triagem TIMESTAMP NOT NULL,
                 eh_acompanhamento BOOLEAN DEFAULT FALSE
             )
-        """)
+            """,
+        )),
+        (2, "índice de histórico por CPF", (
+            # Índice de cobertura: buscar_triagem_anterior é respondida só
+            # pelo índice, sem acessar a tabela
+            """
+            CREATE INDEX IF NOT EXISTS idx_triagens_cpf_data ON triagens (
+                cpf, data_triagem DESC,
+                nivel_gravidade, pontuacao_total, motivos_positivos
+            )
+            """,
+            "ANALYZE triagens",
+        )),
+        (3, "outbox de notificações", (
+            """
+            CREATE TABLE IF NOT EXISTS notificacoes_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                triagem_id INTEGER REFERENCES triagens(id),
+                chat_id TEXT NOT NULL,
+                texto TEXT NOT NULL,
+                parse_mode TEXT NOT NULL DEFAULT 'Markdown',
+                prioridade INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                proxima_tentativa REAL NOT NULL,
+                ultimo_erro TEXT,
+                criado_em TIMESTAMP NOT NULL,
+                enviado_em TIMESTAMP
+            )
+            """,
+            # Índice parcial: só a fila ativa, não cresce com o histórico enviado
+            """
+            CREATE INDEX IF NOT EXISTS idx_outbox_fila
+            ON notificacoes_outbox (prioridade, proxima_tentativa)
+            WHERE status IN ('pendente', 'enviando')
+            """,
+        )),
+        (4, "colunas normalizadas dos sintomas", (
+            # Uma coluna por resposta (motivos 0/1, escala 0-4), preenchida a
+            # partir do JSON dentro do próprio SQLite
+            *(f"ALTER TABLE triagens ADD COLUMN {campo} INTEGER NOT NULL DEFAULT 0"
+              for campo in COLUNAS_SINTOMAS_V4),
+            "UPDATE triagens SET " + ", ".join(
+                f"{campo} = COALESCE(json_extract(sintomas, '$.{campo}'), 0)"
+                for campo in COLUNAS_SINTOMAS_V4
+            ),
+            # Consultas de estatística são sempre por período
+            "CREATE INDEX IF NOT EXISTS idx_triagens_data ON triagens (data_triagem)",
+            "ANALYZE triagens",
+        )),
+        (5, "consolidado diário das triagens", (
+            # Uma linha por dia, atualizada a cada triagem: o relatório diário
+            # é uma leitura por chave, sem varrer triagens
+            """
+            CREATE TABLE IF NOT EXISTS triagens_diarias (
+                dia TEXT PRIMARY KEY,
+                iniciadas INTEGER NOT NULL DEFAULT 0,
+                concluidas INTEGER NOT NULL DEFAULT 0,
+                leve INTEGER NOT NULL DEFAULT 0,
+                moderado INTEGER NOT NULL DEFAULT 0,
+                intenso INTEGER NOT NULL DEFAULT 0,
+                urgente INTEGER NOT NULL DEFAULT 0,
+                cronometradas INTEGER NOT NULL DEFAULT 0,
+                segundos_total REAL NOT NULL DEFAULT 0,
+                notificacoes INTEGER NOT NULL DEFAULT 0,
+                relatorio_enviado_em TIMESTAMP
+            ) WITHOUT ROWID
+            """,
+            # Histórico: início e duração não eram registrados (iniciadas = concluídas)
+            """
+            INSERT INTO triagens_diarias (dia, iniciadas, concluidas, leve, moderado, intenso, urgente)
+            SELECT substr(data_triagem, 1, 10), COUNT(*), COUNT(*),
+                   SUM(nivel_gravidade = 'leve'), SUM(nivel_gravidade = 'moderado'),
+                   SUM(nivel_gravidade = 'intenso'), SUM(nivel_gravidade = 'urgente')
+            FROM triagens
+            GROUP BY 1
+            """,
+            """
+            INSERT INTO triagens_diarias (dia, notificacoes)
+            SELECT substr(enviado_em, 1, 10), COUNT(*)
+            FROM notificacoes_outbox
+            WHERE status = 'enviada'
+            GROUP BY 1
+            ON CONFLICT(dia) DO UPDATE SET notificacoes = excluded.notificacoes
+            """,
+        )),
+    )
+    
+    # Valores possíveis de uma pergunta da escala
+    VALORES_ESCALA = range(0, 5)
+    
+    # Prazo da reserva de uma mensagem; se o worker morrer, ela volta à fila
+    PRAZO_RESERVA_OUTBOX = 120.0
+    
+    # SQL constante: o cache de statements do sqlite3 reaproveita o prepare
+    SQL_INSERIR_TRIAGEM = f"""
+        INSERT INTO triagens (
+            cpf, dados_paciente, sintomas, nivel_gravidade,
+            pontuacao_total, sintomas_criticos, motivos_positivos, data_triagem, eh_acompanhamento,
+            {", ".join(COLUNAS_SINTOMAS_V4)}
+        ) VALUES ({", ".join("?" * (9 + len(COLUNAS_SINTOMAS_V4)))})
+    """
+    
+    SQL_INSERIR_NOTIFICACAO = """
+        INSERT INTO notificacoes_outbox (
+            triagem_id, chat_id, texto, prioridade, proxima_tentativa, criado_em
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    """
+    
+    # Consolidado diário: um UPSERT por nível (coluna fixa no SQL)
+    SQL_CONSOLIDAR_TRIAGEM = {
+        nivel: f"""
+            INSERT INTO triagens_diarias (dia, concluidas, {nivel.value}, cronometradas, segundos_total)
+            VALUES (?, 1, 1, ?, ?)
+            ON CONFLICT(dia) DO UPDATE SET
+                concluidas = concluidas + 1,
+                {nivel.value} = {nivel.value} + 1,
+                cronometradas = cronometradas + excluded.cronometradas,
+                segundos_total = segundos_total + excluded.segundos_total
+        """
+        for nivel in NIVEIS
+    }
+    
+    SQL_CONTAR_INICIO = """
+        INSERT INTO triagens_diarias (dia, iniciadas) VALUES (?, 1)
+        ON CONFLICT(dia) DO UPDATE SET iniciadas = iniciadas + 1
+    """
+    
+    SQL_CONTAR_NOTIFICACAO = """
+        INSERT INTO triagens_diarias (dia, notificacoes) VALUES (?, 1)
+        ON CONFLICT(dia) DO UPDATE SET notificacoes = notificacoes + 1
+    """
+    
+    # Recontagem dos níveis a partir das triagens (após reclassificar)
+    SQL_RECONTAR_NIVEIS = f"""
+        INSERT INTO triagens_diarias (dia, {", ".join(nivel.value for nivel in NIVEIS)})
+        SELECT substr(data_triagem, 1, 10),
+               {", ".join(f"SUM(nivel_gravidade = '{nivel.value}')" for nivel in NIVEIS)}
+        FROM triagens
+        WHERE true
+        GROUP BY 1
+        ON CONFLICT(dia) DO UPDATE SET
+            {", ".join(f"{nivel.value} = excluded.{nivel.value}" for nivel in NIVEIS)}
+    """
+    
+    SQL_BUSCAR_ANTERIOR = """
+        SELECT nivel_gravidade, pontuacao_total, motivos_positivos, data_triagem
+        FROM triagens 
+        WHERE cpf = ? 
+        ORDER BY data_triagem DESC 
+        LIMIT 1
+    """
+    
+    def __init__(self, db_path: str = None):
+        if db_path is None:
+            db_path = DATA_DIR / "database" / "triagem.db"
+        
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Uma conexão persistente por thread (Flask/Gradio usam threads)
+        self._local = threading.local()
+        self._conexoes: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        
+        self.init_db()
+    
+    def conexao(self) -> sqlite3.Connection:
+        """Conexão persistente da thread atual (criada sob demanda)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=30.0,
+                cached_statements=256,
+                check_same_thread=False
+            )
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            
+            self._local.conn = conn
+            with self._lock:
+                self._conexoes.append(conn)
+        
+        return conn
+    
+    def fechar(self):
+        """Fechar todas as conexões abertas"""
+        with self._lock:
+            for conn in self._conexoes:
+                conn.close()
+            self._conexoes.clear()
+            self._local = threading.local()
+    
+    def init_db(self):
+        """Aplicar migrações pendentes (versão guardada em PRAGMA user_version)"""
+        conn = self.conexao()
+        
+        versao_atual = conn.execute("PRAGMA user_version").fetchone()[0]
+        pendentes = [m for m in self.MIGRACOES if m[0] > versao_atual]
+        
+        for versao, descricao, comandos in pendentes:
+            try:
+                # BEGIN IMMEDIATE serializa workers que sobem ao mesmo tempo
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= versao:
+                    conn.rollback()
+                    continue
+                
+                for comando in comandos:
+                    conn.execute(comando)
+                conn.execute(f"PRAGMA user_version = {int(versao)}")
+                conn.commit()
+                logger.info(f"💾 Migração {versao} aplicada: {descricao}")
+            except sqlite3.Error as e:
+                conn.rollback()
+                logger.error(f"❌ Erro na migração {versao} ({descricao}): {e}")
+                raise
         
-        conn.commit()
-        conn.close()
         logger.info("💾 Banco de dados inicializado")
     
-    def salvar_triagem(self, resultado: TriagemResultado):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO triagens (
-                cpf, dados_paciente, sintomas, nivel_gravidade,
-                pontuacao_total, sintomas_criticos, motivos_positivos, data_triagem, eh_acompanhamento
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            resultado.paciente.cpf,
-            json.dumps(asdict(resultado.paciente)),
-            json.dumps(asdict(resultado.sintomas)),
-            resultado.nivel_gravidade.value,
-            resultado.sintomas.pontuacao_total,
-            resultado.sintomas.sintomas_criticos,
-            resultado.sintomas.contagem_motivos_positivos,
-            resultado.data_triagem.isoformat(),
-            resultado.eh_acompanhamento
-        ))
-        
-        conn.commit()
-        conn.close()
+    def salvar_triagem(self, resultado: TriagemResultado,
+                       notificacoes: Optional[List[Tuple[str, str]]] = None,
+                       prioridade: int = 0) -> int:
+        """Salvar triagem e suas notificações (outbox) na mesma transação"""
+        conn = self.conexao()
+        
+        with conn:
+            cursor = conn.execute(self.SQL_INSERIR_TRIAGEM, (
+                resultado.paciente.cpf,
+                json.dumps(asdict(resultado.paciente)),
+                json.dumps(asdict(resultado.sintomas)),
+                resultado.nivel_gravidade.value,
+                resultado.sintomas.pontuacao_total,
+                resultado.sintomas.sintomas_criticos,
+                resultado.sintomas.contagem_motivos_positivos,
+                resultado.data_triagem.isoformat(),
+                resultado.eh_acompanhamento,
+                *(int(getattr(resultado.sintomas, campo)) for campo in COLUNAS_SINTOMAS_V4)
+            ))
+            triagem_id = cursor.lastrowid
+            
+            duracao = resultado.duracao_segundos
+            conn.execute(self.SQL_CONSOLIDAR_TRIAGEM[resultado.nivel_gravidade], (
+                resultado.data_triagem.date().isoformat(),
+                int(duracao is not None),
+                duracao or 0.0
+            ))
+            
+            if notificacoes:
+                self._inserir_notificacoes(conn, notificacoes, prioridade, triagem_id)
+        
         logger.info(f"💾 Triagem salva para CPF: {resultado.paciente.cpf}")
+        return triagem_id
     
-    def buscar_triagem_anterior(self, cpf: str) -> Optional[Dict]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT * FROM triagens 
-            WHERE cpf = ? 
-            ORDER BY data_triagem DESC 
-            LIMIT 1
-        """, (cpf,))
+    def _inserir_notificacoes(self, conn: sqlite3.Connection,
+                              notificacoes: List[Tuple[str, str]],
+                              prioridade: int, triagem_id: Optional[int] = None):
+        agora = time.time()
+        criado_em = datetime.datetime.now().isoformat()
+        conn.executemany(self.SQL_INSERIR_NOTIFICACAO, [
+            (triagem_id, chat_id, texto, prioridade, agora, criado_em)
+            for chat_id, texto in notificacoes
+        ])
+    
+    def enfileirar_notificacoes(self, notificacoes: List[Tuple[str, str]],
+                                prioridade: int = 0, triagem_id: Optional[int] = None):
+        """Gravar notificações na outbox sem triagem associada"""
+        conn = self.conexao()
+        with conn:
+            self._inserir_notificacoes(conn, notificacoes, prioridade, triagem_id)
+    
+    def reservar_notificacoes(self, limite: int) -> List[Dict]:
+        """Reservar um lote de notificações vencidas (maior prioridade primeiro)"""
+        conn = self.conexao()
+        agora = time.time()
         
-        row = cursor.fetchone()
-        conn.close()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("""
+                SELECT id, chat_id, texto, parse_mode, tentativas
+                FROM notificacoes_outbox
+                WHERE status IN ('pendente', 'enviando') AND proxima_tentativa <= ?
+                ORDER BY prioridade, proxima_tentativa
+                LIMIT ?
+            """, (agora, limite)).fetchall()
+            
+            conn.executemany("""
+                UPDATE notificacoes_outbox
+                SET status = 'enviando', proxima_tentativa = ?
+                WHERE id = ?
+            """, [(agora + self.PRAZO_RESERVA_OUTBOX, row[0]) for row in rows])
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        
+        return [
+            {
+                'id': row[0],
+                'chat_id': row[1],
+                'texto': row[2],
+                'parse_mode': row[3],
+                'tentativas': row[4]
+            }
+            for row in rows
+        ]
+    
+    def marcar_notificacao_enviada(self, notificacao_id: int):
+        conn = self.conexao()
+        agora = datetime.datetime.now()
+        with conn:
+            conn.execute("""
+                UPDATE notificacoes_outbox
+                SET status = 'enviada', enviado_em = ?
+                WHERE id = ?
+            """, (agora.isoformat(), notificacao_id))
+            conn.execute(self.SQL_CONTAR_NOTIFICACAO, (agora.date().isoformat(),))
+    
+    def marcar_notificacao_simulada(self, notificacao_id: int):
+        """Telegram desativado: sai da fila sem contar como notificação enviada"""
+        conn = self.conexao()
+        with conn:
+            conn.execute("""
+                UPDATE notificacoes_outbox
+                SET status = 'simulada', enviado_em = ?
+                WHERE id = ?
+            """, (datetime.datetime.now().isoformat(), notificacao_id))
+    
+    def reagendar_notificacao(self, notificacao_id: int, tentativas: int,
+                              atraso: float, erro: Optional[str] = None):
+        conn = self.conexao()
+        with conn:
+            conn.execute("""
+                UPDATE notificacoes_outbox
+                SET status = 'pendente', tentativas = ?, proxima_tentativa = ?, ultimo_erro = ?
+                WHERE id = ?
+            """, (tentativas, time.time() + atraso, erro, notificacao_id))
+    
+    def marcar_notificacao_falhou(self, notificacao_id: int, tentativas: int,
+                                  erro: Optional[str] = None):
+        conn = self.conexao()
+        with conn:
+            conn.execute("""
+                UPDATE notificacoes_outbox
+                SET status = 'falhou', tentativas = ?, ultimo_erro = ?
+                WHERE id = ?
+            """, (tentativas, erro, notificacao_id))
+    
+    def buscar_triagem_anterior(self, cpf: str) -> Optional[Dict]:
+        row = self.conexao().execute(self.SQL_BUSCAR_ANTERIOR, (cpf,)).fetchone()
         
         if not row:
             return None
         
         return {
-            'pontuacao_total': row[5],
-            'nivel_gravidade': row[4],
-            'motivos_positivos': row[7],
-            'data_triagem': row[8]
+            'pontuacao_total': row[1],
+            'nivel_gravidade': row[0],
+            'motivos_positivos': row[2],
+            'data_triagem': row[3]
+        }
+    
+    @staticmethod
+    def _filtro_periodo(inicio=None, fim=None) -> Tuple[str, Tuple]:
+        """WHERE por data_triagem: `inicio` inclusivo, `fim` exclusivo (date,
+        datetime ou texto ISO)"""
+        condicoes, parametros = [], []
+        if inicio is not None:
+            condicoes.append("data_triagem >= ?")
+            parametros.append(inicio if isinstance(inicio, str) else inicio.isoformat())
+        if fim is not None:
+            condicoes.append("data_triagem < ?")
+            parametros.append(fim if isinstance(fim, str) else fim.isoformat())
+        return (f"WHERE {' AND '.join(condicoes)}" if condicoes else ""), tuple(parametros)
+    
+    def contar_respostas(self, campo: str, valor: int = 1, inicio=None, fim=None) -> int:
+        """Quantas triagens do período responderam `valor` em `campo`
+        (motivos: 1 = sim, 0 = não; escala: 0-4)"""
+        if campo not in COLUNAS_SINTOMAS_V4:
+            raise ValueError(f"Campo desconhecido: {campo}")
+        
+        filtro, parametros = self._filtro_periodo(inicio, fim)
+        filtro = f"{filtro} AND {campo} = ?" if filtro else f"WHERE {campo} = ?"
+        return self.conexao().execute(
+            f"SELECT COUNT(*) FROM triagens {filtro}", (*parametros, int(valor))
+        ).fetchone()[0]
+    
+    def estatisticas_sintomas(self, inicio=None, fim=None) -> Dict:
+        """Agregados de todas as respostas do período numa única consulta"""
+        expressoes = [f"SUM({campo})" for campo in CAMPOS_MOTIVOS]
+        for campo in CAMPOS_ESCALA:
+            expressoes.append(f"AVG({campo})")
+            expressoes.extend(f"SUM({campo} = {valor})" for valor in self.VALORES_ESCALA)
+        
+        filtro, parametros = self._filtro_periodo(inicio, fim)
+        linha = self.conexao().execute(
+            f"SELECT COUNT(*), {', '.join(expressoes)} FROM triagens {filtro}", parametros
+        ).fetchone()
+        
+        total, valores = linha[0], iter(linha[1:])
+        motivos = {campo: next(valores) or 0 for campo in CAMPOS_MOTIVOS}
+        escala = {}
+        for campo in CAMPOS_ESCALA:
+            media = next(valores)
+            escala[campo] = {
+                'media': round(media, 2) if media is not None else 0.0,
+                'distribuicao': [next(valores) or 0 for _ in self.VALORES_ESCALA],
+            }
+        
+        return {
+            'total': total,
+            'motivos': motivos,
+            'escala': escala,
         }
+    
+    def distribuicao_gravidade(self, inicio=None, fim=None) -> Dict[str, int]:
+        """Triagens do período por nível de gravidade"""
+        filtro, parametros = self._filtro_periodo(inicio, fim)
+        contagens = dict(self.conexao().execute(
+            f"SELECT nivel_gravidade, COUNT(*) FROM triagens {filtro} GROUP BY nivel_gravidade", parametros
+        ).fetchall())
+        return {nivel.value: contagens.get(nivel.value, 0) for nivel in NIVEIS}
+    
+    def registrar_inicio_triagem(self, dia: datetime.date = None):
+        """Contar uma triagem iniciada no consolidado do dia"""
+        dia = dia or datetime.date.today()
+        conn = self.conexao()
+        with conn:
+            conn.execute(self.SQL_CONTAR_INICIO, (dia.isoformat(),))
+    
+    def relatorio_diario(self, dia: datetime.date = None) -> Dict:
+        """Estatísticas do dia no formato de TelegramNotifier.relatorio_diario
+        (uma leitura do consolidado)"""
+        dia = dia or datetime.date.today()
+        return self._montar_relatorio(self.conexao(), dia)
+    
+    @staticmethod
+    def _montar_relatorio(conn: sqlite3.Connection, dia: datetime.date) -> Dict:
+        row = conn.execute("""
+            SELECT iniciadas, concluidas, leve, moderado, intenso, urgente,
+                   cronometradas, segundos_total, notificacoes
+            FROM triagens_diarias
+            WHERE dia = ?
+        """, (dia.isoformat(),)).fetchone() or (0,) * 9
+        iniciadas, concluidas, *niveis, cronometradas, segundos_total, notificacoes = row
+        
+        estatisticas = {'dia': dia.isoformat(), 'total': concluidas}
+        for nivel, quantidade in zip(NIVEIS, niveis):
+            estatisticas[nivel.value] = quantidade
+            estatisticas[f"{nivel.value}_pct"] = 100.0 * quantidade / concluidas if concluidas else 0.0
+        
+        estatisticas.update({
+            'iniciadas': iniciadas,
+            'tempo_medio': segundos_total / cronometradas / 60 if cronometradas else 0.0,
+            'taxa_conclusao': min(100.0, 100.0 * concluidas / iniciadas) if iniciadas else 0.0,
+            'notificacoes': notificacoes,
+        })
+        return estatisticas
+    
+    def enfileirar_relatorio_diario(self, dia: datetime.date,
+                                    montar_mensagens: Callable[[Dict], List[Tuple[str, str]]],
+                                    prioridade: int = 0) -> Optional[Dict]:
+        """Gravar o relatório do dia na outbox, uma única vez entre todos os
+        workers; retorna as estatísticas ou None se já foi enfileirado"""
+        conn = self.conexao()
+        dia_iso = dia.isoformat()
+        
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR IGNORE INTO triagens_diarias (dia) VALUES (?)", (dia_iso,))
+            reservado = conn.execute("""
+                UPDATE triagens_diarias SET relatorio_enviado_em = ?
+                WHERE dia = ? AND relatorio_enviado_em IS NULL
+            """, (datetime.datetime.now().isoformat(), dia_iso)).rowcount
+            if not reservado:
+                conn.rollback()
+                return None
+            
+            estatisticas = self._montar_relatorio(conn, dia)
+            self._inserir_notificacoes(conn, montar_mensagens(estatisticas), prioridade)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        logger.info(f"📊 Relatório diário de {dia_iso} enfileirado")
+        return estatisticas
+    
+    def reclassificar_triagens(self, limites=None, aplicar: bool = True, lote: int = 10000) -> Dict:
+        """Reclassificar todo o histórico com os limites atuais (ou `limites`)
+
+        Carrega os agregados já gravados em arrays, aplica
+        ProtocolosMedicos.classificar_lote de uma vez e grava só os níveis que
+        mudaram, em transações de `lote` linhas. Retorna o relatório de
+        diferenças (matriz antes -> depois).
+        """
+        np = importar_numpy()
+        inicio = time.perf_counter()
+        conn = self.conexao()
+        
+        # O nível vem como índice em NIVEIS, convertido dentro do SQLite
+        caso_nivel = " ".join(f"WHEN '{nivel.value}' THEN {indice}" for indice, nivel in enumerate(NIVEIS))
+        linhas = conn.execute(f"""
+            SELECT id, CASE nivel_gravidade {caso_nivel} END,
+                   pontuacao_total, motivos_positivos, sintomas_criticos
+            FROM triagens
+        """).fetchall()
+        
+        tabela = np.array(linhas, dtype=np.int64).reshape(-1, 5)
+        ids, antes = tabela[:, 0], tabela[:, 1]
+        depois = ProtocolosMedicos.classificar_lote(tabela[:, 2], tabela[:, 3], tabela[:, 4], limites)
+        mudou = np.flatnonzero(antes != depois)
+        carga = time.perf_counter() - inicio
+        
+        if aplicar and len(mudou):
+            for posicao in range(0, len(mudou), lote):
+                selecao = mudou[posicao:posicao + lote]
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(
+                        "UPDATE triagens SET nivel_gravidade = ? WHERE id = ?",
+                        zip((NIVEIS[indice].value for indice in depois[selecao].tolist()), ids[selecao].tolist())
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            
+            # O consolidado diário conta níveis: refazer a partir das triagens
+            with conn:
+                conn.execute(self.SQL_RECONTAR_NIVEIS)
+        
+        total_niveis = len(NIVEIS)
+        matriz = np.bincount(antes * total_niveis + depois, minlength=total_niveis ** 2).reshape(total_niveis, total_niveis)
+        relatorio = {
+            'total': len(ids),
+            'alteradas': len(mudou),
+            'aplicado': bool(aplicar),
+            'matriz': {
+                NIVEIS[i].value: {NIVEIS[j].value: int(matriz[i, j]) for j in range(total_niveis) if matriz[i, j]}
+                for i in range(total_niveis) if matriz[i].any()
+            },
+            'antes': {nivel.value: int(matriz[i].sum()) for i, nivel in enumerate(NIVEIS)},
+            'depois': {nivel.value: int(matriz[:, i].sum()) for i, nivel in enumerate(NIVEIS)},
+            'exemplos': ids[mudou[:10]].tolist(),
+            'segundos_carga': round(carga, 3),
+            'segundos_total': round(time.perf_counter() - inicio, 3),
+        }
+        
+        logger.info(f"🔁 Reclassificação: {relatorio['alteradas']}/{relatorio['total']} triagens alteradas"
+                    f"{'' if aplicar else ' (simulação)'}")
+        return relatorio
+
+# Modelos já carregados neste processo: novas instâncias do bot (ex.: várias
+# interfaces no mesmo processo) reaproveitam tokenizer, modelo e o agendador
+# de lotes, então as gerações de todas entram no mesmo lote
+_MODELOS_CARREGADOS: Dict[str, Tuple] = {}
+_LOCK_MODELOS = threading.Lock()
 
 class LlamaTriagemBot:
     """Chatbot principal com LLaMA real e Telegram"""
     
-    def __init__(self, model_name: str = None):
+    def __init__(self, model_name: str = None, db: DatabaseManager = None, notificacoes: bool = True):
+        """`db`: banco a usar (padrão: data/database/triagem.db); `notificacoes=False`
+        não enfileira nem entrega alertas no Telegram (testes, scripts)"""
+        inicializar()
         logger.info("🚀 Inicializando LlamaTriagemBot...")
         
-        self.db = DatabaseManager()
+        self.db = db or DatabaseManager()
+        self.notificacoes = TELEGRAM_DISPONIVEL and notificacoes
         self.protocolos = ProtocolosMedicos()
-        self.sessoes = {}
+        # Respostas do modelo já geradas, por prompt normalizado
+        self.cache_respostas = CacheRespostas()
+        
+        # Etapa -> handler; cada questionário compilado vira uma entrada
+        self.despacho = {
+            EtapaTriagem.INICIO: self.processar_inicio,
+            EtapaTriagem.DADOS_PESSOAIS: self.processar_dados_pessoais,
+        }
+        for etapa, instrumento in QUESTIONARIO.items():
+            self.despacho[EtapaTriagem(etapa)] = partial(self.processar_instrumento, instrumento)
+        # Sessões em memória ou compartilhadas entre workers (SESSOES_BACKEND)
+        self.sessoes = criar_armazem_sessoes(
+            SessaoTriagem.para_bytes,
+            SessaoTriagem.de_bytes,
+            DATA_DIR / "database" / "sessoes.db"
+        )
+        # Turnos do mesmo usuário em série (clique duplo, retry do cliente)
+        self.locks_sessao = LocksSessao()
+        # Trabalho bloqueante (SQLite, sessões externas) da API assíncrona
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("BOT_THREADS", "16")),
+            thread_name_prefix="triagem-bot"
+        )
+        
+        # Entrega das notificações gravadas na outbox e relatório diário
+        self.notifier = None
+        self.entregador = None
+        self.agendador_relatorio = None
+        if self.notificacoes:
+            self.notifier = obter_notifier()
+            self.entregador = EntregadorOutbox(self.notifier, self.db)
+            self.entregador.iniciar()
+            self.agendador_relatorio = AgendadorRelatorio(self.notifier, self.db, self.entregador)
+            self.agendador_relatorio.iniciar()
         
         # Configurar modelo
         self.model_name = model_name or os.getenv("MODEL_NAME", "microsoft/DialoGPT-medium")
         self.huggingface_token = os.getenv("HUGGINGFACE_TOKEN")
         
-        # Inicializar LLaMA
+        # Inicializar LLaMA sob demanda: o fluxo de 22 perguntas não usa o
+        # modelo, então o processo aceita tráfego antes de ele carregar
+        # O agendador só é atribuído com o modelo pronto para gerar: ele é o
+        # sinal de prontidão do modelo
+        self.agendador = None
+        self.estado_modelo = "desativado"
+        self.modelo_pronto = threading.Event()
+        self._lock_modelo = threading.Lock()
+        
         if LLAMA_AVAILABLE and self.model_name:
-            self.setup_llama()
+            self.estado_modelo = "pendente"
+            if os.getenv("MODEL_PRELOAD", "True").lower() == "true":
+                self.carregar_modelo_em_segundo_plano()
         else:
             logger.warning("⚠️ Usando modo simulação (LLaMA não disponível)")
-            self.llama_pipeline = None
+            self.modelo_pronto.set()
+    
+    def carregar_modelo_em_segundo_plano(self):
+        """Iniciar o carregamento do modelo numa thread (idempotente)"""
+        with self._lock_modelo:
+            if self.estado_modelo != "pendente":
+                return
+            self.estado_modelo = "carregando"
+        
+        threading.Thread(
+            target=self._carregar_modelo,
+            name="carregar-modelo",
+            daemon=True
+        ).start()
+    
+    def _carregar_modelo(self):
+        try:
+            self.setup_llama()
+        finally:
+            self.estado_modelo = "pronto" if self.agendador else "erro"
+            self.modelo_pronto.set()
+    
+    def aguardar_modelo(self, timeout: Optional[float] = None) -> bool:
+        """Bloquear até o modelo carregar; True se está pronto para uso"""
+        self.carregar_modelo_em_segundo_plano()
+        self.modelo_pronto.wait(timeout)
+        return self.agendador is not None
+    
+    def status(self) -> Dict:
+        """Estado do bot para endpoints de health/readiness"""
+        return {
+            "modelo": self.model_name,
+            "estado_modelo": self.estado_modelo,
+            "modelo_pronto": self.agendador is not None,
+            "telegram": self.notificacoes,
+            "sessoes_ativas": len(self.sessoes),
+            "inferencia": self.agendador.metricas() if self.agendador else None,
+            "cache_respostas": self.cache_respostas.metricas(),
+            "locks_sessao": self.locks_sessao.metricas(),
+        }
     
     def setup_llama(self):
-        """Configurar modelo LLaMA"""
+        """Configurar modelo LLaMA (reaproveita modelo já carregado no processo)"""
+        with _LOCK_MODELOS:
+            carregado = _MODELOS_CARREGADOS.get(self.model_name)
+            if carregado:
+                self.tokenizer, self.model, self.agendador = carregado
+                logger.info(f"♻️ Modelo já carregado reaproveitado: {self.model_name}")
+                return
+            
+            self._setup_llama()
+            
+            if self.agendador:
+                _MODELOS_CARREGADOS[self.model_name] = (self.tokenizer, self.model, self.agendador)
+    
+    def _setup_llama(self):
         try:
             logger.info(f"📥 Carregando modelo: {self.model_name}")
             
+            transformers = importar_transformers()
+            torch = importar_torch()
+            logger.info("🤖 Transformers carregado com sucesso")
+            
             # Configurar autenticação se necessário
             use_auth_token = self.huggingface_token if self.huggingface_token else None
             
             # Carregar tokenizer
-            self.tokenizer = AutoTokenizer.from_pretrained(
+            self.tokenizer = transformers.AutoTokenizer.from_pretrained(
                 self.model_name, 
                 token=use_auth_token
             )
@@ -377,137 +1285,225 @@ class LlamaTriagemBot:
             
             # Carregar modelo
             if device == "cuda":
-                self.model = AutoModelForCausalLM.from_pretrained(
+                self.model = transformers.AutoModelForCausalLM.from_pretrained(
                     self.model_name,
                     torch_dtype=torch.float16,
                     device_map="auto",
                     token=use_auth_token
                 )
             else:
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    self.model_name,
-                    torch_dtype=torch.float32,
-                    token=use_auth_token
-                )
-                self.model.to(device)
+                # CPU: float32, bfloat16 ou int8 dinâmico (LLM_MODO_CPU)
+                self.model, modo = carregar_modelo_cpu(self.model_name, token=use_auth_token)
+                logger.info(f"⚙️ Modo de inferência em CPU: {modo}")
             
-            # Criar pipeline
-            self.llama_pipeline = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                max_length=300,
-                temperature=0.7,
-                do_sample=True,
-                device=0 if device == "cuda" else -1
+            # Gerações concorrentes são agrupadas em micro-lotes; o KV-cache
+            # do preâmbulo fixo é calculado aqui, uma vez por modelo. Atribuir
+            # só no fim: até lá as gerações seguem no fallback
+            agendador = AgendadorInferencia(
+                self.model,
+                self.tokenizer,
+                prefixo=PREAMBULO_TRIAGEM
             )
+            self.agendador = agendador
             
             logger.info("✅ LLaMA configurado com sucesso!")
             
         except Exception as e:
             logger.error(f"❌ Erro ao configurar LLaMA: {e}")
-            self.llama_pipeline = None
+            self.agendador = None
     
     def gerar_resposta_llama(self, prompt: str) -> str:
         """Gerar resposta usando LLaMA"""
-        if not self.llama_pipeline:
+        if not self.agendador:
+            # Primeiro uso dispara o carregamento; enquanto isso, fallback
+            self.carregar_modelo_em_segundo_plano()
             return self.resposta_fallback(prompt)
         
+        em_cache = self.cache_respostas.get(prompt)
+        if em_cache is not None:
+            return em_cache
+        
         try:
-            # Prompt específico para triagem psicológica
-            prompt_especializado = f"""
-Como assistente de triagem psicológica especializado, responda com empatia e profissionalismo.
-
-Contexto: Sistema de triagem de saúde mental com protocolos médicos.
-Usuário: {prompt}
-
-Resposta empática e profissional:"""
+            # O agendador devolve só o texto gerado após o prompt
+            resposta = self.agendador.gerar(
+                self.montar_prompt(prompt),
+                timeout=float(os.getenv("LLM_TIMEOUT_SEGUNDOS", "60"))
+            ).strip()
             
-            resultado = self.llama_pipeline(
-                prompt_especializado, 
-                max_length=200, 
-                num_return_sequences=1,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
-            
-            resposta = resultado[0]['generated_text']
-            
-            # Limpar resposta
-            if "Resposta empática e profissional:" in resposta:
-                resposta = resposta.split("Resposta empática e profissional:")[-1].strip()
+            self.cache_respostas.salvar(prompt, resposta)
+            return resposta
+        
+        except Exception as e:
+            logger.error(f"❌ Erro na geração LLaMA: {e}")
+            return self.resposta_fallback(prompt)
+    
+    async def agerar_resposta_llama(self, prompt: str) -> str:
+        """Versão assíncrona de gerar_resposta_llama
+        
+        Aguarda o Future do agendador de lotes no loop; se a espera for
+        cancelada (timeout, cliente desconectado) antes do lote começar, o
+        agendador descarta o pedido sem gastar CPU com ele.
+        """
+        if not self.agendador:
+            self.carregar_modelo_em_segundo_plano()
+            return self.resposta_fallback(prompt)
+        
+        em_cache = self.cache_respostas.get(prompt)
+        if em_cache is not None:
+            return em_cache
+        
+        try:
+            resposta = (await asyncio.wait_for(
+                asyncio.wrap_future(self.agendador.submeter(self.montar_prompt(prompt))),
+                timeout=float(os.getenv("LLM_TIMEOUT_SEGUNDOS", "60"))
+            )).strip()
             
+            self.cache_respostas.salvar(prompt, resposta)
             return resposta
         
         except Exception as e:
             logger.error(f"❌ Erro na geração LLaMA: {e}")
             return self.resposta_fallback(prompt)
     
+    def gerar_resposta_llama_stream(self, prompt: str) -> Iterator[str]:
+        """Gerar resposta usando LLaMA, entregando os tokens conforme saem"""
+        if not self.agendador:
+            self.carregar_modelo_em_segundo_plano()
+            yield self.resposta_fallback(prompt)
+            return
+        
+        em_cache = self.cache_respostas.get(prompt)
+        if em_cache is not None:
+            yield em_cache
+            return
+        
+        pedacos = []
+        try:
+            for pedaco in self.agendador.transmitir(
+                self.montar_prompt(prompt),
+                timeout=float(os.getenv("LLM_TIMEOUT_SEGUNDOS", "60"))
+            ):
+                pedacos.append(pedaco)
+                yield pedaco
+            
+            # Só respostas completas entram no cache
+            self.cache_respostas.salvar(prompt, "".join(pedacos).strip())
+        
+        except Exception as e:
+            logger.error(f"❌ Erro no streaming LLaMA: {e}")
+            if not pedacos:
+                yield self.resposta_fallback(prompt)
+    
+    def montar_prompt(self, prompt: str) -> str:
+        """Prompt específico para triagem psicológica"""
+        return f"{PREAMBULO_TRIAGEM}Usuário: {prompt}\n\nResposta empática e profissional:"
+    
     def resposta_fallback(self, contexto: str) -> str:
         """Respostas estruturadas como fallback"""
         contexto_lower = contexto.lower()
         
         if any(word in contexto_lower for word in ['suicídio', 'matar', 'morrer', 'acabar']):
-            return """🚨 **PROTOCOLO URGENTE ATIVADO** 🚨
-
-Identifiquei sinais que requerem atenção IMEDIATA.
-
-✅ Dr. José será notificado AGORA
-✅ Contato familiar será acionado
-✅ SAMU 192 disponível se necessário
-
-**VOCÊ NÃO ESTÁ SOZINHO(A)!**
-
-Me diga: você está em local seguro?"""
+            return resposta("fallback", variante="urgente")
         
         elif "olá" in contexto_lower or "oi" in contexto_lower:
-            return """🏥 Olá! Sou seu assistente de triagem psicológica.
-
-Estou aqui para avaliar sua situação atual de forma confidencial e profissional.
-
-Para começar, pode me dizer seu nome completo?"""
+            return resposta("fallback", variante="saudacao")
         
         else:
-            return "Entendo. Continue me contando mais sobre como você está se sentindo."
+            return resposta("fallback", variante="padrao")
     
     def detectar_sintomas_criticos(self, texto: str) -> bool:
-        """Detectar sintomas críticos - VERSÃO CORRIGIDA"""
-        texto_lower = texto.lower()
-        
-        padroes_criticos = [
-            r"pensando em suicídio",
-            r"pensando em suicidio",
-            r"quero (me )?matar",
-            r"vou (me )?suicidar",
-            r"quero morrer",
-            r"não aguento mais",
-            r"nao aguento mais",
-            r"não suporto mais",
-            r"cansei de viver",
-            r"vou acabar com tudo",
-            r"tentei me matar",
-            r"escuto vozes",
-            r"ouço vozes",
-            r"vejo coisas",
-            r"\bsuicídio\b",
-            r"\bsuicidio\b",
-        ]
+        """Detectar sintomas críticos (regex única, sem acentos)"""
+        padrao = detector_crise.detectar(texto)
         
-        for padrao in padroes_criticos:
-            if re.search(padrao, texto_lower):
-                logger.critical(f"🚨 PADRÃO CRÍTICO DETECTADO: '{padrao}' em '{texto[:50]}...'")
-                return True
+        if padrao:
+            logger.critical(f"🚨 PADRÃO CRÍTICO DETECTADO: '{padrao}' em '{texto[:50]}...'")
+            return True
         
         return False
     
     def processar_mensagem(self, mensagem: str, user_id: str) -> str:
         """Processar mensagem seguindo o fluxograma MELHORADO"""
         
-        # Inicializar sessão
-        if user_id not in self.sessoes:
-            self.iniciar_sessao(user_id)
+        # Uma mensagem por vez por usuário: leitura, avanço e gravação da
+        # sessão acontecem sem outro turno do mesmo user_id no meio
+        with self.locks_sessao.travar(user_id):
+            # Inicializar sessão
+            sessao = self.sessoes.get(user_id)
+            if sessao is None:
+                sessao = self.iniciar_sessao(user_id)
+            
+            try:
+                return self.processar_etapa(mensagem, user_id, sessao)
+            finally:
+                # Backends externos precisam do estado atualizado para o próximo worker
+                self.sessoes.salvar(user_id, sessao)
+    
+    def processar_mensagem_stream(self, mensagem: str, user_id: str) -> Iterator[str]:
+        """Versão em streaming de processar_mensagem
+
+        Respostas de roteiro saem inteiras num único pedaço; respostas do
+        modelo saem token a token (o primeiro token é a latência percebida).
+        Só o roteiro altera a sessão, e ele passa por processar_mensagem (com
+        o lock do usuário); a geração do modelo não segura o lock.
+        """
+        sessao = self.sessoes.get(user_id)
+        
+        if self._resposta_do_modelo(mensagem, sessao):
+            logger.info(f"📨 Mensagem de {user_id}: {mensagem[:50]}...")
+            yield from self.gerar_resposta_llama_stream(mensagem)
+            return
+        
+        yield self.processar_mensagem(mensagem, user_id)
+    
+    @staticmethod
+    def _resposta_do_modelo(mensagem: str, sessao: Optional[SessaoTriagem]) -> bool:
+        """A mensagem vai direto para o modelo (sessão fora do roteiro, sem crise)"""
+        return (sessao is not None
+                and sessao.etapa not in ETAPAS_ROTEIRO
+                and detector_crise.detectar(mensagem) is None)
+    
+    async def _em_thread(self, funcao: Callable, *args):
+        """Rodar trabalho bloqueante no pool do bot sem travar o loop"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(funcao, *args))
+    
+    async def aprocessar_mensagem(self, mensagem: str, user_id: str) -> str:
+        """Versão assíncrona de processar_mensagem
         
-        sessao = self.sessoes[user_id]
+        O roteiro (que lê e grava no SQLite) roda no pool do bot; respostas do
+        modelo aguardam o Future do agendador no próprio loop, sem ocupar
+        thread enquanto o lote é gerado. As notificações continuam indo para a
+        outbox, entregue pelo loop persistente do EntregadorOutbox.
+        """
+        sessao = await self._em_thread(self.sessoes.get, user_id)
+        
+        if not self._resposta_do_modelo(mensagem, sessao):
+            return await self._em_thread(self.processar_mensagem, mensagem, user_id)
         
+        # Como no streaming: a resposta do modelo não altera a sessão, então
+        # não há o que gravar nem lock a segurar durante a geração
+        logger.info(f"📨 Mensagem de {user_id}: {mensagem[:50]}...")
+        return await self.agerar_resposta_llama(mensagem)
+    
+    async def aprocessar_mensagem_stream(self, mensagem: str, user_id: str) -> AsyncIterator[str]:
+        """Versão assíncrona de processar_mensagem_stream"""
+        sessao = await self._em_thread(self.sessoes.get, user_id)
+        
+        if not self._resposta_do_modelo(mensagem, sessao):
+            yield await self._em_thread(self.processar_mensagem, mensagem, user_id)
+            return
+        
+        logger.info(f"📨 Mensagem de {user_id}: {mensagem[:50]}...")
+        # O streamer do transformers é bloqueante: cada pedaço é lido no pool
+        pedacos = self.gerar_resposta_llama_stream(mensagem)
+        fim = object()
+        while True:
+            pedaco = await self._em_thread(next, pedacos, fim)
+            if pedaco is fim:
+                return
+            yield pedaco
+    
+    def processar_etapa(self, mensagem: str, user_id: str, sessao: SessaoTriagem) -> str:
+        """Despachar a mensagem para a etapa atual da sessão"""
         # Log da mensagem
         logger.info(f"📨 Mensagem de {user_id}: {mensagem[:50]}...")
         
@@ -516,59 +1512,74 @@ Para começar, pode me dizer seu nome completo?"""
             return self.ativar_protocolo_urgente(user_id)
         
         # Processar baseado na etapa
-        etapa = sessao["etapa"]
-        
-        if etapa == EtapaTriagem.INICIO:
-            return self.processar_inicio(mensagem, user_id)
-        elif etapa == EtapaTriagem.DADOS_PESSOAIS:
-            return self.processar_dados_pessoais(mensagem, user_id)
-        elif etapa == EtapaTriagem.MOTIVOS_BUSCA:          # NOVO
-            return self.processar_motivos_busca(mensagem, user_id)
-        elif etapa == EtapaTriagem.SINTOMAS_ESCALA:        # NOVO
-            return self.processar_sintomas_escala(mensagem, user_id)
-        else:
-            # Usar LLaMA para resposta geral
-            return self.gerar_resposta_llama(mensagem)
+        processar = self.despacho.get(sessao.etapa)
+        if processar is not None:
+            return processar(mensagem, user_id)
+        
+        # Usar LLaMA para resposta geral
+        return self.gerar_resposta_llama(mensagem)
     
-    def iniciar_sessao(self, user_id: str):
+    def iniciar_sessao(self, user_id: str) -> SessaoTriagem:
         """Inicializar nova sessão"""
-        self.sessoes[user_id] = {
-            "etapa": EtapaTriagem.INICIO,
-            "paciente": DadosPaciente(),
-            "sintomas": AvaliacaoSintomas(),
-            "pergunta_motivo_atual": 0,
-            "pergunta_sintoma_atual": 0,
-            "historico": []
-        }
+        sessao = SessaoTriagem()
+        self.sessoes[user_id] = sessao
+        self.db.registrar_inicio_triagem()
         logger.info(f"🆕 Nova sessão: {user_id}")
+        return sessao
+    
+    def metricas_sessoes(self) -> Dict:
+        """Sessões ativas e memória estimada por sessão"""
+        return self.sessoes.metricas()
     
     def ativar_protocolo_urgente(self, user_id: str) -> str:
         """Ativar protocolo emergencial COM notificação Telegram"""
-        self.sessoes[user_id]["sintomas"].ideacao_suicida = 4
-        self.sessoes[user_id]["sintomas"].pensamentos_suicidas = True
-        self.sessoes[user_id]["etapa"] = EtapaTriagem.RESULTADO
+        sessao = self.sessoes[user_id]
+        sessao.sintomas.ideacao_suicida = 4
+        sessao.sintomas.pensamentos_suicidas = True
+        sessao.etapa = EtapaTriagem.RESULTADO
         
         logger.critical(f"🚨 PROTOCOLO URGENTE: {user_id}")
         
-        # NOTIFICAÇÃO TELEGRAM IMEDIATA
-        if TELEGRAM_DISPONIVEL:
+        # Registrar o caso como triagem URGENTE (entra no consolidado do dia);
+        # sem duração, para não puxar para baixo o tempo médio das completas
+        acoes, recomendacoes = self.protocolos.gerar_protocolo(GravidadeNivel.URGENTE)
+        resultado = TriagemResultado(
+            paciente=sessao.paciente,
+            sintomas=sessao.sintomas,
+            nivel_gravidade=GravidadeNivel.URGENTE,
+            recomendacoes=recomendacoes,
+            acoes_imediatas=acoes,
+            data_triagem=datetime.datetime.now()
+        )
+        
+        # NOTIFICAÇÃO TELEGRAM IMEDIATA, gravada na mesma transação da triagem
+        notificacoes = []
+        if self.notificacoes:
             resultado_emergencia = {
-                "paciente": asdict(self.sessoes[user_id]["paciente"]),
+                "paciente": asdict(sessao.paciente),
                 "sintomas": {"sintomas_criticos": True, "pontuacao_total": 40},
                 "nivel_gravidade": "urgente",
-                "data_triagem": datetime.datetime.now().isoformat()
+                "data_triagem": resultado.data_triagem.isoformat()
             }
             
-            logger.info("📱 Enviando notificação EMERGÊNCIA via Telegram")
-            sucesso = notificar_urgente(resultado_emergencia)
+            logger.info("📱 Enfileirando notificação EMERGÊNCIA via Telegram")
+            notificacoes = self.notifier.mensagens_notificacao("urgente", resultado_emergencia)
             
-            if sucesso:
-                notificacao_status = "✅ Dr. José foi notificado IMEDIATAMENTE via Telegram"
+            if notificacoes:
+                notificacao_status = "✅ Dr. José está sendo notificado IMEDIATAMENTE via Telegram"
             else:
-                notificacao_status = "⚠️ Tentativa de notificação via Telegram (verificar configuração)"
+                notificacao_status = "⚠️ Falha ao enfileirar notificação via Telegram (verificar configuração)"
         else:
             notificacao_status = "📱 Configure Telegram para notificações automáticas"
         
+        self.db.salvar_triagem(
+            resultado,
+            notificacoes,
+            EntregadorOutbox.PRIORIDADES["urgente"] if notificacoes else 0
+        )
+        if notificacoes:
+            self.entregador.acordar()
+        
         return f"""🚨 **PROTOCOLO DE EMERGÊNCIA ATIVADO** 🚨
 
 ✅ Caso registrado no sistema
@@ -592,8 +1603,8 @@ Aguarde o contato do Dr. José."""
         if len(mensagem.split()) >= 2:
             possivel_nome = mensagem.strip()
             if not any(char.isdigit() for char in possivel_nome):
-                sessao["paciente"].nome = possivel_nome
-                sessao["etapa"] = EtapaTriagem.DADOS_PESSOAIS
+                sessao.paciente.nome = possivel_nome
+                sessao.etapa = EtapaTriagem.DADOS_PESSOAIS
                 
                 return f"Prazer, {possivel_nome}! Agora preciso do seu CPF e telefone para contato."
         
@@ -606,20 +1617,20 @@ Aguarde o contato do Dr. José."""
         # Extrair CPF
         cpf_match = re.search(r'\d{3}\.?\d{3}\.?\d{3}-?\d{2}', mensagem)
         if cpf_match:
-            sessao["paciente"].cpf = cpf_match.group()
+            sessao.paciente.cpf = cpf_match.group()
         
         # Extrair telefone
         tel_match = re.search(r'\(?(\d{2})\)?\s?\d{4,5}-?\d{4}', mensagem)
         if tel_match:
-            sessao["paciente"].telefone = tel_match.group()
+            sessao.paciente.telefone = tel_match.group()
         
-        if sessao["paciente"].cpf and sessao["paciente"].telefone:
-            sessao["etapa"] = EtapaTriagem.MOTIVOS_BUSCA  # MUDANÇA: ir para motivos
+        if sessao.paciente.cpf and sessao.paciente.telefone:
+            sessao.etapa = EtapaTriagem.MOTIVOS_BUSCA  # MUDANÇA: ir para motivos
             
             # Verificar acompanhamento
-            triagem_anterior = self.db.buscar_triagem_anterior(sessao["paciente"].cpf)
+            triagem_anterior = self.db.buscar_triagem_anterior(sessao.paciente.cpf)
             if triagem_anterior:
-                sessao["eh_acompanhamento"] = True
+                sessao.eh_acompanhamento = True
                 return """Vejo que você já fez triagem conosco. 
 
 Vou fazer uma nova avaliação para acompanhar sua evolução.
@@ -636,158 +1647,79 @@ Começando com os motivos..."""
         
         return "Preciso do seu CPF e telefone para prosseguir. Pode me fornecer essas informações?"
     
-    def processar_motivos_busca(self, mensagem: str, user_id: str) -> str:
-        """Processar motivos da busca (12 perguntas sim/não)"""
+    def processar_instrumento(self, instrumento: Instrumento, mensagem: str, user_id: str) -> str:
+        """Processar uma resposta de questionário (definido em config/prompts.py)"""
         sessao = self.sessoes[user_id]
+        indice = getattr(sessao, instrumento.contador)
+        total = len(instrumento.perguntas)
         
-        # Lista de perguntas
-        perguntas_motivos = [
-            ("ansiedade_excessiva", "Você tem sentido ansiedade excessiva?"),
-            ("tristeza_constante", "Você tem sentido tristeza constante?"),
-            ("pensamentos_suicidas", "⚠️ Você tem tido pensamentos suicidas?"),
-            ("agressividade", "Você tem sentido agressividade?"),
-            ("crises_panico", "Você tem tido crises de pânico?"),
-            ("uso_substancias", "Você tem feito uso de substâncias (álcool/drogas)?"),
-            ("alucinacoes_delirios", "⚠️ Você tem tido alucinações ou delírios?"),
-            ("problemas_sono", "Você tem problemas de sono?"),
-            ("problemas_alimentares", "Você tem problemas alimentares?"),
-            ("luto_recente", "Você passou por um luto recente?"),
-            ("violencia_domestica", "⚠️ Você sofreu violência doméstica?"),
-            ("dificuldade_relacionamentos", "Você tem dificuldades nos relacionamentos?")
-        ]
+        valor = instrumento.interpretar(mensagem)
+        if valor is None:
+            return instrumento.repetir(min(indice, total - 1))
         
-        # Verificar resposta sim/não
-        resposta_lower = mensagem.lower().strip()
-        resposta_bool = None
-        
-        if resposta_lower in ['sim', 's', 'yes', 'y', '1']:
-            resposta_bool = True
-        elif resposta_lower in ['não', 'nao', 'n', 'no', '0']:
-            resposta_bool = False
-        
-        if resposta_bool is not None:
-            # Salvar resposta
-            if sessao['pergunta_motivo_atual'] < len(perguntas_motivos):
-                campo, _ = perguntas_motivos[sessao['pergunta_motivo_atual']]
-                setattr(sessao["sintomas"], campo, resposta_bool)
-                sessao['pergunta_motivo_atual'] += 1
-                
-                # Verificar emergência em tempo real
-                if resposta_bool and campo in ['pensamentos_suicidas', 'alucinacoes_delirios', 'violencia_domestica']:
-                    logger.critical(f"🚨 MOTIVO CRÍTICO DETECTADO: {campo}")
-                    return self.ativar_protocolo_urgente(user_id)
-                
-                # Próxima pergunta ou avançar
-                if sessao['pergunta_motivo_atual'] < len(perguntas_motivos):
-                    proxima_pergunta = perguntas_motivos[sessao['pergunta_motivo_atual']][1]
-                    numero = sessao['pergunta_motivo_atual'] + 1
-                    return f"**MOTIVO {numero}/12:** {proxima_pergunta}\n\n*Responda: SIM ou NÃO*"
-                else:
-                    # Terminou motivos, ir para escala
-                    sessao["etapa"] = EtapaTriagem.SINTOMAS_ESCALA
-                    return self.iniciar_escala_sintomas()
+        # Questionário já respondido por inteiro
+        if indice >= total:
+            return "Erro no processamento. Tente novamente."
         
-        # Primeira pergunta ou resposta inválida
-        pergunta_atual = perguntas_motivos[sessao['pergunta_motivo_atual']][1]
-        numero = sessao['pergunta_motivo_atual'] + 1
+        # Salvar resposta
+        pergunta = instrumento.perguntas[indice]
+        setattr(sessao.sintomas, pergunta.campo, valor)
+        setattr(sessao, instrumento.contador, indice + 1)
         
-        return f"""📋 **MOTIVOS DA BUSCA**
-
-Vou fazer 12 perguntas sobre o que te trouxe aqui.
-Responda apenas **SIM** ou **NÃO** para cada uma.
-
-**MOTIVO {numero}/12:** {pergunta_atual}
-
-*Responda: SIM ou NÃO*"""
+        # Verificar emergência em tempo real
+        if pergunta.critica(valor):
+            logger.critical(f"🚨 {instrumento.rotulo} CRÍTICO DETECTADO: {pergunta.campo} = {valor}")
+            return self.ativar_protocolo_urgente(user_id)
+        
+        # Próxima pergunta ou avançar
+        if indice + 1 < total:
+            return instrumento.perguntas[indice + 1].mensagem
+        
+        return self.concluir_instrumento(instrumento, user_id)
+    
+    def concluir_instrumento(self, instrumento: Instrumento, user_id: str) -> str:
+        """Avançar para o próximo questionário ou finalizar a triagem"""
+        if instrumento.proxima_etapa is None:
+            return self.finalizar_triagem_completa(user_id)
+        
+        self.sessoes[user_id].etapa = EtapaTriagem(instrumento.proxima_etapa)
+        return QUESTIONARIO[instrumento.proxima_etapa].abertura
+    
+    def processar_motivos_busca(self, mensagem: str, user_id: str) -> str:
+        """Processar motivos da busca (12 perguntas sim/não)"""
+        return self.processar_instrumento(QUESTIONARIO["motivos_busca"], mensagem, user_id)
     
     def iniciar_escala_sintomas(self) -> str:
         """Iniciar escala de sintomas"""
-        return """📊 **ESCALA DE SINTOMAS**
-
-Agora vou avaliar a intensidade dos seus sintomas.
-Para cada pergunta, responda de **0 a 4**:
-
-• **0** = Nada/Nunca
-• **1** = Pouco/Raramente  
-• **2** = Moderado/Às vezes
-• **3** = Bastante/Frequentemente
-• **4** = Muito/Sempre
-
-**SINTOMA 1/10:** Qual o nível da sua ansiedade nas últimas 2 semanas?
-
-*Responda de 0 a 4*"""
+        return QUESTIONARIO["sintomas_escala"].abertura
     
     def processar_sintomas_escala(self, mensagem: str, user_id: str) -> str:
         """Processar escala de sintomas (10 perguntas 0-4)"""
-        sessao = self.sessoes[user_id]
-        
-        # Lista de perguntas da escala
-        perguntas_escala = [
-            ("ansiedade", "Qual o nível da sua ansiedade nas últimas 2 semanas?"),
-            ("tristeza", "Qual o nível da sua tristeza/depressão?"),
-            ("irritabilidade", "Qual o nível da sua irritabilidade?"),
-            ("insonia", "Qual o nível dos seus problemas de sono?"),
-            ("ideacao_suicida", "⚠️ Qual a intensidade de pensamentos sobre morte/suicídio?"),
-            ("tentativa_suicidio", "⚠️ Já tentou se machucar ou se matar? (0=nunca, 4=recentemente)"),
-            ("alucinacoes", "⚠️ Qual a frequência de ver/ouvir coisas que outros não veem?"),
-            ("choro", "Qual a frequência de episódios de choro?"),
-            ("isolamento", "Qual o nível do seu isolamento social?"),
-            ("abuso_substancias", "Qual o nível do uso de álcool/drogas?")
-        ]
-        
-        # Verificar resposta 0-4
-        try:
-            pontuacao = int(mensagem.strip())
-            if pontuacao < 0 or pontuacao > 4:
-                raise ValueError
-        except (ValueError, TypeError):
-            return "Por favor, responda apenas com um número de **0 a 4**."
-        
-        # Salvar resposta
-        if sessao['pergunta_sintoma_atual'] < len(perguntas_escala):
-            campo, _ = perguntas_escala[sessao['pergunta_sintoma_atual']]
-            setattr(sessao["sintomas"], campo, pontuacao)
-            sessao['pergunta_sintoma_atual'] += 1
-            
-            # Verificar emergência em tempo real
-            if campo in ['ideacao_suicida', 'tentativa_suicidio', 'alucinacoes'] and pontuacao >= 3:
-                logger.critical(f"🚨 SINTOMA CRÍTICO DETECTADO: {campo} = {pontuacao}")
-                return self.ativar_protocolo_urgente(user_id)
-            
-            # Próxima pergunta ou finalizar
-            if sessao['pergunta_sintoma_atual'] < len(perguntas_escala):
-                proxima_pergunta = perguntas_escala[sessao['pergunta_sintoma_atual']][1]
-                numero = sessao['pergunta_sintoma_atual'] + 1
-                return f"**SINTOMA {numero}/10:** {proxima_pergunta}\n\n*Responda de 0 a 4*"
-            else:
-                # Terminou escala, finalizar triagem
-                return self.finalizar_triagem_completa(user_id)
-        
-        return "Erro no processamento. Tente novamente."
+        return self.processar_instrumento(QUESTIONARIO["sintomas_escala"], mensagem, user_id)
     
     def finalizar_triagem_completa(self, user_id: str) -> str:
         """Finalizar triagem completa COM notificações Telegram"""
         sessao = self.sessoes[user_id]
         
         # Determinar gravidade
-        nivel = self.protocolos.determinar_gravidade(sessao["sintomas"])
+        nivel = self.protocolos.determinar_gravidade(sessao.sintomas)
         acoes, recomendacoes = self.protocolos.gerar_protocolo(nivel)
         
         # Criar resultado
         resultado = TriagemResultado(
-            paciente=sessao["paciente"],
-            sintomas=sessao["sintomas"],
+            paciente=sessao.paciente,
+            sintomas=sessao.sintomas,
             nivel_gravidade=nivel,
             recomendacoes=recomendacoes,
             acoes_imediatas=acoes,
-            data_triagem=datetime.datetime.now()
+            data_triagem=datetime.datetime.now(),
+            duracao_segundos=time.time() - sessao.inicio if sessao.inicio else None
         )
         
-        # Salvar no banco
-        self.db.salvar_triagem(resultado)
-        
-        # NOTIFICAÇÕES TELEGRAM
-        if TELEGRAM_DISPONIVEL:
+        # NOTIFICAÇÕES TELEGRAM: gravadas na outbox junto com a triagem e
+        # entregues em segundo plano, com retry, sem atrasar a resposta
+        notificacoes = []
+        if self.notificacoes and nivel in [GravidadeNivel.URGENTE, GravidadeNivel.INTENSO]:
             resultado_dict = {
                 "paciente": asdict(resultado.paciente),
                 "sintomas": asdict(resultado.sintomas),
@@ -795,28 +1727,24 @@ Para cada pergunta, responda de **0 a 4**:
                 "data_triagem": resultado.data_triagem.isoformat()
             }
             
-            # Notificar casos urgentes e intensos
-            if nivel == GravidadeNivel.URGENTE:
-                logger.info("📱 Enviando notificação URGENTE via Telegram")
-                sucesso = notificar_urgente(resultado_dict)
-                if sucesso:
-                    logger.info("✅ Notificação urgente enviada")
-                else:
-                    logger.error("❌ Falha na notificação urgente")
-            
-            elif nivel == GravidadeNivel.INTENSO:
-                logger.info("📱 Enviando notificação INTENSO via Telegram")
-                sucesso = notificar_intenso(resultado_dict)
-                if sucesso:
-                    logger.info("✅ Notificação intenso enviada")
-                else:
-                    logger.error("❌ Falha na notificação intenso")
+            logger.info(f"📱 Enfileirando notificação {nivel.value.upper()} via Telegram")
+            notificacoes = self.notifier.mensagens_notificacao(nivel.value, resultado_dict)
+        
+        # Salvar no banco (sem Telegram, EntregadorOutbox não foi importado)
+        self.db.salvar_triagem(
+            resultado,
+            notificacoes,
+            EntregadorOutbox.PRIORIDADES.get(nivel.value, 0) if notificacoes else 0
+        )
+        
+        if notificacoes:
+            self.entregador.acordar()
         
         # Gerar resposta
         resposta = self.gerar_resposta_resultado(resultado)
         
         # Adicionar info sobre notificação
-        if TELEGRAM_DISPONIVEL and nivel in [GravidadeNivel.URGENTE, GravidadeNivel.INTENSO]:
+        if self.notificacoes and nivel in [GravidadeNivel.URGENTE, GravidadeNivel.INTENSO]:
             resposta += f"\n\n📱 **Dr. José foi notificado via Telegram sobre este caso {nivel.value}.**"
         
         return resposta
@@ -874,6 +1802,7 @@ def main():
     """Teste direto do chatbot"""
     from rich.console import Console
     
+    inicializar()
     console = Console()
     console.print("[bold blue]🤖 Testando Chatbot com LLaMA Real e 22 Perguntas[/bold blue]")
     
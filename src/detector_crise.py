@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Detector de frases de crise
+Todos os padrões compilados uma única vez em uma só regex
+"""
+
+import re
+from typing import Optional
+
+# Importável como src.detector_crise (raiz no path) ou detector_crise (src/ no path)
+if __package__:
+    from .utils import normalizar_texto
+else:
+    from utils import normalizar_texto
+
+# Padrões sobre texto normalizado (minúsculo e sem acentos):
+# "suicídio" e "suicidio" são o mesmo padrão
+PADROES_CRITICOS = (
+    r"pensando em suicidio",
+    r"quero (me )?matar",
+    r"vou (me )?suicidar",
+    r"quero morrer",
+    r"nao aguento mais",
+    r"nao suporto mais",
+    r"cansei de viver",
+    r"vou acabar com tudo",
+    r"tentei me matar",
+    r"escuto vozes",
+    r"ouco vozes",
+    r"vejo coisas",
+    r"\bsuicidio\b",
+)
+
+class DetectorCrise:
+    """Busca de frases críticas em uma única passada sobre a mensagem"""
+    
+    def __init__(self, padroes=PADROES_CRITICOS):
+        self.padroes = tuple(padroes)
+        
+        # Um grupo nomeado por padrão: lastgroup informa qual disparou
+        alternativas = "|".join(
+            f"(?P<p{indice}>{padrao})" for indice, padrao in enumerate(self.padroes)
+        )
+        self._regex = re.compile(alternativas)
+    
+    def detectar(self, texto: str) -> Optional[str]:
+        """Retorna o padrão que disparou, ou None"""
+        match = self._regex.search(normalizar_texto(texto))
+        if match is None:
+            return None
+        return self.padroes[int(match.lastgroup[1:])]
+
+# Instância global (compilada na importação)
+detector_crise = DetectorCrise()
+
+def main():
+    """Microbenchmark do detector"""
+    import random
+    import time
+    
+    frases = [
+        "Olá, como vai?",
+        "Estou triste hoje, não consegui dormir",
+        "Meu nome é Maria Silva",
+        "123.456.789-00 (11) 99999-9999",
+        "sim",
+        "não",
+        "3",
+        "Tenho tido muita ansiedade no trabalho e em casa ultimamente",
+        "Estou pensando em suicídio",
+        "Não aguento mais essa situação",
+        "Às vezes escuto vozes quando estou sozinho",
+        "Obrigado pela ajuda, boa noite",
+    ]
+    corpus = [random.choice(frases) for _ in range(200_000)]
+    
+    inicio = time.perf_counter()
+    criticas = sum(1 for frase in corpus if detector_crise.detectar(frase))
+    duracao = time.perf_counter() - inicio
+    
+    print(f"{len(corpus)} mensagens em {duracao:.2f}s "
+          f"({len(corpus) / duracao:,.0f} msg/s, {criticas} críticas)")
+
+if __name__ == "__main__":
+    main()
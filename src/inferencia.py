@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Agendador de inferência em micro-lotes
+Junta prompts de sessões concorrentes e roda um único generate()
+"""
+
+import copy
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+# Modos de inferência em CPU (LLM_MODO_CPU)
+MODOS_CPU = ("float32", "bfloat16", "int8")
+
+def quantizar_int8(model):
+    """Quantização dinâmica int8 das projeções lineares (pesos int8, ativações float)
+
+    Camada a camada: cada Conv1D (GPT-2/DialoGPT) ou nn.Linear é trocada pela
+    versão quantizada na hora, então o pico de memória é o de uma camada e não
+    o de uma cópia do modelo. A quantização dinâmica padrão só alcança
+    nn.Linear; sem a troca do Conv1D, nas famílias GPT-2 apenas o lm_head
+    seria quantizado.
+    """
+    import torch
+    from torch.ao.nn.quantized.dynamic import Linear as LinearInt8
+    from torch.ao.quantization import default_dynamic_qconfig
+    from transformers.pytorch_utils import Conv1D
+    
+    for modulo in list(model.modules()):
+        for nome, filho in list(modulo.named_children()):
+            if isinstance(filho, Conv1D):
+                # Conv1D guarda o peso como (entrada, saída); Linear, (saída, entrada)
+                entrada, saida = filho.weight.shape
+                linear = torch.nn.Linear(entrada, saida, device="meta")
+                linear.weight = torch.nn.Parameter(filho.weight.data.t(), requires_grad=False)
+                linear.bias = filho.bias
+            elif type(filho) is torch.nn.Linear:
+                linear = filho
+            else:
+                continue
+            
+            # O bias vai para os pesos empacotados; clonar para não prender
+            # o arquivo mapeado do checkpoint
+            if linear.bias is not None:
+                linear.bias = torch.nn.Parameter(linear.bias.data.clone(), requires_grad=False)
+            linear.qconfig = default_dynamic_qconfig
+            setattr(modulo, nome, LinearInt8.from_float(linear))
+    
+    # O que sobrou em float (embeddings, LayerNorm) também aponta para o
+    # arquivo mapeado e o manteria inteiro residente
+    for parametro in model.parameters():
+        parametro.data = parametro.data.clone()
+    
+    return model
+
+def cpu_suporta_bf16() -> bool:
+    """A CPU tem instruções bf16 (AVX512-BF16/AMX no x86, BF16 no ARM)
+
+    Sem elas o bfloat16 é emulado: economiza memória, mas gera mais devagar
+    que float32.
+    """
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for linha in cpuinfo:
+                if linha.startswith(("flags", "Features")):
+                    flags = set(linha.split(":", 1)[1].split())
+                    return bool(flags & {"avx512_bf16", "amx_bf16", "bf16"})
+    except OSError:
+        pass
+    return False
+
+def carregar_modelo_cpu(nome: str, modo: str = None, token: str = None):
+    """Carregar o modelo para CPU no modo configurado; retorna (modelo, modo)
+
+    O padrão é float32 (saída idêntica à de sempre). bfloat16 só é usado se
+    a CPU suporta; int8 muda levemente as saídas e demora mais para carregar,
+    então só com LLM_MODO_CPU=int8 explícito.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM
+    
+    modo = (modo or os.getenv("LLM_MODO_CPU", "float32")).lower()
+    if modo not in MODOS_CPU:
+        logger.warning(f"⚠️ LLM_MODO_CPU inválido ({modo}), usando float32")
+        modo = "float32"
+    if modo == "bfloat16" and not cpu_suporta_bf16():
+        logger.warning("⚠️ CPU sem suporte a bfloat16, usando float32")
+        modo = "float32"
+    
+    model = AutoModelForCausalLM.from_pretrained(
+        nome,
+        torch_dtype=torch.bfloat16 if modo == "bfloat16" else torch.float32,
+        low_cpu_mem_usage=True,
+        token=token
+    )
+    model.eval()
+    
+    if modo == "int8":
+        model = quantizar_int8(model)
+    
+    return model, modo
+
+class AgendadorInferencia:
+    """Micro-batching de geração de texto
+
+    Cada chamada a submeter() devolve um Future. Uma thread dedicada espera
+    o primeiro prompt, coleta os que chegarem dentro da janela (até
+    max_lote), faz padding à esquerda e executa um generate() em lote: N
+    usuários simultâneos custam ~1 geração em vez de N em série.
+
+    Com um prefixo fixo (o preâmbulo da triagem), o KV-cache dele é
+    calculado uma vez e os prompts que começam por ele só codificam o
+    restante.
+
+    Pedidos em streaming entram na mesma fila e rodam sozinhos nessa mesma
+    thread, entre os lotes: nunca há dois generate() disputando a CPU, e o
+    estado do agendador (cache do prefixo, contadores) só muda nela.
+    """
+    
+    def __init__(self, model, tokenizer,
+                 janela_ms: float = None,
+                 max_lote: int = None,
+                 max_novos_tokens: int = None,
+                 max_tokens_prompt: int = 512,
+                 prefixo: str = ""):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.janela = (janela_ms or float(os.getenv("LLM_JANELA_LOTE_MS", "20"))) / 1000
+        self.max_lote = max_lote or int(os.getenv("LLM_MAX_LOTE", "8"))
+        self.max_tokens_prompt = max_tokens_prompt
+        self.parametros = {
+            "max_new_tokens": max_novos_tokens or int(os.getenv("LLM_MAX_NOVOS_TOKENS", "120")),
+            "do_sample": True,
+            "temperature": 0.7,
+            "pad_token_id": tokenizer.pad_token_id or tokenizer.eos_token_id,
+        }
+        
+        # Modelos decoder-only precisam de padding à esquerda em lote
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = "left"
+        
+        # (prompt, futuro, streamer ou None)
+        self.fila: "queue.Queue[Optional[Tuple[str, Future, object]]]" = queue.Queue()
+        self._adiado: Optional[Tuple[str, Future, object]] = None
+        # Contadores: só a thread do agendador escreve neles
+        self.lotes = 0
+        self.prompts = 0
+        self.tokens_processados = 0
+        self.pedidos_tokenizados = 0
+        self.tokens_reaproveitados = 0
+        
+        self.prefixo = prefixo
+        self._ids_prefixo = None
+        self._cache_prefixo = None
+        if prefixo and os.getenv("LLM_CACHE_PREFIXO", "True").lower() == "true":
+            self._preparar_prefixo()
+        
+        self._thread = threading.Thread(target=self._executar, name="inferencia-lotes", daemon=True)
+        self._thread.start()
+    
+    def _preparar_prefixo(self):
+        """Calcular o past_key_values do prefixo fixo (uma vez por modelo)"""
+        import torch
+        
+        try:
+            inicio = time.perf_counter()
+            ids = self.tokenizer(self.prefixo, return_tensors="pt").input_ids.to(self.model.device)
+            
+            with torch.inference_mode():
+                saida = self.model(input_ids=ids, use_cache=True)
+            
+            self._ids_prefixo = ids
+            self._cache_prefixo = saida.past_key_values
+            logger.info(
+                f"🧠 Cache do prefixo pronto: {ids.shape[1]} tokens "
+                f"em {(time.perf_counter() - inicio) * 1000:.0f} ms"
+            )
+        
+        except Exception as e:
+            logger.warning(f"⚠️ Cache de prefixo indisponível: {e}")
+    
+    def _copiar_cache(self, tamanho_lote: int):
+        """Cópia do cache do prefixo para um lote (generate() altera o cache)"""
+        cache = copy.deepcopy(self._cache_prefixo)
+        if tamanho_lote == 1:
+            return cache
+        if hasattr(cache, "batch_repeat_interleave"):
+            cache.batch_repeat_interleave(tamanho_lote)
+            return cache
+        # Formato legado: tupla de (chave, valor) por camada
+        return tuple(
+            tuple(tensor.repeat_interleave(tamanho_lote, dim=0) for tensor in camada)
+            for camada in cache
+        )
+    
+    def _entradas(self, prompts: List[str]) -> Dict:
+        """Tensores do generate(), reaproveitando o prefixo quando possível"""
+        import torch
+        
+        self.pedidos_tokenizados += len(prompts)
+        usar_prefixo = self._cache_prefixo is not None and all(
+            prompt.startswith(self.prefixo) for prompt in prompts
+        )
+        
+        if not usar_prefixo:
+            entradas = self.tokenizer(
+                prompts,
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=self.max_tokens_prompt
+            ).to(self.model.device)
+            self.tokens_processados += int(entradas["attention_mask"].sum())
+            return dict(entradas)
+        
+        # Só o sufixo é tokenizado; o padding fica entre prefixo e sufixo e
+        # é mascarado pelo attention_mask
+        sufixos = self.tokenizer(
+            [prompt[len(self.prefixo):] for prompt in prompts],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.max_tokens_prompt,
+            add_special_tokens=False
+        ).to(self.model.device)
+        ids_prefixo = self._ids_prefixo.expand(len(prompts), -1)
+        
+        self.tokens_processados += int(sufixos["attention_mask"].sum())
+        self.tokens_reaproveitados += ids_prefixo.numel()
+        
+        return {
+            "input_ids": torch.cat([ids_prefixo, sufixos["input_ids"]], dim=1),
+            "attention_mask": torch.cat([torch.ones_like(ids_prefixo), sufixos["attention_mask"]], dim=1),
+            "past_key_values": self._copiar_cache(len(prompts)),
+        }
+    
+    def _gerar(self, prompts: List[str], **extras) -> Tuple[Dict, object]:
+        """generate() com fallback para o caminho sem cache de prefixo
+
+        Só roda na thread do agendador, então desligar o cache aqui não
+        corre com outro lote que esteja copiando-o.
+        """
+        entradas = self._entradas(prompts)
+        try:
+            return entradas, self.model.generate(**entradas, **self.parametros, **extras)
+        except Exception as e:
+            if "past_key_values" not in entradas:
+                raise
+            logger.warning(f"⚠️ Cache de prefixo desativado: {e}")
+            self._cache_prefixo = None
+            entradas = self._entradas(prompts)
+            return entradas, self.model.generate(**entradas, **self.parametros, **extras)
+    
+    def submeter(self, prompt: str) -> Future:
+        """Enfileirar um prompt; o Future recebe apenas o texto gerado"""
+        futuro: Future = Future()
+        self.fila.put((prompt, futuro, None))
+        return futuro
+    
+    def gerar(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Interface síncrona: submeter e aguardar o resultado"""
+        futuro = self.submeter(prompt)
+        try:
+            return futuro.result(timeout)
+        except TimeoutError:
+            # Se ainda estiver na fila, o agendador descarta o pedido
+            futuro.cancel()
+            raise
+    
+    def transmitir(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Gerar um único prompt em streaming, na vez dele na fila
+
+        O generate() roda na thread do agendador, sozinho (o streamer não
+        aceita lote), e o TextIteratorStreamer entrega os pedaços
+        decodificados à medida que os tokens saem. Se o consumidor desistir
+        antes da vez dele, o pedido é descartado.
+        """
+        from transformers import TextIteratorStreamer
+        
+        streamer = TextIteratorStreamer(
+            self.tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True,
+            timeout=timeout
+        )
+        futuro: Future = Future()
+        self.fila.put((prompt, futuro, streamer))
+        
+        try:
+            for pedaco in streamer:
+                if pedaco:
+                    yield pedaco
+        finally:
+            futuro.cancel()
+        
+        # Propaga o erro da geração (o streamer só sinaliza o fim)
+        futuro.result(timeout)
+    
+    def parar(self):
+        self.fila.put(None)
+        self._thread.join()
+    
+    def metricas(self) -> Dict:
+        return {
+            "lotes": self.lotes,
+            "prompts": self.prompts,
+            "tamanho_medio_lote": round(self.prompts / self.lotes, 2) if self.lotes else 0,
+            "fila": self.fila.qsize(),
+            "cache_prefixo": self._cache_prefixo is not None,
+            "tokens_prompt_por_pedido": round(self.tokens_processados / self.pedidos_tokenizados, 1) if self.pedidos_tokenizados else 0,
+            "tokens_reaproveitados": self.tokens_reaproveitados,
+        }
+    
+    def _coletar_lote(self, primeiro: Tuple[str, Future, object]) -> Tuple[List[Tuple[str, Future, object]], bool]:
+        lote = [primeiro]
+        # Streaming sai sozinho
+        if primeiro[2] is not None:
+            return lote, False
+        prazo = time.monotonic() + self.janela
+        
+        while len(lote) < self.max_lote:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                item = self.fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            if item is None:
+                return lote, True
+            if item[2] is not None:
+                # Streaming roda logo depois deste lote
+                self._adiado = item
+                break
+            lote.append(item)
+        
+        return lote, False
+    
+    def _executar(self):
+        while True:
+            primeiro, self._adiado = self._adiado or self.fila.get(), None
+            if primeiro is None:
+                return
+            
+            lote, parar = self._coletar_lote(primeiro)
+            
+            # Descartar pedidos cancelados antes de gastar CPU com eles
+            lote = [pedido for pedido in lote if pedido[1].set_running_or_notify_cancel()]
+            if lote:
+                self._processar(lote)
+            
+            if parar:
+                return
+    
+    def _processar(self, lote: List[Tuple[str, Future, object]]):
+        import torch
+        
+        # Só um pedido em streaming chega aqui com streamer, e sozinho
+        streamer = lote[0][2]
+        extras = {"streamer": streamer} if streamer is not None else {}
+        try:
+            with torch.inference_mode():
+                entradas, saidas = self._gerar([prompt for prompt, _, _ in lote], **extras)
+            
+            # Só os tokens novos (o prompt ocupa as primeiras posições)
+            novos = saidas[:, entradas["input_ids"].shape[1]:]
+            textos = self.tokenizer.batch_decode(novos, skip_special_tokens=True)
+            
+            self.lotes += 1
+            self.prompts += len(lote)
+            
+            for (_, futuro, _), texto in zip(lote, textos):
+                futuro.set_result(texto)
+        
+        except Exception as e:
+            logger.error(f"❌ Erro na inferência em lote ({len(lote)} prompts): {e}")
+            if streamer is not None:
+                streamer.end()
+            for _, futuro, _ in lote:
+                futuro.set_exception(e)
+
+def benchmark_lotes():
+    """Benchmark vazão x latência com 1, 8 e 32 usuários, com e sem cache do prefixo"""
+    from concurrent.futures import ThreadPoolExecutor
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    from chatbot import PREAMBULO_TRIAGEM
+    
+    nome = os.getenv("MODELO_BENCHMARK", "sshleifer/tiny-gpt2")
+    tokenizer = AutoTokenizer.from_pretrained(nome)
+    model = AutoModelForCausalLM.from_pretrained(nome)
+    
+    prompt = f"{PREAMBULO_TRIAGEM}Usuário: Estou ansioso\n\nResposta empática e profissional:"
+    
+    for usuarios in (1, 8, 32):
+        for max_lote in (1, usuarios):
+            for prefixo in ("", PREAMBULO_TRIAGEM):
+                agendador = AgendadorInferencia(
+                    model, tokenizer, max_lote=max_lote, max_novos_tokens=32, prefixo=prefixo
+                )
+                latencias = []
+                
+                def pedido(_):
+                    inicio = time.perf_counter()
+                    agendador.gerar(prompt)
+                    latencias.append(time.perf_counter() - inicio)
+                
+                inicio = time.perf_counter()
+                with ThreadPoolExecutor(usuarios) as executor:
+                    list(executor.map(pedido, range(usuarios * 4)))
+                duracao = time.perf_counter() - inicio
+                agendador.parar()
+                
+                latencias.sort()
+                metricas = agendador.metricas()
+                print(f"usuários={usuarios:>2} lote={max_lote:>2} "
+                      f"prefixo={'cache' if metricas['cache_prefixo'] else 'não':>5} "
+                      f"tokens/pedido={metricas['tokens_prompt_por_pedido']:5.1f} "
+                      f"vazão={len(latencias) / duracao:6.1f} req/s "
+                      f"p50={latencias[len(latencias) // 2] * 1000:7.1f} ms "
+                      f"p95={latencias[int(len(latencias) * 0.95) - 1] * 1000:7.1f} ms")
+
+def medir_modo_cpu(modo: str):
+    """Medir um modo de CPU neste processo: RSS, carga e tokens/s"""
+    import resource
+    import torch
+    from transformers import AutoTokenizer
+    
+    nome = os.getenv("MODEL_NAME", "microsoft/DialoGPT-medium")
+    tokenizer = AutoTokenizer.from_pretrained(nome)
+    
+    inicio = time.perf_counter()
+    model, modo = carregar_modelo_cpu(nome, modo)
+    carga = time.perf_counter() - inicio
+    
+    entradas = tokenizer("Usuário: Estou ansioso\n\nResposta:", return_tensors="pt")
+    novos = 64
+    with torch.inference_mode():
+        model.generate(**entradas, max_new_tokens=8, pad_token_id=tokenizer.eos_token_id)
+        inicio = time.perf_counter()
+        for _ in range(3):
+            model.generate(
+                **entradas,
+                max_new_tokens=novos,
+                min_new_tokens=novos,
+                do_sample=False,
+                pad_token_id=tokenizer.eos_token_id
+            )
+        duracao = time.perf_counter() - inicio
+    
+    # RSS atual (regime) e pico (inclui temporários da carga/quantização)
+    with open("/proc/self/statm") as statm:
+        rss_mb = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"modo={modo:>8} rss={rss_mb:7.0f} MB pico={pico_mb:7.0f} MB carga={carga:5.1f}s "
+          f"vazão={3 * novos / duracao:6.1f} tokens/s")
+
+def benchmark_modos_cpu():
+    """Cada modo num processo novo, para o RSS de um não contaminar o outro"""
+    import subprocess
+    
+    for modo in MODOS_CPU:
+        subprocess.run([sys.executable, __file__, "cpu", modo], check=False)
+
+def main():
+    """Benchmarks: lotes (padrão) ou modos de CPU (argumento "cpu")"""
+    if len(sys.argv) > 2 and sys.argv[1] == "cpu":
+        medir_modo_cpu(sys.argv[2])
+    elif len(sys.argv) > 1 and sys.argv[1] == "cpu":
+        benchmark_modos_cpu()
+    else:
+        benchmark_lotes()
+
+if __name__ == "__main__":
+    main()
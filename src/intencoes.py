@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Roteador de intenções das respostas demo
+Todas as palavras-chave compiladas uma única vez em uma trie (emitida como regex)
+"""
+
+import re
+from typing import Dict, Optional, Sequence, Tuple
+
+if __package__:
+    from .utils import normalizar_texto
+else:
+    from utils import normalizar_texto
+
+# (intenção, palavras-chave), da maior para a menor prioridade. Palavra-chave
+# terminada em "*" é um radical: casa com qualquer palavra que comece por ele
+# ("morte*" casa "mortes", "matar*" casa "mataria")
+Intencoes = Sequence[Tuple[str, Sequence[str]]]
+RADICAL = "*"
+
+def _montar_trie(palavras) -> Dict:
+    trie = {}
+    for palavra in palavras:
+        no = trie
+        for caractere in palavra:
+            no = no.setdefault(caractere, {})
+        no[""] = True
+    return trie
+
+def _trie_para_regex(no: Dict) -> str:
+    """Alternativas agrupadas por prefixo: "mor(?:rer|te)" em vez de "morrer|morte" """
+    fim = "" in no
+    ramos = []
+    for caractere in sorted(c for c in no if c and c != RADICAL):
+        # Espaço na palavra-chave aceita qualquer sequência de espaços
+        prefixo = r"\s+" if caractere == " " else re.escape(caractere)
+        ramos.append(prefixo + _trie_para_regex(no[caractere]))
+    
+    # Fim de um radical: o resto da palavra é livre
+    if RADICAL in no:
+        ramos.append(r"\w*")
+        fim = False
+    
+    if not ramos:
+        return ""
+    if len(ramos) > 1:
+        return f"(?:{'|'.join(ramos)})" + ("?" if fim else "")
+    return f"(?:{ramos[0]})?" if fim else ramos[0]
+
+class RoteadorIntencoes:
+    """Intenção de uma mensagem em uma única passada sobre o texto
+
+    Palavras-chave e mensagem são comparadas sem acentos e em palavras
+    inteiras ("oi" não casa com "noite"). Se a mensagem tem palavras de
+    várias intenções, vence a de maior prioridade (a primeira da lista).
+    """
+    
+    def __init__(self, intencoes: Intencoes):
+        self.intencoes = tuple(nome for nome, _ in intencoes)
+        
+        # Palavra (ou radical) normalizada -> prioridade da intenção (a
+        # primeira lista vence)
+        self._prioridade: Dict[str, int] = {}
+        self._radicais: Dict[str, int] = {}
+        for prioridade, (nome, palavras) in enumerate(intencoes):
+            for palavra in palavras:
+                chave = " ".join(normalizar_texto(palavra).split())
+                if chave.endswith(RADICAL):
+                    self._radicais.setdefault(chave[:-1], prioridade)
+                else:
+                    self._prioridade.setdefault(chave, prioridade)
+        
+        # Sem \b no início: o padrão começa pelas primeiras letras da trie e o
+        # re salta direto para elas; a fronteira à esquerda é conferida no match
+        trie = _montar_trie(list(self._prioridade) + [radical + RADICAL for radical in self._radicais])
+        self._regex = re.compile(rf"{_trie_para_regex(trie)}\b")
+    
+    def _prioridade_da_palavra(self, palavra: str) -> int:
+        """Menor prioridade entre a palavra exata e os radicais que a iniciam"""
+        candidatas = [self._prioridade[palavra]] if palavra in self._prioridade else []
+        if self._radicais:
+            candidatas.extend(
+                self._radicais[palavra[:tamanho]]
+                for tamanho in range(1, len(palavra) + 1)
+                if palavra[:tamanho] in self._radicais
+            )
+        return min(candidatas)
+    
+    def classificar(self, texto: str) -> Optional[str]:
+        """Intenção da mensagem, ou None se nenhuma palavra-chave aparece"""
+        texto = normalizar_texto(texto)
+        melhor = None
+        for match in self._regex.finditer(texto):
+            inicio = match.start()
+            if inicio and (texto[inicio - 1].isalnum() or texto[inicio - 1] == "_"):
+                continue
+            
+            # Palavra-chave composta com espaços extras ("bom   dia") volta ao
+            # espaço simples
+            prioridade = self._prioridade_da_palavra(" ".join(match.group().split()))
+            if melhor is None or prioridade < melhor:
+                melhor = prioridade
+                if melhor == 0:
+                    break
+        return None if melhor is None else self.intencoes[melhor]
+
+def main():
+    """Benchmark: roteador x varredura de substrings (implementação anterior)"""
+    import random
+    import time
+    
+    intencoes = (
+        ("emergencia", ("suicid*", "matar*", "morte*", "morre*")),
+        ("dificuldades", ("triste*", "deprimid*", "ansiedade*", "angústia*", "preocupad*")),
+        ("saudacao", ("olá", "oi", "hello", "bom dia", "boa tarde", "boa noite")),
+        ("dor", ("dor", "doendo", "machuca", "sofrendo")),
+        ("agradecimento", ("obrigado", "obrigada", "valeu", "thanks")),
+    )
+    
+    # Tabela da implementação anterior, sem radicais
+    substrings = (
+        ("emergencia", ("suicídio", "suicidio", "matar", "morte", "morrer")),
+        ("dificuldades", ("triste", "deprimido", "ansiedade", "angústia", "preocupado")),
+    ) + intencoes[2:]
+    
+    def por_substring(mensagem: str) -> Optional[str]:
+        mensagem = mensagem.lower()
+        for nome, palavras in substrings:
+            if any(palavra in mensagem for palavra in palavras):
+                return nome
+        return None
+    
+    frases = [
+        "Olá, como vai?",
+        "Oi, tudo bem?",
+        "Estou triste hoje, não consegui dormir",
+        "Meu nome é Maria Silva",
+        "Foi um dia difícil no trabalho",
+        "Tenho tido muita ansiedade no trabalho e em casa ultimamente",
+        "Minha cabeça está doendo desde ontem",
+        "Não sei se devo voltar a estudar ou procurar outro emprego agora",
+        "Obrigado pela ajuda, boa noite",
+        "Estou pensando em suicídio",
+        "Penso em mortes",
+        "Eu mataria alguém",
+        "Estou com muita tristeza",
+        "Ele me adora, mas eu me sinto sozinha à noite",
+        "Valeu!",
+    ]
+    corpus = [random.choice(frases) for _ in range(200_000)]
+    roteador = RoteadorIntencoes(intencoes)
+    
+    inicio = time.perf_counter()
+    antigas = [por_substring(frase) for frase in corpus]
+    tempo_antigo = time.perf_counter() - inicio
+    
+    inicio = time.perf_counter()
+    novas = [roteador.classificar(frase) for frase in corpus]
+    tempo_novo = time.perf_counter() - inicio
+    
+    print(f"{len(corpus)} mensagens, {len(roteador._prioridade) + len(roteador._radicais)} palavras-chave")
+    print(f"  substring: {tempo_antigo:.2f}s ({len(corpus) / tempo_antigo:,.0f} msg/s)")
+    print(f"  roteador:  {tempo_novo:.2f}s ({len(corpus) / tempo_novo:,.0f} msg/s)")
+    print("Frases roteadas de forma diferente:")
+    for frase in frases:
+        antes, depois = por_substring(frase), roteador.classificar(frase)
+        if antes != depois:
+            print(f"  {frase!r}: {antes} -> {depois}")
+
+if __name__ == "__main__":
+    main()
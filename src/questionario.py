@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Motor de questionários
+Compila as definições de config/prompts.py num índice imutável por etapa
+"""
+
+import importlib.util
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Optional, Sequence, Tuple, Union
+
+Valor = Union[bool, int]
+
+@dataclass(frozen=True)
+class Pergunta:
+    indice: int
+    campo: str
+    texto: str
+    limite_critico: Optional[int]
+    limite_gravidade: Optional[int]
+    # Textos prontos: a pergunta sozinha e precedida do cabeçalho
+    mensagem: str
+    introducao: str
+    
+    def critica(self, valor: Valor) -> bool:
+        return self.limite_critico is not None and valor >= self.limite_critico
+
+@dataclass(frozen=True)
+class Instrumento:
+    etapa: str
+    rotulo: str
+    contador: str
+    perguntas: Tuple[Pergunta, ...]
+    interpretar: Callable[[str], Optional[Valor]]
+    resposta_invalida: Optional[str]
+    proxima_etapa: Optional[str]
+    
+    @property
+    def abertura(self) -> str:
+        """Texto ao entrar no instrumento vindo da etapa anterior"""
+        return self.perguntas[0].introducao
+    
+    def repetir(self, indice: int) -> str:
+        """Resposta a uma entrada inválida na pergunta `indice`"""
+        return self.resposta_invalida or self.perguntas[indice].introducao
+
+def _interpretar_sim_nao(definicao: Dict) -> Callable[[str], Optional[bool]]:
+    respostas = {texto: True for texto in definicao["sim"]}
+    respostas.update({texto: False for texto in definicao["nao"]})
+    
+    def interpretar(mensagem: str) -> Optional[bool]:
+        return respostas.get(mensagem.lower().strip())
+    
+    return interpretar
+
+def _interpretar_escala(definicao: Dict) -> Callable[[str], Optional[int]]:
+    minimo, maximo = definicao["minimo"], definicao["maximo"]
+    
+    def interpretar(mensagem: str) -> Optional[int]:
+        try:
+            valor = int(mensagem.strip())
+        except (ValueError, TypeError):
+            return None
+        return valor if minimo <= valor <= maximo else None
+    
+    return interpretar
+
+# Tipos de resposta aceitos em "resposta": {"tipo": ...}
+INTERPRETADORES = {
+    "sim_nao": _interpretar_sim_nao,
+    "escala": _interpretar_escala,
+}
+
+def compilar(definicoes: Sequence[Dict]) -> Mapping[str, Instrumento]:
+    """Validar as definições e montar o índice etapa -> Instrumento"""
+    instrumentos = {}
+    
+    for definicao in definicoes:
+        etapa = definicao["etapa"]
+        if etapa in instrumentos:
+            raise ValueError(f"Etapa duplicada no questionário: {etapa}")
+        
+        tipo = definicao["resposta"]["tipo"]
+        if tipo not in INTERPRETADORES:
+            raise ValueError(f"Tipo de resposta desconhecido em {etapa}: {tipo}")
+        
+        total = len(definicao["perguntas"])
+        cabecalho = definicao["cabecalho"].format(total=total)
+        perguntas = []
+        
+        for indice, item in enumerate(definicao["perguntas"]):
+            mensagem = f"**{definicao['rotulo']} {indice + 1}/{total}:** {item['texto']}\n\n{definicao['instrucao']}"
+            perguntas.append(Pergunta(
+                indice=indice,
+                campo=item["campo"],
+                texto=item["texto"],
+                limite_critico=item.get("limite_critico"),
+                limite_gravidade=item.get("limite_gravidade", item.get("limite_critico")),
+                mensagem=mensagem,
+                introducao=f"{cabecalho}\n\n{mensagem}"
+            ))
+        
+        instrumentos[etapa] = Instrumento(
+            etapa=etapa,
+            rotulo=definicao["rotulo"],
+            contador=definicao["contador"],
+            perguntas=tuple(perguntas),
+            interpretar=INTERPRETADORES[tipo](definicao["resposta"]),
+            resposta_invalida=definicao.get("resposta_invalida"),
+            proxima_etapa=definicao.get("proxima_etapa")
+        )
+    
+    for instrumento in instrumentos.values():
+        proxima = instrumento.proxima_etapa
+        if proxima is not None and proxima not in instrumentos:
+            raise ValueError(f"Etapa seguinte desconhecida em {instrumento.etapa}: {proxima}")
+    
+    return MappingProxyType(instrumentos)
+
+def validar_campos(questionario: Mapping[str, Instrumento], campos: Sequence[str]):
+    """Garantir que toda pergunta grava num campo existente da avaliação"""
+    for instrumento in questionario.values():
+        for pergunta in instrumento.perguntas:
+            if pergunta.campo not in campos:
+                raise ValueError(f"Campo desconhecido em {instrumento.etapa}: {pergunta.campo}")
+
+def carregar_definicoes(caminho: Path = None) -> Sequence[Dict]:
+    """Ler INSTRUMENTOS de config/prompts.py (pelo caminho: src/ e a raiz
+    nem sempre estão juntos no sys.path)"""
+    caminho = caminho or Path(__file__).parent.parent / "config" / "prompts.py"
+    spec = importlib.util.spec_from_file_location("config_prompts", caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo.INSTRUMENTOS
+
+# Índice global (compilado na importação)
+QUESTIONARIO = compilar(carregar_definicoes())
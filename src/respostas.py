@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Respostas do bot
+Textos determinísticos montados uma vez e cache LRU das respostas do modelo
+(as perguntas dos questionários já saem prontas de questionario.compilar)
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+if __package__:
+    from .utils import normalizar_texto
+else:
+    from utils import normalizar_texto
+
+def _montar_tabela() -> Dict[Tuple[str, int, str], str]:
+    """Respostas fixas fora dos questionários, por (etapa, índice, variante)"""
+    tabela = {}
+    
+    tabela[("fallback", 0, "urgente")] = """🚨 **PROTOCOLO URGENTE ATIVADO** 🚨
+
+Identifiquei sinais que requerem atenção IMEDIATA.
+
+✅ Dr. José será notificado AGORA
+✅ Contato familiar será acionado
+✅ SAMU 192 disponível se necessário
+
+**VOCÊ NÃO ESTÁ SOZINHO(A)!**
+
+Me diga: você está em local seguro?"""
+    tabela[("fallback", 0, "saudacao")] = """🏥 Olá! Sou seu assistente de triagem psicológica.
+
+Estou aqui para avaliar sua situação atual de forma confidencial e profissional.
+
+Para começar, pode me dizer seu nome completo?"""
+    tabela[("fallback", 0, "padrao")] = "Entendo. Continue me contando mais sobre como você está se sentindo."
+    
+    # Uma única instância de cada texto no processo
+    return {chave: sys.intern(texto) for chave, texto in tabela.items()}
+
+# Tabela global (montada na importação)
+RESPOSTAS = _montar_tabela()
+
+def resposta(etapa: str, indice: int = 0, variante: str = "pergunta") -> str:
+    """Texto fixo de uma etapa/pergunta"""
+    return RESPOSTAS[(etapa, indice, variante)]
+
+class CacheRespostas:
+    """LRU das respostas do modelo, por prompt normalizado"""
+    
+    def __init__(self, max_itens: int = None):
+        self.max_itens = max_itens if max_itens is not None else int(os.getenv("LLM_CACHE_RESPOSTAS", "1024"))
+        self._itens: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+    
+    @staticmethod
+    def chave(prompt: str) -> str:
+        """Minúsculo, sem acentos e com espaços colapsados"""
+        return " ".join(normalizar_texto(prompt).split())
+    
+    def get(self, prompt: str) -> Optional[str]:
+        chave = self.chave(prompt)
+        with self._lock:
+            texto = self._itens.get(chave)
+            if texto is None:
+                self.faltas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return texto
+    
+    def salvar(self, prompt: str, texto: str):
+        if self.max_itens <= 0 or not texto:
+            return
+        chave = self.chave(prompt)
+        with self._lock:
+            self._itens[chave] = texto
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+    
+    def metricas(self) -> Dict:
+        consultas = self.acertos + self.faltas
+        return {
+            "itens": len(self._itens),
+            "max_itens": self.max_itens,
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "taxa_acerto": round(self.acertos / consultas, 3) if consultas else 0.0,
+            "respostas_fixas": len(RESPOSTAS),
+        }
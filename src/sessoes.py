@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Armazenamento de sessões de triagem
+LRU limitado + expiração por inatividade, com métricas
+"""
+
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+from loguru import logger
+
+def tamanho_profundo(obj: Any, vistos: Optional[set] = None) -> int:
+    """Estimativa em bytes de um objeto e tudo que ele referencia"""
+    if vistos is None:
+        vistos = set()
+    # Classes e membros de Enum são compartilhados, não pertencem à sessão
+    if id(obj) in vistos or isinstance(obj, (type, Enum)):
+        return 0
+    vistos.add(id(obj))
+    
+    tamanho = sys.getsizeof(obj)
+    
+    if isinstance(obj, dict):
+        tamanho += sum(tamanho_profundo(k, vistos) + tamanho_profundo(v, vistos)
+                       for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        tamanho += sum(tamanho_profundo(item, vistos) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        tamanho += tamanho_profundo(vars(obj), vistos)
+    
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            tamanho += tamanho_profundo(getattr(obj, slot), vistos)
+    
+    return tamanho
+
+class ArmazemSessoes:
+    """Sessões por user_id com limite de tamanho (LRU) e TTL de inatividade
+
+    Interface de dicionário (in, [], del, len) para substituir o dict usado
+    antes. A ordem do OrderedDict é a ordem de último acesso, então as
+    sessões expiradas ficam sempre no início e saem em O(expiradas).
+    """
+    
+    def __init__(self, max_sessoes: int = None, ttl_segundos: float = None):
+        self.max_sessoes = max_sessoes or int(os.getenv("SESSOES_MAX", "10000"))
+        self.ttl_segundos = ttl_segundos or float(os.getenv("SESSOES_TTL_SEGUNDOS", "7200"))
+        
+        self._sessoes: "OrderedDict[str, list]" = OrderedDict()   # user_id -> [sessao, ultimo_acesso]
+        self._lock = threading.RLock()
+        
+        self.despejos_lru = 0
+        self.expiradas = 0
+    
+    def _expurgar(self, agora: float):
+        limite = agora - self.ttl_segundos
+        while self._sessoes:
+            user_id, (_, ultimo_acesso) = next(iter(self._sessoes.items()))
+            if ultimo_acesso > limite:
+                break
+            del self._sessoes[user_id]
+            self.expiradas += 1
+    
+    def get(self, user_id: str, padrao: Any = None) -> Any:
+        """Sessão do usuário (renova o acesso) ou padrao"""
+        agora = time.monotonic()
+        with self._lock:
+            self._expurgar(agora)
+            entrada = self._sessoes.get(user_id)
+            if entrada is None:
+                return padrao
+            entrada[1] = agora
+            self._sessoes.move_to_end(user_id)
+            return entrada[0]
+    
+    def __getitem__(self, user_id: str) -> Any:
+        sessao = self.get(user_id)
+        if sessao is None:
+            raise KeyError(user_id)
+        return sessao
+    
+    def __setitem__(self, user_id: str, sessao: Any):
+        agora = time.monotonic()
+        with self._lock:
+            self._expurgar(agora)
+            self._sessoes[user_id] = [sessao, agora]
+            self._sessoes.move_to_end(user_id)
+            
+            while len(self._sessoes) > self.max_sessoes:
+                despejado, _ = self._sessoes.popitem(last=False)
+                self.despejos_lru += 1
+                logger.info(f"🧹 Sessão despejada (limite {self.max_sessoes}): {despejado}")
+    
+    def __delitem__(self, user_id: str):
+        with self._lock:
+            del self._sessoes[user_id]
+    
+    def __contains__(self, user_id: str) -> bool:
+        with self._lock:
+            self._expurgar(time.monotonic())
+            return user_id in self._sessoes
+    
+    def __len__(self) -> int:
+        with self._lock:
+            self._expurgar(time.monotonic())
+            return len(self._sessoes)
+    
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._sessoes))
+    
+    def salvar(self, user_id: str, sessao: Any):
+        """Sessões em memória são alteradas no lugar; só renova o acesso"""
+        self[user_id] = sessao
+    
+    def pop(self, user_id: str, padrao: Any = None) -> Any:
+        with self._lock:
+            entrada = self._sessoes.pop(user_id, None)
+        return padrao if entrada is None else entrada[0]
+    
+    def metricas(self, amostra: int = 100) -> Dict:
+        """Sessões ativas, despejos e bytes médios por sessão (amostrados)"""
+        with self._lock:
+            self._expurgar(time.monotonic())
+            ativas = len(self._sessoes)
+            # As mais recentes ficam no final
+            recentes = [entrada[0] for entrada in list(self._sessoes.values())[-amostra:]]
+        
+        bytes_por_sessao = (
+            sum(tamanho_profundo(sessao) for sessao in recentes) / len(recentes)
+            if recentes else 0
+        )
+        
+        return {
+            "sessoes_ativas": ativas,
+            "max_sessoes": self.max_sessoes,
+            "ttl_segundos": self.ttl_segundos,
+            "despejos_lru": self.despejos_lru,
+            "expiradas": self.expiradas,
+            "bytes_por_sessao": round(bytes_por_sessao),
+            "bytes_estimados": round(bytes_por_sessao * ativas),
+        }
+
+class BackendSessoes(ABC):
+    """Armazenamento externo de sessões serializadas (bytes por user_id)"""
+    
+    nome = "base"
+    
+    @abstractmethod
+    def carregar(self, user_id: str) -> Optional[bytes]:
+        """Bytes da sessão, ou None se não existe ou expirou"""
+    
+    @abstractmethod
+    def salvar(self, user_id: str, dados: bytes, ttl_segundos: float):
+        """Gravar a sessão, expirando em `ttl_segundos` sem nova gravação"""
+    
+    @abstractmethod
+    def remover(self, user_id: str):
+        """Apagar a sessão (sem erro se não existe)"""
+    
+    @abstractmethod
+    def contar(self) -> int:
+        """Sessões ainda válidas"""
+
+class BackendSQLite(BackendSessoes):
+    """Sessões em um arquivo SQLite compartilhado pelos workers da máquina"""
+    
+    nome = "sqlite"
+    
+    # Expurgar sessões vencidas a cada N gravações
+    INTERVALO_EXPURGO = 500
+    
+    def __init__(self, caminho: str):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._gravacoes = 0
+        
+        with self._conexao() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessoes (
+                    user_id TEXT PRIMARY KEY,
+                    dados BLOB NOT NULL,
+                    expira_em REAL NOT NULL
+                ) WITHOUT ROWID
+            """)
+    
+    def _conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def carregar(self, user_id: str) -> Optional[bytes]:
+        row = self._conexao().execute(
+            "SELECT dados FROM sessoes WHERE user_id = ? AND expira_em > ?",
+            (user_id, time.time())
+        ).fetchone()
+        return row[0] if row else None
+    
+    def salvar(self, user_id: str, dados: bytes, ttl_segundos: float):
+        conn = self._conexao()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessoes (user_id, dados, expira_em) VALUES (?, ?, ?)",
+                (user_id, dados, time.time() + ttl_segundos)
+            )
+        
+        self._gravacoes += 1
+        if self._gravacoes % self.INTERVALO_EXPURGO == 0:
+            with conn:
+                conn.execute("DELETE FROM sessoes WHERE expira_em <= ?", (time.time(),))
+    
+    def remover(self, user_id: str):
+        conn = self._conexao()
+        with conn:
+            conn.execute("DELETE FROM sessoes WHERE user_id = ?", (user_id,))
+    
+    def contar(self) -> int:
+        return self._conexao().execute(
+            "SELECT COUNT(*) FROM sessoes WHERE expira_em > ?", (time.time(),)
+        ).fetchone()[0]
+
+class BackendRedis(BackendSessoes):
+    """Sessões em qualquer servidor que fale o protocolo Redis (RESP)
+    
+    Cliente mínimo via socket (GET/SET EX/DEL/SCAN), sem dependência extra.
+    URL: redis://[:senha@]host[:porta][/db]
+    """
+    
+    nome = "redis"
+    PREFIXO = "triagem:sessao:"
+    
+    def __init__(self, url: str):
+        partes = urlparse(url)
+        self.host = partes.hostname or "localhost"
+        self.porta = partes.port or 6379
+        self.senha = partes.password
+        self.db = int(partes.path.lstrip("/") or 0)
+        self._local = threading.local()
+    
+    def _conectar(self):
+        sock = socket.create_connection((self.host, self.porta), timeout=5.0)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.leitor = sock.makefile("rb")
+        
+        if self.senha:
+            self._executar("AUTH", self.senha)
+        if self.db:
+            self._executar("SELECT", self.db)
+    
+    def _executar(self, *args) -> Any:
+        partes = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            dado = arg if isinstance(arg, bytes) else str(arg).encode()
+            partes.append(b"$%d\r\n%s\r\n" % (len(dado), dado))
+        
+        self._local.sock.sendall(b"".join(partes))
+        return self._ler_resposta()
+    
+    def _ler_resposta(self) -> Any:
+        linha = self._local.leitor.readline()
+        if not linha:
+            raise ConnectionError("Conexão Redis encerrada")
+        
+        tipo, conteudo = linha[:1], linha[1:-2]
+        if tipo == b"+":
+            return conteudo
+        if tipo == b"-":
+            raise RuntimeError(f"Erro Redis: {conteudo.decode()}")
+        if tipo == b":":
+            return int(conteudo)
+        if tipo == b"$":
+            tamanho = int(conteudo)
+            if tamanho < 0:
+                return None
+            dado = self._local.leitor.read(tamanho + 2)
+            return dado[:-2]
+        if tipo == b"*":
+            quantidade = int(conteudo)
+            if quantidade < 0:
+                return None
+            return [self._ler_resposta() for _ in range(quantidade)]
+        raise RuntimeError(f"Resposta Redis inválida: {linha!r}")
+    
+    def comando(self, *args) -> Any:
+        """Executar um comando (reconecta uma vez se a conexão caiu)"""
+        for tentativa in range(2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._conectar()
+                return self._executar(*args)
+            except (OSError, ConnectionError):
+                sock = getattr(self._local, "sock", None)
+                if sock is not None:
+                    sock.close()
+                self._local.sock = None
+                if tentativa:
+                    raise
+    
+    def carregar(self, user_id: str) -> Optional[bytes]:
+        return self.comando("GET", self.PREFIXO + user_id)
+    
+    def salvar(self, user_id: str, dados: bytes, ttl_segundos: float):
+        self.comando("SET", self.PREFIXO + user_id, dados, "EX", max(1, int(ttl_segundos)))
+    
+    def remover(self, user_id: str):
+        self.comando("DEL", self.PREFIXO + user_id)
+    
+    def contar(self) -> int:
+        total, cursor = 0, b"0"
+        while True:
+            cursor, chaves = self.comando("SCAN", cursor, "MATCH", self.PREFIXO + "*", "COUNT", 1000)
+            total += len(chaves)
+            if cursor == b"0":
+                return total
+
+class ArmazemSessoesExterno:
+    """Sessões compartilhadas entre workers/máquinas via backend externo
+    
+    Mesma interface de ArmazemSessoes. Cada leitura busca os bytes no
+    backend; se forem iguais aos do cache local, devolve o mesmo objeto
+    (as alterações feitas durante a mensagem continuam nele) e só
+    desserializa quando outro worker mudou a sessão. salvar() grava de volta.
+    """
+    
+    def __init__(self, backend: BackendSessoes,
+                 codificar: Callable[[Any], bytes],
+                 decodificar: Callable[[bytes], Any],
+                 ttl_segundos: float = None,
+                 max_cache: int = None):
+        self.backend = backend
+        self.codificar = codificar
+        self.decodificar = decodificar
+        self.ttl_segundos = ttl_segundos or float(os.getenv("SESSOES_TTL_SEGUNDOS", "7200"))
+        self._cache = ArmazemSessoes(max_sessoes=max_cache, ttl_segundos=self.ttl_segundos)
+    
+    def get(self, user_id: str, padrao: Any = None) -> Any:
+        dados = self.backend.carregar(user_id)
+        if dados is None:
+            self._cache.pop(user_id)
+            return padrao
+        
+        em_cache = self._cache.get(user_id)
+        if em_cache is not None and em_cache[0] == dados:
+            return em_cache[1]
+        
+        sessao = self.decodificar(dados)
+        self._cache[user_id] = (dados, sessao)
+        return sessao
+    
+    def salvar(self, user_id: str, sessao: Any):
+        """Gravar o estado atual da sessão no backend"""
+        dados = self.codificar(sessao)
+        self.backend.salvar(user_id, dados, self.ttl_segundos)
+        self._cache[user_id] = (dados, sessao)
+    
+    def __getitem__(self, user_id: str) -> Any:
+        sessao = self.get(user_id)
+        if sessao is None:
+            raise KeyError(user_id)
+        return sessao
+    
+    def __setitem__(self, user_id: str, sessao: Any):
+        self.salvar(user_id, sessao)
+    
+    def __delitem__(self, user_id: str):
+        self.backend.remover(user_id)
+        self._cache.pop(user_id)
+    
+    def __contains__(self, user_id: str) -> bool:
+        return self.backend.carregar(user_id) is not None
+    
+    def __len__(self) -> int:
+        return self.backend.contar()
+    
+    def pop(self, user_id: str, padrao: Any = None) -> Any:
+        sessao = self.get(user_id, padrao)
+        self.backend.remover(user_id)
+        self._cache.pop(user_id)
+        return sessao
+    
+    def metricas(self) -> Dict:
+        """Sessões no backend e tamanho serializado médio por sessão"""
+        em_cache = [self._cache.get(user_id) for user_id in self._cache]
+        serializados = [entrada[0] for entrada in em_cache if entrada is not None]
+        
+        return {
+            "backend": self.backend.nome,
+            "sessoes_ativas": self.backend.contar(),
+            "sessoes_em_cache": len(serializados),
+            "ttl_segundos": self.ttl_segundos,
+            "bytes_por_sessao": round(
+                sum(len(dados) for dados in serializados) / len(serializados)
+            ) if serializados else 0,
+        }
+
+class LocksSessao:
+    """Locks listrados por user_id: turnos do mesmo usuário em série
+    
+    Cada user_id cai sempre na mesma listra, então duas mensagens seguidas
+    do mesmo usuário (clique duplo, retry do cliente) não avançam a sessão
+    duas vezes; usuários em listras diferentes seguem em paralelo. A memória
+    é fixa (N locks), não um lock por sessão que precisaria ser expurgado.
+    O lock vale dentro do processo: workers diferentes só compartilham o
+    estado da sessão, não a ordem dos turnos.
+    """
+    
+    def __init__(self, listras: int = None):
+        listras = listras or int(os.getenv("SESSOES_LOCKS", "256"))
+        self._locks = tuple(threading.Lock() for _ in range(listras))
+        # Um contador por listra, atualizado só com o lock dela
+        self._esperas = [0] * listras
+    
+    @property
+    def esperas(self) -> int:
+        return sum(self._esperas)
+    
+    @contextmanager
+    def travar(self, user_id: str) -> Iterator[None]:
+        """Segurar a listra do usuário (contando quando precisou esperar)"""
+        listra = hash(user_id) % len(self._locks)
+        lock = self._locks[listra]
+        if not lock.acquire(blocking=False):
+            lock.acquire()
+            self._esperas[listra] += 1
+        try:
+            yield
+        finally:
+            lock.release()
+    
+    def metricas(self) -> Dict:
+        return {"listras": len(self._locks), "esperas": self.esperas}
+
+def criar_armazem_sessoes(codificar: Callable[[Any], bytes],
+                          decodificar: Callable[[bytes], Any],
+                          caminho_sqlite: str,
+                          url: str = None):
+    """Armazém conforme SESSOES_BACKEND: memoria (padrão), sqlite[:///caminho] ou redis://..."""
+    url = url or os.getenv("SESSOES_BACKEND", "memoria")
+    
+    if url == "memoria":
+        return ArmazemSessoes()
+    
+    if url.startswith("sqlite"):
+        # sqlite:///relativo.db, sqlite:////absoluto.db ou só "sqlite"
+        caminho = url.split("://", 1)[1][1:] if "://" in url else caminho_sqlite
+        backend = BackendSQLite(caminho)
+    elif url.startswith("redis://"):
+        backend = BackendRedis(url)
+    else:
+        raise ValueError(f"SESSOES_BACKEND inválido: {url}")
+    
+    logger.info(f"👥 Sessões compartilhadas via {backend.nome}")
+    return ArmazemSessoesExterno(backend, codificar, decodificar)
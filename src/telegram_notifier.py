@@ -6,22 +6,37 @@ Notifica Dr. José sobre casos urgentes e intensos
 
 import os
 import asyncio
+import importlib.util
 import json
+import random
+import threading
+import time
+import weakref
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
-from dataclasses import asdict
+from typing import Optional, Dict, List, Tuple
+from dataclasses import dataclass, asdict
 
 from dotenv import load_dotenv
 from loguru import logger
 
 load_dotenv()
 
-try:
-    import httpx
-    HTTPX_AVAILABLE = True
-except ImportError:
+# httpx só é importado no primeiro envio real (importação custosa)
+HTTPX_AVAILABLE = importlib.util.find_spec("httpx") is not None
+if not HTTPX_AVAILABLE:
     logger.warning("httpx não instalado. Instale com: pip install httpx")
-    HTTPX_AVAILABLE = False
+
+# Pacote h2 habilita HTTP/2 no httpx
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+@dataclass
+class ResultadoEnvio:
+    """Resultado detalhado de um envio (usado pela outbox para reagendar)"""
+    sucesso: bool
+    retry_after: Optional[float] = None   # 429: segundos pedidos pelo Telegram
+    erro: Optional[str] = None
+    definitivo: bool = False              # erro 4xx: não adianta tentar de novo
+    simulado: bool = False                # notificações desativadas: nada saiu
 
 class TelegramNotifier:
     """Sistema de notificações via Telegram"""
@@ -32,7 +47,11 @@ class TelegramNotifier:
         self.admin_chat_id = os.getenv("ADMIN_CHAT_ID")
         
         # URLs da API Telegram
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self.api_url = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+        self.base_url = f"{self.api_url}/bot{self.bot_token}"
+        
+        # Um cliente httpx por event loop (keep-alive entre alertas)
+        self._clientes = weakref.WeakKeyDictionary()
         
         # Configurações
         self.notifications_enabled = os.getenv("TELEGRAM_NOTIFICATIONS", "True").lower() == "true"
@@ -51,37 +70,98 @@ class TelegramNotifier:
         else:
             logger.info("📱 Notificações Telegram desabilitadas")
     
+    def _cliente(self) -> "httpx.AsyncClient":
+        """Cliente HTTP reutilizável do event loop atual"""
+        loop = asyncio.get_running_loop()
+        cliente = self._clientes.get(loop)
+        if cliente is None or cliente.is_closed:
+            import httpx
+            cliente = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=10.0,
+                limits=httpx.Limits(
+                    max_connections=20,
+                    max_keepalive_connections=10,
+                    keepalive_expiry=120.0
+                )
+            )
+            self._clientes[loop] = cliente
+        return cliente
+    
+    async def fechar(self):
+        """Fechar o cliente HTTP do event loop atual"""
+        cliente = self._clientes.pop(asyncio.get_running_loop(), None)
+        if cliente is not None:
+            await cliente.aclose()
+    
     async def enviar_mensagem(self, chat_id: str, texto: str, parse_mode: str = "Markdown") -> bool:
         """Enviar mensagem via Telegram"""
+        resultado = await self.enviar_mensagem_detalhado(chat_id, texto, parse_mode)
+        return resultado.sucesso
+    
+    async def enviar_mensagem_detalhado(self, chat_id: str, texto: str,
+                                        parse_mode: str = "Markdown") -> ResultadoEnvio:
+        """Enviar mensagem informando retry_after e se o erro é definitivo"""
         if not self.notifications_enabled:
             logger.info(f"📱 [SIMULAÇÃO] Mensagem para {chat_id}: {texto[:50]}...")
-            return True
+            return ResultadoEnvio(sucesso=True, simulado=True)
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/sendMessage",
-                    json={
-                        "chat_id": chat_id,
-                        "text": texto,
-                        "parse_mode": parse_mode
-                    },
-                    timeout=10.0
-                )
-                
-                if response.status_code == 200:
-                    logger.info(f"✅ Mensagem enviada para {chat_id}")
-                    return True
-                else:
-                    logger.error(f"❌ Erro ao enviar mensagem: {response.status_code}")
-                    return False
-                    
+            response = await self._cliente().post(
+                f"{self.base_url}/sendMessage",
+                json={
+                    "chat_id": chat_id,
+                    "text": texto,
+                    "parse_mode": parse_mode
+                }
+            )
+            
+            if response.status_code == 200:
+                logger.info(f"✅ Mensagem enviada para {chat_id}")
+                return ResultadoEnvio(sucesso=True)
+            
+            if response.status_code == 429:
+                retry_after = self._extrair_retry_after(response)
+                logger.warning(f"⏳ Telegram limitou envios, tentar em {retry_after:.0f}s")
+                return ResultadoEnvio(sucesso=False, retry_after=retry_after,
+                                      erro="429 Too Many Requests")
+            
+            logger.error(f"❌ Erro ao enviar mensagem: {response.status_code}")
+            return ResultadoEnvio(
+                sucesso=False,
+                erro=f"HTTP {response.status_code}",
+                definitivo=400 <= response.status_code < 500
+            )
+        
         except Exception as e:
             logger.error(f"❌ Erro na API Telegram: {e}")
-            return False
+            return ResultadoEnvio(sucesso=False, erro=str(e))
     
-    async def notificar_caso_urgente(self, resultado_triagem: Dict) -> bool:
-        """Notificar caso urgente para Dr. José"""
+    @staticmethod
+    def _extrair_retry_after(response) -> float:
+        """Segundos de espera pedidos num 429 (corpo JSON ou header)"""
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            pass
+        try:
+            return float(response.headers.get("Retry-After", 30))
+        except ValueError:
+            return 30.0
+    
+    def mensagens_notificacao(self, tipo: str, dados: Dict) -> List[Tuple[str, str]]:
+        """Mensagens (chat_id, texto) de uma notificação, sem enviar"""
+        if tipo == "urgente":
+            return self.mensagens_caso_urgente(dados)
+        elif tipo == "intenso":
+            return self.mensagens_caso_intenso(dados)
+        elif tipo == "relatorio":
+            return self.mensagens_relatorio_diario(dados)
+        logger.warning(f"⚠️ Tipo de notificação não reconhecido: {tipo}")
+        return []
+    
+    def mensagens_caso_urgente(self, resultado_triagem: Dict) -> List[Tuple[str, str]]:
+        """Mensagens do caso urgente para Dr. José (e Admin)"""
         
         paciente = resultado_triagem.get("paciente", {})
         sintomas = resultado_triagem.get("sintomas", {})
@@ -112,22 +192,34 @@ class TelegramNotifier:
 *Sistema de Triagem Psicológica*
         """
         
-        # Enviar para Dr. José
+        mensagens = []
+        
         if self.dr_jose_chat_id:
-            sucesso_dr = await self.enviar_mensagem(self.dr_jose_chat_id, mensagem)
+            mensagens.append((self.dr_jose_chat_id, mensagem))
         else:
-            sucesso_dr = False
             logger.warning("⚠️ Chat ID do Dr. José não configurado")
         
         # Enviar para Admin também em casos urgentes
         if nivel == "urgente" and self.admin_chat_id:
-            mensagem_admin = f"🚨 **CASO URGENTE DETECTADO**\n\n{mensagem}\n\n*Notificação enviada para Dr. José: {'✅' if sucesso_dr else '❌'}*"
-            await self.enviar_mensagem(self.admin_chat_id, mensagem_admin)
+            destino_dr = "✅" if self.dr_jose_chat_id else "❌ não configurado"
+            mensagem_admin = f"🚨 **CASO URGENTE DETECTADO**\n\n{mensagem}\n\n*Notificação simultânea para Dr. José: {destino_dr}*"
+            mensagens.append((self.admin_chat_id, mensagem_admin))
         
-        return sucesso_dr
+        return mensagens
     
-    async def notificar_caso_intenso(self, resultado_triagem: Dict) -> bool:
-        """Notificar caso intenso para Dr. José"""
+    async def notificar_caso_urgente(self, resultado_triagem: Dict) -> bool:
+        """Notificar caso urgente para Dr. José"""
+        mensagens = self.mensagens_caso_urgente(resultado_triagem)
+        
+        # Dr. José e Admin recebem em paralelo
+        resultados = await asyncio.gather(
+            *(self.enviar_mensagem(chat_id, texto) for chat_id, texto in mensagens)
+        )
+        
+        return bool(self.dr_jose_chat_id) and resultados[0]
+    
+    def mensagens_caso_intenso(self, resultado_triagem: Dict) -> List[Tuple[str, str]]:
+        """Mensagem do caso intenso para Dr. José"""
         
         paciente = resultado_triagem.get("paciente", {})
         sintomas = resultado_triagem.get("sintomas", {})
@@ -152,15 +244,26 @@ class TelegramNotifier:
         """
         
         if self.dr_jose_chat_id:
-            return await self.enviar_mensagem(self.dr_jose_chat_id, mensagem)
+            return [(self.dr_jose_chat_id, mensagem)]
         else:
             logger.warning("⚠️ Chat ID do Dr. José não configurado")
+            return []
+    
+    async def notificar_caso_intenso(self, resultado_triagem: Dict) -> bool:
+        """Notificar caso intenso para Dr. José"""
+        mensagens = self.mensagens_caso_intenso(resultado_triagem)
+        if not mensagens:
             return False
+        
+        chat_id, texto = mensagens[0]
+        return await self.enviar_mensagem(chat_id, texto)
     
-    async def relatorio_diario(self, estatisticas: Dict) -> bool:
-        """Enviar relatório diário de triagens"""
+    def mensagens_relatorio_diario(self, estatisticas: Dict) -> List[Tuple[str, str]]:
+        """Mensagens do relatório diário para Dr. José e Admin"""
         
-        hoje = datetime.now().strftime('%d/%m/%Y')
+        # 'dia' (ISO) vem de DatabaseManager.relatorio_diario; sem ele, hoje
+        dia = estatisticas.get('dia')
+        hoje = (datetime.fromisoformat(dia) if dia else datetime.now()).strftime('%d/%m/%Y')
         
         mensagem = f"""
 📊 **RELATÓRIO DIÁRIO - {hoje}**
@@ -185,17 +288,18 @@ class TelegramNotifier:
 *Relatório automático - Sistema de Triagem*
         """
         
-        # Enviar para Dr. José e Admin
-        sucesso_dr = False
-        sucesso_admin = False
+        return [(chat_id, mensagem) for chat_id in (self.dr_jose_chat_id, self.admin_chat_id) if chat_id]
+    
+    async def relatorio_diario(self, estatisticas: Dict) -> bool:
+        """Enviar relatório diário de triagens"""
+        mensagens = self.mensagens_relatorio_diario(estatisticas)
         
-        if self.dr_jose_chat_id:
-            sucesso_dr = await self.enviar_mensagem(self.dr_jose_chat_id, mensagem)
+        # Enviar para Dr. José e Admin em paralelo
+        resultados = await asyncio.gather(
+            *(self.enviar_mensagem(chat_id, texto) for chat_id, texto in mensagens)
+        )
         
-        if self.admin_chat_id:
-            sucesso_admin = await self.enviar_mensagem(self.admin_chat_id, mensagem)
-        
-        return sucesso_dr or sucesso_admin
+        return any(resultados)
     
     async def teste_notificacao(self) -> bool:
         """Testar sistema de notificações"""
@@ -227,43 +331,279 @@ class TelegramNotifier:
             logger.warning("⚠️ Chat ID do Admin não configurado para teste")
             return False
     
+    def _coroutine_notificacao(self, tipo: str, dados: Dict):
+        """Coroutine correspondente ao tipo de notificação"""
+        if tipo == "urgente":
+            return self.notificar_caso_urgente(dados)
+        elif tipo == "intenso":
+            return self.notificar_caso_intenso(dados)
+        elif tipo == "relatorio":
+            return self.relatorio_diario(dados)
+        elif tipo == "teste":
+            return self.teste_notificacao()
+        return None
+    
+    async def notificar_async(self, tipo: str, dados: Dict) -> bool:
+        """Interface assíncrona para notificações"""
+        coro = self._coroutine_notificacao(tipo, dados)
+        if coro is None:
+            logger.warning(f"⚠️ Tipo de notificação não reconhecido: {tipo}")
+            return False
+        return await coro
+    
     def notificar_sync(self, tipo: str, dados: Dict) -> bool:
         """Interface síncrona para notificações"""
+        async def _notificar_e_fechar():
+            try:
+                return await self.notificar_async(tipo, dados)
+            finally:
+                # O loop de asyncio.run morre aqui; não deixar cliente órfão
+                await self.fechar()
+        
         try:
-            if tipo == "urgente":
-                return asyncio.run(self.notificar_caso_urgente(dados))
-            elif tipo == "intenso":
-                return asyncio.run(self.notificar_caso_intenso(dados))
-            elif tipo == "relatorio":
-                return asyncio.run(self.relatorio_diario(dados))
-            elif tipo == "teste":
-                return asyncio.run(self.teste_notificacao())
-            else:
-                logger.warning(f"⚠️ Tipo de notificação não reconhecido: {tipo}")
-                return False
+            return asyncio.run(_notificar_e_fechar())
         except Exception as e:
             logger.error(f"❌ Erro na notificação síncrona: {e}")
             return False
 
-# Instância global
-telegram_notifier = TelegramNotifier()
+class EntregadorOutbox:
+    """Entrega confiável das mensagens gravadas na outbox do banco
+    
+    As mensagens são gravadas na mesma transação da triagem; esta thread as
+    reserva em lotes (com prazo, para não duplicar entre workers), envia em
+    paralelo e reagenda falhas com backoff exponencial, respeitando o
+    retry_after dos 429 do Telegram.
+    """
+    
+    # Ordem de saída da fila: URGENTE sempre antes de INTENSO e relatórios
+    PRIORIDADES = {
+        "urgente": 0,
+        "intenso": 1,
+        "relatorio": 2,
+        "teste": 2,
+    }
+    
+    LOTE = 20
+    BACKOFF_BASE = 5.0        # segundos
+    BACKOFF_MAX = 3600.0
+    MAX_TENTATIVAS = 12
+    INTERVALO_VARREDURA = 30.0
+    
+    def __init__(self, notifier: TelegramNotifier, db):
+        self.notifier = notifier
+        self.db = db
+        self._evento = threading.Event()
+        self._parar = threading.Event()
+        self._pausa_ate = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def iniciar(self):
+        """Iniciar a thread de entrega (idempotente)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(
+                target=self._executar,
+                name="telegram-outbox",
+                daemon=True
+            )
+            self._thread.start()
+    
+    def acordar(self):
+        """Avisar que há mensagens novas na outbox"""
+        self._evento.set()
+    
+    def parar(self, timeout: float = 15.0):
+        """Encerrar a thread (mensagens pendentes continuam na outbox)"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        
+        if thread and thread.is_alive():
+            self._parar.set()
+            self._evento.set()
+            thread.join(timeout)
+    
+    def calcular_atraso(self, tentativas: int, retry_after: Optional[float] = None) -> float:
+        """Atraso até a próxima tentativa (retry_after tem precedência)"""
+        if retry_after is not None:
+            return retry_after
+        atraso = min(self.BACKOFF_BASE * 2 ** (tentativas - 1), self.BACKOFF_MAX)
+        return atraso * random.uniform(0.8, 1.2)
+    
+    async def drenar(self) -> int:
+        """Enviar um lote de mensagens vencidas; retorna quantas foram processadas"""
+        if time.time() < self._pausa_ate:
+            return 0
+        
+        pendentes = self.db.reservar_notificacoes(self.LOTE)
+        if pendentes:
+            await asyncio.gather(*(self._entregar(item) for item in pendentes))
+        return len(pendentes)
+    
+    async def _entregar(self, item: Dict):
+        resultado = await self.notifier.enviar_mensagem_detalhado(
+            item["chat_id"], item["texto"], item["parse_mode"]
+        )
+        
+        if resultado.simulado:
+            # Sem token não houve envio: não conta como notificação enviada
+            self.db.marcar_notificacao_simulada(item["id"])
+            return
+        
+        if resultado.sucesso:
+            self.db.marcar_notificacao_enviada(item["id"])
+            return
+        
+        tentativas = item["tentativas"] + 1
+        if resultado.definitivo or tentativas >= self.MAX_TENTATIVAS:
+            logger.error(f"❌ Notificação {item['id']} descartada após {tentativas} tentativas: {resultado.erro}")
+            self.db.marcar_notificacao_falhou(item["id"], tentativas, resultado.erro)
+            return
+        
+        atraso = self.calcular_atraso(tentativas, resultado.retry_after)
+        if resultado.retry_after is not None:
+            # 429 vale para o bot inteiro: pausar a drenagem
+            self._pausa_ate = max(self._pausa_ate, time.time() + atraso)
+        
+        logger.warning(f"🔁 Notificação {item['id']} reagendada em {atraso:.0f}s (tentativa {tentativas})")
+        self.db.reagendar_notificacao(item["id"], tentativas, atraso, resultado.erro)
+    
+    def _executar(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        
+        try:
+            while not self._parar.is_set():
+                try:
+                    processadas = loop.run_until_complete(self.drenar())
+                except Exception as e:
+                    logger.error(f"❌ Erro na entrega da outbox: {e}")
+                    processadas = 0
+                
+                if processadas == 0:
+                    espera = self.INTERVALO_VARREDURA
+                    if self._pausa_ate > time.time():
+                        espera = min(espera, self._pausa_ate - time.time())
+                    self._evento.wait(espera)
+                    self._evento.clear()
+        finally:
+            loop.run_until_complete(self.notifier.fechar())
+            loop.close()
+
+class AgendadorRelatorio:
+    """Envio do relatório diário no horário configurado
+    
+    No horário (RELATORIO_DIARIO_HORARIO, "HH:MM"; vazio desativa) grava o
+    relatório do dia na outbox, que cuida da entrega. A reserva é feita no
+    banco, então vários workers agendados enviam uma vez só; um processo que
+    sobe depois do horário envia o relatório do dia se ninguém enviou.
+    """
+    
+    def __init__(self, notifier: TelegramNotifier, db,
+                 entregador: Optional[EntregadorOutbox] = None, horario: str = None):
+        self.notifier = notifier
+        self.db = db
+        self.entregador = entregador
+        horario = os.getenv("RELATORIO_DIARIO_HORARIO", "23:55") if horario is None else horario
+        self.horario = datetime.strptime(horario, "%H:%M").time() if horario.strip() else None
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def iniciar(self):
+        """Iniciar a thread do agendamento (idempotente)"""
+        if self.horario is None:
+            logger.info("📊 Relatório diário automático desativado")
+            return
+        
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(
+                target=self._executar,
+                name="relatorio-diario",
+                daemon=True
+            )
+            self._thread.start()
+        logger.info(f"📊 Relatório diário agendado para {self.horario.strftime('%H:%M')}")
+    
+    def parar(self, timeout: float = 5.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        
+        if thread and thread.is_alive():
+            self._parar.set()
+            thread.join(timeout)
+    
+    def enviar(self, dia=None) -> Optional[Dict]:
+        """Enfileirar o relatório de `dia` (padrão: hoje) se ainda não foi"""
+        dia = dia or datetime.now().date()
+        estatisticas = self.db.enfileirar_relatorio_diario(
+            dia,
+            self.notifier.mensagens_relatorio_diario,
+            EntregadorOutbox.PRIORIDADES["relatorio"]
+        )
+        if estatisticas is not None and self.entregador is not None:
+            self.entregador.acordar()
+        return estatisticas
+    
+    def _executar(self):
+        # Começa pelo horário de hoje: se já passou, envia agora (se pendente)
+        alvo = datetime.combine(datetime.now().date(), self.horario)
+        
+        while True:
+            espera = (alvo - datetime.now()).total_seconds()
+            if espera > 0 and self._parar.wait(espera):
+                return
+            
+            try:
+                self.enviar(alvo.date())
+            except Exception as e:
+                logger.error(f"❌ Erro ao enfileirar relatório diário: {e}")
+            
+            alvo += timedelta(days=1)
+
+# Instância global, criada no primeiro uso (importar o módulo não lê
+# configuração nem cria o cliente HTTP)
+_telegram_notifier: Optional[TelegramNotifier] = None
+_lock_instancias = threading.Lock()
+
+def obter_notifier() -> TelegramNotifier:
+    """Instância global do TelegramNotifier"""
+    global _telegram_notifier
+    with _lock_instancias:
+        if _telegram_notifier is None:
+            _telegram_notifier = TelegramNotifier()
+        return _telegram_notifier
+
+def __getattr__(nome: str):
+    # Compatibilidade: telegram_notifier.telegram_notifier
+    if nome == "telegram_notifier":
+        return obter_notifier()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
 
 # Funções de conveniência
+# (envio direto, sem retry; o bot usa a outbox e o EntregadorOutbox)
 def notificar_urgente(resultado_triagem: Dict) -> bool:
     """Notificar caso urgente"""
-    return telegram_notifier.notificar_sync("urgente", resultado_triagem)
+    return obter_notifier().notificar_sync("urgente", resultado_triagem)
 
 def notificar_intenso(resultado_triagem: Dict) -> bool:
     """Notificar caso intenso"""
-    return telegram_notifier.notificar_sync("intenso", resultado_triagem)
+    return obter_notifier().notificar_sync("intenso", resultado_triagem)
 
 def enviar_relatorio_diario(estatisticas: Dict) -> bool:
     """Enviar relatório diário"""
-    return telegram_notifier.notificar_sync("relatorio", estatisticas)
+    return obter_notifier().notificar_sync("relatorio", estatisticas)
 
 def testar_notificacoes() -> bool:
     """Testar sistema de notificações"""
-    return telegram_notifier.notificar_sync("teste", {})
+    return obter_notifier().notificar_sync("teste", {})
 
 def main():
     """Teste direto do sistema"""
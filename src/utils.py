@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Utilitários de texto compartilhados
+"""
+
+import re
+import unicodedata
+
+def _tabela_sem_acentos() -> dict:
+    """Mapa caractere acentuado -> letra base (Latin-1 + Latin Extended-A)"""
+    tabela = {}
+    for codigo in range(0xC0, 0x180):
+        caractere = chr(codigo)
+        base = unicodedata.normalize("NFD", caractere)[0]
+        if base != caractere and base.isascii():
+            tabela[codigo] = base
+    return tabela
+
+_SEM_ACENTOS = _tabela_sem_acentos()
+
+# Só os caracteres acentuados são visitados (str.translate consulta a tabela
+# para cada caractere do texto e é ~2x mais lento em mensagens curtas)
+_LETRA_BASE = {chr(codigo): base for codigo, base in _SEM_ACENTOS.items()}
+_ACENTUADOS = re.compile(f"[{''.join(_LETRA_BASE)}]")
+
+def _letra_base(match: "re.Match") -> str:
+    return _LETRA_BASE[match.group()]
+
+def remover_acentos(texto: str) -> str:
+    """Remover acentos ("suicídio" -> "suicidio") com uma única passada"""
+    return _ACENTUADOS.sub(_letra_base, texto)
+
+def normalizar_texto(texto: str) -> str:
+    """Texto em minúsculas e sem acentos, para comparação"""
+    texto = texto.lower()
+    # Texto ASCII não tem acento: evita o translate (a maioria das mensagens)
+    return texto if texto.isascii() else remover_acentos(texto)
@@ -0,0 +1,93 @@
+function handleKeyPress(event) {
+    if (event.key === 'Enter') {
+        sendMessage();
+    }
+}
+
+function sendMessage() {
+    const input = document.getElementById('messageInput');
+    const message = input.value.trim();
+
+    if (!message) return;
+
+    // Adicionar mensagem do usuário
+    addMessage(message, 'user');
+    input.value = '';
+
+    // Enviar para o servidor (resposta em streaming via SSE)
+    fetch('/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({message: message})
+    })
+    .then(async response => {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        const messageDiv = addMessage('', 'bot');
+        let texto = '';
+        let buffer = '';
+
+        while (true) {
+            const {done, value} = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, {stream: true});
+            const eventos = buffer.split('\n\n');
+            buffer = eventos.pop();
+
+            for (const evento of eventos) {
+                if (!evento.startsWith('data: ')) continue;
+                const dados = JSON.parse(evento.slice(6));
+                if (dados.token) {
+                    texto += dados.token;
+                    messageDiv.innerHTML = `<strong>🤖 Assistente:</strong><br>${texto}`;
+                }
+            }
+        }
+    })
+    .catch(error => {
+        addMessage('❌ Erro de conexão. Tente novamente.', 'bot');
+    });
+}
+
+function addMessage(message, sender) {
+    const chatMessages = document.getElementById('chatMessages');
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${sender}-message`;
+
+    if (sender === 'user') {
+        messageDiv.innerHTML = `<strong>👤 Você:</strong><br>${message}`;
+    } else {
+        messageDiv.innerHTML = `<strong>🤖 Assistente:</strong><br>${message}`;
+    }
+
+    chatMessages.appendChild(messageDiv);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageDiv;
+}
+
+function clearChat() {
+    const chatMessages = document.getElementById('chatMessages');
+    chatMessages.innerHTML = `
+        <div class="message bot-message">
+            <strong>🤖 Assistente:</strong><br>
+            💬 <strong>Nova conversa iniciada!</strong><br><br>
+            Como posso ajudar você hoje?<br><br>
+            <em>Este é um ambiente seguro e confidencial.</em> 💙
+        </div>
+    `;
+}
+
+function emergency() {
+    addMessage('🚨 EMERGÊNCIA', 'user');
+    addMessage(`🚨 <strong>PROTOCOLO DE EMERGÊNCIA</strong> 🚨<br><br>
+        📞 <strong>LIGUE AGORA:</strong><br>
+        • SAMU: 192<br>
+        • CVV: 188<br>
+        • Polícia: 190<br><br>
+        <strong>VOCÊ NÃO ESTÁ SOZINHO!</strong><br><br>
+        Se você está tendo pensamentos suicidas ou está em perigo, ligue para um desses números AGORA.<br><br>
+        💙 Estamos aqui para você.`, 'bot');
+}
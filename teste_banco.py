@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark do DatabaseManager: conexão por chamada (antes) x conexões
+persistentes por thread com WAL (depois)
+Mede triagens gravadas por segundo, com 1 e várias threads, e a latência de
+buscar_triagem_anterior, sempre em bancos temporários
+"""
+
+import argparse
+import datetime
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+# Adicionar src ao path
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from chatbot import (
+    AvaliacaoSintomas, DadosPaciente, DatabaseManager, GravidadeNivel, TriagemResultado,
+)
+
+class BancoPorChamada:
+    """DatabaseManager original: abre e fecha uma conexão a cada chamada"""
+    
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS triagens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                cpf TEXT NOT NULL,
+                dados_paciente TEXT NOT NULL,
+                sintomas TEXT NOT NULL,
+                nivel_gravidade TEXT NOT NULL,
+                pontuacao_total INTEGER NOT NULL,
+                sintomas_criticos BOOLEAN NOT NULL,
+                motivos_positivos INTEGER NOT NULL,
+                data_triagem TIMESTAMP NOT NULL,
+                eh_acompanhamento BOOLEAN DEFAULT FALSE
+            )
+        """)
+        conn.commit()
+        conn.close()
+    
+    def salvar_triagem(self, resultado: TriagemResultado):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            INSERT INTO triagens (
+                cpf, dados_paciente, sintomas, nivel_gravidade,
+                pontuacao_total, sintomas_criticos, motivos_positivos, data_triagem, eh_acompanhamento
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            resultado.paciente.cpf,
+            json.dumps(asdict(resultado.paciente)),
+            json.dumps(asdict(resultado.sintomas)),
+            resultado.nivel_gravidade.value,
+            resultado.sintomas.pontuacao_total,
+            resultado.sintomas.sintomas_criticos,
+            resultado.sintomas.contagem_motivos_positivos,
+            resultado.data_triagem.isoformat(),
+            resultado.eh_acompanhamento
+        ))
+        conn.commit()
+        conn.close()
+    
+    def buscar_triagem_anterior(self, cpf: str):
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute("""
+            SELECT * FROM triagens
+            WHERE cpf = ?
+            ORDER BY data_triagem DESC
+            LIMIT 1
+        """, (cpf,)).fetchone()
+        conn.close()
+        return row
+
+def triagem_aleatoria(cpfs: int) -> TriagemResultado:
+    sintomas = AvaliacaoSintomas(ansiedade=random.randint(0, 4), tristeza=random.randint(0, 4))
+    return TriagemResultado(
+        paciente=DadosPaciente(nome="Paciente Teste", cpf=f"{random.randrange(cpfs):011d}"),
+        sintomas=sintomas,
+        nivel_gravidade=random.choice(list(GravidadeNivel)),
+        recomendacoes=[],
+        acoes_imediatas=[],
+        data_triagem=datetime.datetime.now()
+    )
+
+def medir_gravacao(banco, total: int, threads: int, cpfs: int) -> dict:
+    """Triagens/s com `threads` gravando ao mesmo tempo; conta "database is locked" """
+    erros = []
+    por_thread = total // threads
+    
+    def gravar():
+        for _ in range(por_thread):
+            try:
+                banco.salvar_triagem(triagem_aleatoria(cpfs))
+            except sqlite3.OperationalError as e:
+                erros.append(e)
+    
+    inicio = time.perf_counter()
+    trabalhadores = [threading.Thread(target=gravar) for _ in range(threads)]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    segundos = time.perf_counter() - inicio
+    
+    return {"por_segundo": por_thread * threads / segundos, "erros": len(erros)}
+
+def medir_busca(banco, total: int, cpfs: int) -> dict:
+    latencias = []
+    for _ in range(total):
+        cpf = f"{random.randrange(cpfs):011d}"
+        inicio = time.perf_counter()
+        banco.buscar_triagem_anterior(cpf)
+        latencias.append(time.perf_counter() - inicio)
+    latencias.sort()
+    return {"p50_ms": latencias[total // 2] * 1000, "p99_ms": latencias[int(total * 0.99)] * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do DatabaseManager (antes x depois)")
+    parser.add_argument("--triagens", type=int, default=2000, help="Triagens gravadas por medição")
+    parser.add_argument("--threads", type=int, default=8, help="Threads na medição concorrente")
+    parser.add_argument("--buscas", type=int, default=2000, help="Buscas por CPF")
+    parser.add_argument("--cpfs", type=int, default=500, help="CPFs distintos")
+    args = parser.parse_args()
+    
+    # Logs de cada triagem salva distorceriam a medição
+    from loguru import logger
+    logger.remove()
+    
+    with tempfile.TemporaryDirectory() as pasta:
+        bancos = {
+            "antes": BancoPorChamada(Path(pasta) / "antes.db"),
+            "depois": DatabaseManager(Path(pasta) / "depois.db"),
+        }
+        
+        print(f"🧪 {args.triagens} triagens por medição, {args.buscas} buscas, {args.cpfs} CPFs")
+        print(f"{'':>8} {'grav/s 1 thr':>13} {f'grav/s {args.threads} thr':>13} {'locked':>7} "
+              f"{'busca p50':>10} {'busca p99':>10}")
+        for nome, banco in bancos.items():
+            sequencial = medir_gravacao(banco, args.triagens, 1, args.cpfs)
+            concorrente = medir_gravacao(banco, args.triagens, args.threads, args.cpfs)
+            busca = medir_busca(banco, args.buscas, args.cpfs)
+            print(f"{nome:>8} {sequencial['por_segundo']:>13,.0f} {concorrente['por_segundo']:>13,.0f} "
+                  f"{sequencial['erros'] + concorrente['erros']:>7} "
+                  f"{busca['p50_ms']:>8.3f}ms {busca['p99_ms']:>8.3f}ms")
+        
+        bancos["depois"].fechar()
+
+if __name__ == "__main__":
+    main()
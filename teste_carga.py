@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Teste de carga do endpoint /chat de main_render.py
+Sobe o gunicorn com 1, 2, 4... workers e mede requisições/s e latência com
+clientes em processos separados (o cliente não pode ser o gargalo)
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).parent
+MENSAGENS = ["oi", "estou triste", "sinto dor", "obrigado", "não sei o que fazer"]
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def aguardar_servidor(porta: int, limite: float = 30.0):
+    fim = time.time() + limite
+    while time.time() < fim:
+        try:
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=1)
+            conexao.request("GET", "/health")
+            if conexao.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu na porta {porta}")
+
+def cliente(porta: int, duracao: float, fila):
+    """Um cliente keep-alive: POST /chat em sequência até o fim da duração"""
+    conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=10)
+    latencias, erros, reconexoes = [], 0, 0
+    fim = time.perf_counter() + duracao
+    indice = 0
+    
+    while time.perf_counter() < fim:
+        corpo = json.dumps({"message": MENSAGENS[indice % len(MENSAGENS)]})
+        indice += 1
+        inicio = time.perf_counter()
+        try:
+            conexao.request("POST", "/chat", corpo, {"Content-Type": "application/json"})
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status != 200:
+                erros += 1
+        except (OSError, http.client.HTTPException):
+            # Worker reciclado (max_requests) fecha o keep-alive: reconectar
+            reconexoes += 1
+            conexao.close()
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=10)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+    
+    fila.put((latencias, erros, reconexoes))
+
+def medir(workers: int, threads: int, clientes: int, duracao: float) -> dict:
+    porta = porta_livre()
+    ambiente = dict(os.environ, WEB_CONCURRENCY=str(workers), WEB_THREADS=str(threads), PORT=str(porta))
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(RAIZ / "gunicorn.conf.py"),
+         "--bind", f"127.0.0.1:{porta}", "main_render:app"],
+        cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    
+    try:
+        aguardar_servidor(porta)
+        fila = multiprocessing.Queue()
+        processos = [
+            multiprocessing.Process(target=cliente, args=(porta, duracao, fila))
+            for _ in range(clientes)
+        ]
+        for processo in processos:
+            processo.start()
+        resultados = [fila.get() for _ in processos]
+        for processo in processos:
+            processo.join()
+    finally:
+        # SIGTERM = parada graciosa do gunicorn
+        servidor.send_signal(signal.SIGTERM)
+        servidor.wait(30)
+    
+    latencias = sorted(l for parcial, _, _ in resultados for l in parcial)
+    total = len(latencias)
+    return {
+        "workers": workers,
+        "req_s": total / duracao,
+        "p50_ms": latencias[total // 2] * 1000 if total else 0.0,
+        "p99_ms": latencias[int(total * 0.99)] * 1000 if total else 0.0,
+        "erros": sum(erros for _, erros, _ in resultados),
+        "reconexoes": sum(reconexoes for _, _, reconexoes in resultados),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga de /chat (gunicorn)")
+    parser.add_argument("--workers", default="1,2,4", help="Contagens de workers a medir (ex.: 1,2,4)")
+    parser.add_argument("--threads", type=int, default=4, help="Threads por worker")
+    parser.add_argument("--clientes", type=int, default=16, help="Clientes simultâneos")
+    parser.add_argument("--duracao", type=float, default=10.0, help="Segundos por medição")
+    args = parser.parse_args()
+    
+    print(f"🧪 Teste de carga /chat: {args.clientes} clientes, {args.threads} threads/worker, "
+          f"{args.duracao:.0f}s por medição ({os.cpu_count()} CPUs)")
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'erros':>6} {'reconexões':>11}")
+    
+    for workers in (int(w) for w in args.workers.split(",")):
+        r = medir(workers, args.threads, args.clientes, args.duracao)
+        print(f"{r['workers']:>8} {r['req_s']:>10.0f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['erros']:>6} {r['reconexoes']:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Fixtures compartilhadas dos testes
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+class FakeTelegram(ThreadingHTTPServer):
+    """API do Telegram local: registra cada sendMessage e responde como a real
+
+    `atraso` simula a latência da API; `respostas` enfileira status
+    diferentes de 200 (ex.: 429) para os próximos pedidos.
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _HandlerTelegram)
+        self.mensagens = []
+        self.conexoes = set()
+        self.atraso = 0.0
+        self.respostas = []
+        self._lock = threading.Lock()
+    
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class _HandlerTelegram(BaseHTTPRequestHandler):
+    # HTTP/1.1: o cliente pode manter a conexão entre envios (keep-alive)
+    protocol_version = "HTTP/1.1"
+    
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        servidor = self.server
+        with servidor._lock:
+            servidor.mensagens.append((self.path, corpo))
+            servidor.conexoes.add(self.client_address)
+            status, resposta = servidor.respostas.pop(0) if servidor.respostas else (200, {"ok": True})
+        
+        if servidor.atraso:
+            time.sleep(servidor.atraso)
+        
+        dados = json.dumps(resposta).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+    
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_telegram(monkeypatch):
+    """Servidor fake no ar e TELEGRAM_* apontando para ele"""
+    servidor = FakeTelegram()
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    
+    monkeypatch.setenv("TELEGRAM_API_URL", servidor.url)
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "123:teste")
+    monkeypatch.setenv("DR_JOSE_CHAT_ID", "111")
+    monkeypatch.setenv("ADMIN_CHAT_ID", "222")
+    monkeypatch.setenv("TELEGRAM_NOTIFICATIONS", "True")
+    
+    yield servidor
+    
+    servidor.shutdown()
+    servidor.server_close()
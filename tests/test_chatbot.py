@@ -0,0 +1,99 @@
+"""
+Testes do chatbot de triagem (rodar da raiz: python -m pytest tests/)
+"""
+
+import importlib
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import src.chatbot
+from src.detector_crise import detector_crise
+from src.respostas import CacheRespostas
+
+@pytest.mark.parametrize("modulo", ["src.chatbot", "src.intencoes", "src.respostas", "src.detector_crise"])
+def test_modulos_importaveis_como_pacote(modulo):
+    importlib.import_module(modulo)
+
+@pytest.mark.parametrize("texto", [
+    "Estou pensando em suicídio",
+    "QUERO MORRER",
+    "Não aguento mais viver assim",
+])
+def test_detector_crise_reconhece_frases(texto):
+    assert detector_crise.detectar(texto) is not None
+
+@pytest.mark.parametrize("texto", ["Olá, tudo bem?", "Meu nome é Maria Silva", "morreram de rir"])
+def test_detector_crise_ignora_frases_comuns(texto):
+    assert detector_crise.detectar(texto) is None
+
+def test_cache_respostas_normaliza_prompt_e_despeja_lru():
+    cache = CacheRespostas(max_itens=2)
+    cache.salvar("Estou  Ansioso", "resposta 1")
+    cache.salvar("outro prompt", "resposta 2")
+    
+    assert cache.get("estou ansioso") == "resposta 1"
+    cache.salvar("terceiro", "resposta 3")
+    
+    assert cache.get("outro prompt") is None
+    assert cache.metricas()["taxa_acerto"] == 0.5
+
+@pytest.mark.parametrize("campo, valor, critico", [
+    ("pensamentos_suicidas", True, True),
+    ("crises_panico", True, False),
+    ("ideacao_suicida", 2, False),
+    ("ideacao_suicida", 3, True),
+    # Tentativa: qualquer resposta torna a triagem urgente, mas só >= 3
+    # interrompe o questionário (limite_gravidade x limite_critico)
+    ("tentativa_suicidio", 1, True),
+    ("ansiedade", 4, False),
+])
+def test_sintomas_criticos_seguem_o_questionario(campo, valor, critico):
+    sintomas = src.chatbot.AvaliacaoSintomas(**{campo: valor})
+    
+    assert sintomas.sintomas_criticos is critico
+    assert src.chatbot.AvaliacaoCompacta.de_avaliacao(sintomas).sintomas_criticos is critico
+
+class AgendadorLento:
+    """AgendadorInferencia que só termina de montar quando `liberar` é setado"""
+    
+    liberar = threading.Event()
+    montando = threading.Event()
+    
+    def __init__(self, model, tokenizer, prefixo=""):
+        AgendadorLento.montando.set()
+        AgendadorLento.liberar.wait(5)
+    
+    def gerar(self, prompt, timeout=None):
+        return " resposta do modelo"
+
+def test_modelo_so_fica_pronto_depois_do_agendador(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MODEL_PRELOAD", "False")
+    monkeypatch.setattr(src.chatbot, "LLAMA_AVAILABLE", True)
+    monkeypatch.setattr(src.chatbot, "_MODELOS_CARREGADOS", {})
+    monkeypatch.setattr(src.chatbot, "importar_transformers", lambda: SimpleNamespace(
+        AutoTokenizer=SimpleNamespace(from_pretrained=lambda *a, **k: SimpleNamespace(pad_token="<pad>"))
+    ))
+    monkeypatch.setattr(src.chatbot, "importar_torch", lambda: SimpleNamespace(
+        cuda=SimpleNamespace(is_available=lambda: False)
+    ))
+    monkeypatch.setattr(src.chatbot, "carregar_modelo_cpu", lambda *a, **k: (object(), "float32"))
+    monkeypatch.setattr(src.chatbot, "AgendadorInferencia", AgendadorLento)
+    
+    bot = src.chatbot.LlamaTriagemBot(
+        "modelo-teste", db=src.chatbot.DatabaseManager(tmp_path / "triagem.db"), notificacoes=False
+    )
+    bot.carregar_modelo_em_segundo_plano()
+    assert AgendadorLento.montando.wait(5)
+    
+    # Aquecendo o KV-cache do preâmbulo: ainda não pronto, e gerar cai no fallback
+    assert not bot.status()["modelo_pronto"]
+    assert bot.gerar_resposta_llama("como funciona?") == bot.resposta_fallback("como funciona?")
+    
+    AgendadorLento.liberar.set()
+    assert bot.aguardar_modelo(5)
+    assert bot.estado_modelo == "pronto"
+    assert bot.gerar_resposta_llama("como funciona?") == "resposta do modelo"
+    bot.db.fechar()
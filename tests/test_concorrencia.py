@@ -0,0 +1,124 @@
+"""
+Estresse dos turnos concorrentes de processar_mensagem
+
+Várias threads disparam respostas do mesmo usuário ao mesmo tempo (clique
+duplo, retry do cliente) e muitos usuários respondem em paralelo; a sessão
+final tem de ser igual à de quem respondeu uma mensagem por vez. Banco
+temporário, sem Telegram e com respostas que não ativam o protocolo
+urgente. ESTRESSE_RODADAS aumenta as rajadas (ex.: 3000 para caçar a corrida).
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+
+import pytest
+
+from src.chatbot import DatabaseManager, LlamaTriagemBot
+from src.sessoes import LocksSessao
+
+ABERTURA = ["oi", "Ana Souza", "123.456.789-00 (11) 99999-9999"]
+# Dois motivos sim (nenhum crítico) e escala baixa: triagem LEVE
+RESPOSTAS = ["não"] * 8 + ["sim", "não", "não", "sim"] + ["1", "2", "0", "3", "1", "0", "0", "2", "1", "2"]
+RODADAS = int(os.getenv("ESTRESSE_RODADAS", "200"))
+RAJADA = 12
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MODEL_PRELOAD", "False")
+    monkeypatch.delenv("SESSOES_BACKEND", raising=False)
+    db = DatabaseManager(tmp_path / "triagem.db")
+    bot = LlamaTriagemBot(db=db, notificacoes=False)
+    yield bot
+    db.fechar()
+
+@pytest.fixture
+def trocas_frequentes():
+    """Trocas de thread frequentes deixam a corrida aparecer em poucas rodadas"""
+    anterior = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(anterior)
+
+def estado(bot: LlamaTriagemBot, user_id: str):
+    sessao = bot.sessoes[user_id]
+    return (sessao.etapa, sessao.pergunta_motivo_atual, sessao.pergunta_sintoma_atual, asdict(sessao.sintomas))
+
+def test_rajada_do_mesmo_usuario_avanca_uma_vez_por_mensagem(bot, trocas_frequentes):
+    for mensagem in ABERTURA + ["não"] * RAJADA:
+        bot.processar_mensagem(mensagem, "referencia")
+    esperado = estado(bot, "referencia")
+    
+    divergentes = []
+    # Uma thread por mensagem da rajada: a barreira precisa de todas ao mesmo tempo
+    with ThreadPoolExecutor(RAJADA) as pool:
+        for rodada in range(RODADAS):
+            user_id = f"rajada{rodada}"
+            for mensagem in ABERTURA:
+                bot.processar_mensagem(mensagem, user_id)
+            
+            barreira = threading.Barrier(RAJADA)
+            
+            def responder():
+                barreira.wait()
+                return bot.processar_mensagem("não", user_id)
+            
+            for futuro in [pool.submit(responder) for _ in range(RAJADA)]:
+                futuro.result()
+            
+            if estado(bot, user_id) != esperado:
+                divergentes.append(rodada)
+    
+    assert divergentes == []
+
+def test_muitos_usuarios_em_paralelo(bot, trocas_frequentes):
+    usuarios = 50
+    
+    def triagem(indice: int):
+        user_id = f"paralelo{indice}"
+        for mensagem in ABERTURA + RESPOSTAS:
+            resposta = bot.processar_mensagem(mensagem, user_id)
+        return resposta, estado(bot, user_id)
+    
+    with ThreadPoolExecutor(16) as pool:
+        finais = list(pool.map(triagem, range(usuarios)))
+    
+    assert all(final == finais[0] for final in finais)
+    assert "LEVE" in finais[0][0]
+    conn = bot.db.conexao()
+    assert conn.execute("SELECT COUNT(*) FROM triagens").fetchone()[0] == usuarios
+    assert conn.execute("SELECT COUNT(*) FROM notificacoes_outbox").fetchone()[0] == 0
+
+def test_locks_serializam_o_mesmo_usuario_e_contam_esperas():
+    locks = LocksSessao(listras=4)
+    dentro, liberar = threading.Event(), threading.Event()
+    ordem = []
+    
+    def primeiro():
+        with locks.travar("ana"):
+            dentro.set()
+            liberar.wait(5)
+            ordem.append("primeiro")
+    
+    def segundo():
+        with locks.travar("ana"):
+            ordem.append("segundo")
+    
+    thread_a = threading.Thread(target=primeiro)
+    thread_a.start()
+    assert dentro.wait(5)
+    thread_b = threading.Thread(target=segundo)
+    thread_b.start()
+    thread_b.join(0.1)
+    
+    # O segundo turno espera o primeiro terminar
+    assert ordem == []
+    liberar.set()
+    thread_a.join()
+    thread_b.join()
+    
+    assert ordem == ["primeiro", "segundo"]
+    assert locks.metricas() == {"listras": 4, "esperas": 1}
@@ -0,0 +1,126 @@
+"""
+Testes do DatabaseManager (sempre em bancos temporários)
+"""
+
+import datetime
+import json
+import sqlite3
+import threading
+from dataclasses import asdict
+
+import pytest
+
+from src.chatbot import (
+    COLUNAS_SINTOMAS_V4, AvaliacaoSintomas, DadosPaciente, DatabaseManager, GravidadeNivel,
+    TriagemResultado,
+)
+
+def triagem(cpf: str, nivel: GravidadeNivel = GravidadeNivel.LEVE, quando: datetime.datetime = None,
+            **sintomas) -> TriagemResultado:
+    return TriagemResultado(
+        paciente=DadosPaciente(nome="Paciente Teste", cpf=cpf),
+        sintomas=AvaliacaoSintomas(**sintomas),
+        nivel_gravidade=nivel,
+        recomendacoes=[],
+        acoes_imediatas=[],
+        data_triagem=quando or datetime.datetime.now()
+    )
+
+@pytest.fixture
+def db(tmp_path):
+    banco = DatabaseManager(tmp_path / "triagem.db")
+    yield banco
+    banco.fechar()
+
+def test_conexao_persistente_por_thread(db):
+    assert db.conexao() is db.conexao()
+    assert db.conexao().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    
+    outras = []
+    thread = threading.Thread(target=lambda: outras.append(db.conexao()))
+    thread.start()
+    thread.join()
+    assert outras[0] is not db.conexao()
+
+def test_buscar_triagem_anterior_devolve_a_mais_recente(db):
+    ontem = datetime.datetime.now() - datetime.timedelta(days=1)
+    db.salvar_triagem(triagem("11122233344", GravidadeNivel.INTENSO, ontem, ansiedade=4))
+    db.salvar_triagem(triagem("11122233344", GravidadeNivel.LEVE, tristeza=1))
+    
+    anterior = db.buscar_triagem_anterior("11122233344")
+    assert anterior["nivel_gravidade"] == "leve"
+    assert anterior["pontuacao_total"] == 1
+    assert db.buscar_triagem_anterior("00000000000") is None
+
+def test_gravacao_concorrente_sem_database_locked(db):
+    erros = []
+    
+    def gravar(indice: int):
+        try:
+            for _ in range(50):
+                db.salvar_triagem(triagem(f"{indice:011d}"))
+        except Exception as e:
+            erros.append(e)
+    
+    threads = [threading.Thread(target=gravar, args=(indice,)) for indice in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert erros == []
+    assert db.conexao().execute("SELECT COUNT(*) FROM triagens").fetchone()[0] == 400
+
+def test_migracoes_idempotentes(tmp_path):
+    caminho = tmp_path / "triagem.db"
+    DatabaseManager(caminho).fechar()
+    db = DatabaseManager(caminho)
+    versao = db.conexao().execute("PRAGMA user_version").fetchone()[0]
+    assert versao == DatabaseManager.MIGRACOES[-1][0]
+    db.fechar()
+
+def test_migracao_4_preenche_colunas_a_partir_do_json(tmp_path):
+    # Banco na versão 3: sintomas só no JSON
+    caminho = tmp_path / "triagem.db"
+    conn = sqlite3.connect(caminho)
+    for _, _, comandos in DatabaseManager.MIGRACOES[:3]:
+        for comando in comandos:
+            conn.execute(comando)
+    conn.execute("PRAGMA user_version = 3")
+    sintomas = [
+        AvaliacaoSintomas(crises_panico=True, ansiedade=3, insonia=4),
+        AvaliacaoSintomas(luto_recente=True, choro=2),
+    ]
+    with conn:
+        conn.executemany("""
+            INSERT INTO triagens (cpf, dados_paciente, sintomas, nivel_gravidade, pontuacao_total,
+                                  sintomas_criticos, motivos_positivos, data_triagem)
+            VALUES ('11122233344', '{}', ?, 'leve', 0, 0, 0, ?)
+        """, [(json.dumps(asdict(s)), datetime.datetime.now().isoformat()) for s in sintomas])
+    conn.close()
+    
+    db = DatabaseManager(caminho)
+    colunas = ", ".join(COLUNAS_SINTOMAS_V4)
+    linhas = db.conexao().execute(f"SELECT {colunas} FROM triagens ORDER BY id").fetchall()
+    assert linhas == [tuple(int(getattr(s, campo)) for campo in COLUNAS_SINTOMAS_V4) for s in sintomas]
+    db.fechar()
+
+def test_estatisticas_por_periodo_no_sqlite(db):
+    agora = datetime.datetime.now()
+    mes_passado = agora - datetime.timedelta(days=40)
+    db.salvar_triagem(triagem("1", GravidadeNivel.MODERADO, crises_panico=True, ansiedade=4))
+    db.salvar_triagem(triagem("2", GravidadeNivel.LEVE, crises_panico=True, ansiedade=2))
+    db.salvar_triagem(triagem("3", GravidadeNivel.LEVE, mes_passado, crises_panico=True))
+    
+    inicio = agora - datetime.timedelta(days=30)
+    assert db.contar_respostas("crises_panico", 1, inicio) == 2
+    assert db.contar_respostas("crises_panico") == 3
+    assert db.distribuicao_gravidade(inicio) == {"leve": 1, "moderado": 1, "intenso": 0, "urgente": 0}
+    
+    estatisticas = db.estatisticas_sintomas(inicio)
+    assert estatisticas["total"] == 2
+    assert estatisticas["motivos"]["crises_panico"] == 2
+    assert estatisticas["escala"]["ansiedade"] == {"media": 3.0, "distribuicao": [0, 0, 1, 0, 1]}
+    
+    with pytest.raises(ValueError):
+        db.contar_respostas("nivel_gravidade; DROP TABLE triagens")
@@ -0,0 +1,50 @@
+"""
+Orçamento de tempo de importação do chatbot (python -X importtime)
+
+Roda num processo novo, fora da raiz do repositório, para medir a importação
+a frio e conferir que ela não cria arquivos. O limite padrão fica bem acima
+do tempo atual (~0.15s) e bem abaixo do custo de importar transformers/torch
+(vários segundos); ajuste com IMPORTACAO_MAX_MS em máquinas lentas.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+ORCAMENTO_MS = float(os.getenv("IMPORTACAO_MAX_MS", "1000"))
+
+def importar_a_frio(modulo: str, cwd: Path):
+    """Importar `modulo` num interpretador novo; (módulos carregados, tempos em µs por módulo)"""
+    ambiente = dict(os.environ)
+    ambiente["PYTHONPATH"] = os.pathsep.join(filter(None, [str(RAIZ), ambiente.get("PYTHONPATH")]))
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys, {modulo}; print(' '.join(sys.modules))"],
+        cwd=cwd, env=ambiente, capture_output=True, text=True, check=True
+    )
+    
+    # Linhas "import time: self [us] | cumulative | imported package"
+    cumulativo = {}
+    for linha in processo.stderr.splitlines():
+        if linha.startswith("import time:") and "|" in linha:
+            _, total, nome = linha[len("import time:"):].split("|")
+            if total.strip().isdigit():
+                cumulativo[nome.strip()] = int(total)
+    return set(processo.stdout.split()), cumulativo
+
+def test_importar_chatbot_dentro_do_orcamento(tmp_path):
+    modulos, cumulativo = importar_a_frio("src.chatbot", tmp_path)
+    
+    milissegundos = cumulativo["src.chatbot"] / 1000
+    print(f"import src.chatbot: {milissegundos:.0f}ms (orçamento {ORCAMENTO_MS:.0f}ms)")
+    assert milissegundos < ORCAMENTO_MS
+    
+    # Dependências pesadas só entram quando o modelo/Telegram são usados
+    assert not modulos & {"torch", "transformers", "httpx"}
+
+def test_importar_chatbot_sem_efeitos_colaterais(tmp_path):
+    importar_a_frio("src.chatbot", tmp_path)
+    
+    # data/logs e o sink de arquivo só são criados por inicializar()
+    assert list(tmp_path.iterdir()) == []
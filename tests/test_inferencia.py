@@ -0,0 +1,193 @@
+"""
+Testes do AgendadorInferencia com um GPT-2 minúsculo montado na hora
+(pesos aleatórios, tokenizer treinado no próprio código; sem download)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.chatbot import PREAMBULO_TRIAGEM
+import src.inferencia
+from src.inferencia import AgendadorInferencia, carregar_modelo_cpu
+
+PROMPTS = [
+    f"{PREAMBULO_TRIAGEM}Usuário: {texto}\n\nResposta empática e profissional:"
+    for texto in ("Estou ansioso", "Não consigo dormir direito", "Oi", "Tenho crises de pânico no trabalho")
+]
+
+@pytest.fixture(scope="module")
+def modelo():
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+    
+    bpe = Tokenizer(models.BPE())
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator(
+        [(Path(__file__).parent.parent / "src" / "chatbot.py").read_text()],
+        trainers.BpeTrainer(vocab_size=500, special_tokens=["<|endoftext|>"],
+                            initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    )
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe, eos_token="<|endoftext|>")
+    
+    torch.manual_seed(0)
+    model = GPT2LMHeadModel(GPT2Config(
+        vocab_size=len(tokenizer), n_positions=512, n_embd=64, n_layer=2, n_head=2,
+        bos_token_id=0, eos_token_id=0
+    ))
+    model.eval()
+    return model, tokenizer
+
+def agendador_guloso(modelo, **opcoes) -> AgendadorInferencia:
+    """Agendador com decodificação gulosa, para as saídas serem comparáveis"""
+    model, tokenizer = modelo
+    agendador = AgendadorInferencia(model, tokenizer, max_novos_tokens=12, **opcoes)
+    agendador.parametros["do_sample"] = False
+    del agendador.parametros["temperature"]
+    return agendador
+
+def gerar_todos(agendador: AgendadorInferencia):
+    try:
+        with ThreadPoolExecutor(len(PROMPTS)) as executor:
+            return list(executor.map(agendador.gerar, PROMPTS))
+    finally:
+        agendador.parar()
+
+def test_lote_gera_o_mesmo_que_um_por_vez(modelo):
+    um_por_vez = agendador_guloso(modelo, max_lote=1)
+    em_lote = agendador_guloso(modelo, max_lote=len(PROMPTS), janela_ms=500)
+    
+    assert gerar_todos(em_lote) == gerar_todos(um_por_vez)
+    # Os pedidos simultâneos saíram num único generate() com padding
+    assert em_lote.metricas()["lotes"] == 1
+    assert um_por_vez.metricas()["lotes"] == len(PROMPTS)
+
+def test_cache_do_prefixo_nao_muda_a_saida(modelo, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_PREFIXO", "True")
+    sem_cache = agendador_guloso(modelo, max_lote=len(PROMPTS), janela_ms=500)
+    com_cache = agendador_guloso(modelo, max_lote=len(PROMPTS), janela_ms=500, prefixo=PREAMBULO_TRIAGEM)
+    
+    assert gerar_todos(com_cache) == gerar_todos(sem_cache)
+    
+    metricas_com, metricas_sem = com_cache.metricas(), sem_cache.metricas()
+    assert metricas_com["cache_prefixo"]
+    assert metricas_com["tokens_reaproveitados"] > 0
+    # Só o trecho depois do preâmbulo é codificado por pedido
+    assert metricas_com["tokens_prompt_por_pedido"] < metricas_sem["tokens_prompt_por_pedido"]
+
+def test_pedido_cancelado_antes_do_lote_e_descartado(modelo):
+    agendador = agendador_guloso(modelo, max_lote=2, janela_ms=300)
+    try:
+        cancelado = agendador.submeter(PROMPTS[0])
+        assert cancelado.cancel()
+        agendador.gerar(PROMPTS[1], timeout=30)
+    finally:
+        agendador.parar()
+    
+    assert agendador.metricas()["prompts"] == 1
+
+def test_timeout_cancela_o_pedido_na_fila(modelo, monkeypatch):
+    import threading
+    model, _ = modelo
+    generate = model.generate
+    ocupado, liberar = threading.Event(), threading.Event()
+    
+    def travar(*args, **kwargs):
+        ocupado.set()
+        liberar.wait(30)
+        return generate(*args, **kwargs)
+    
+    monkeypatch.setattr(model, "generate", travar)
+    agendador = agendador_guloso(modelo, max_lote=1)
+    try:
+        primeiro = agendador.submeter(PROMPTS[0])
+        assert ocupado.wait(30)
+        with pytest.raises(TimeoutError):
+            agendador.gerar(PROMPTS[1], timeout=0.05)
+        liberar.set()
+        primeiro.result(30)
+    finally:
+        liberar.set()
+        agendador.parar()
+    
+    # O pedido que esgotou o tempo não chegou a ser gerado
+    assert agendador.metricas()["prompts"] == 1
+
+def test_streaming_passa_pela_thread_do_agendador(modelo, monkeypatch):
+    import threading
+    model, _ = modelo
+    generate = model.generate
+    threads, simultaneos, pico = set(), [0], [0]
+    
+    def contar(*args, **kwargs):
+        threads.add(threading.current_thread().name)
+        simultaneos[0] += 1
+        pico[0] = max(pico[0], simultaneos[0])
+        try:
+            return generate(*args, **kwargs)
+        finally:
+            simultaneos[0] -= 1
+    
+    monkeypatch.setattr(model, "generate", contar)
+    agendador = agendador_guloso(modelo, max_lote=len(PROMPTS), janela_ms=200)
+    try:
+        with ThreadPoolExecutor(len(PROMPTS) + 1) as executor:
+            transmitido = executor.submit(lambda: "".join(agendador.transmitir(PROMPTS[0], timeout=30)))
+            em_lote = list(executor.map(agendador.gerar, PROMPTS))
+        esperado = agendador.gerar(PROMPTS[0], timeout=30)
+    finally:
+        agendador.parar()
+    
+    assert transmitido.result() == esperado == em_lote[0]
+    # Nenhum generate() fora do agendador nem em paralelo com outro
+    assert threads == {"inferencia-lotes"}
+    assert pico[0] == 1
+
+def test_erro_no_streaming_chega_ao_consumidor(modelo, monkeypatch):
+    model, _ = modelo
+    
+    def falhar(*args, **kwargs):
+        raise RuntimeError("sem memória")
+    
+    monkeypatch.setattr(model, "generate", falhar)
+    agendador = agendador_guloso(modelo)
+    try:
+        with pytest.raises(RuntimeError, match="sem memória"):
+            list(agendador.transmitir(PROMPTS[0], timeout=30))
+    finally:
+        agendador.parar()
+
+@pytest.fixture
+def modelo_salvo(modelo, tmp_path):
+    model, _ = modelo
+    model.save_pretrained(tmp_path)
+    return str(tmp_path)
+
+def test_cpu_carrega_em_float32_por_padrao(modelo_salvo, monkeypatch):
+    import torch
+    monkeypatch.delenv("LLM_MODO_CPU", raising=False)
+    
+    model, modo = carregar_modelo_cpu(modelo_salvo)
+    
+    assert modo == "float32"
+    assert next(model.parameters()).dtype == torch.float32
+
+def test_bfloat16_cai_para_float32_sem_suporte_da_cpu(modelo_salvo, monkeypatch):
+    import torch
+    monkeypatch.setattr(src.inferencia, "cpu_suporta_bf16", lambda: False)
+    
+    model, modo = carregar_modelo_cpu(modelo_salvo, "bfloat16")
+    
+    assert modo == "float32"
+    assert next(model.parameters()).dtype == torch.float32
+    
+    monkeypatch.setattr(src.inferencia, "cpu_suporta_bf16", lambda: True)
+    model, modo = carregar_modelo_cpu(modelo_salvo, "bfloat16")
+    assert modo == "bfloat16"
+    assert next(model.parameters()).dtype == torch.bfloat16
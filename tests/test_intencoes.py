@@ -0,0 +1,46 @@
+"""
+Testes do RoteadorIntencoes com as tabelas das interfaces demo
+"""
+
+import pytest
+
+from src.intencoes import RoteadorIntencoes
+
+pytest.importorskip("flask")
+
+from main_render import INTENCOES_DEMO
+
+@pytest.fixture(scope="module")
+def roteador():
+    return RoteadorIntencoes(INTENCOES_DEMO)
+
+@pytest.mark.parametrize("mensagem, intencao", [
+    # Flexões de risco não podem escapar da emergência
+    ("Estou pensando em suicídio", "emergencia"),
+    ("penso em mortes", "emergencia"),
+    ("eu mataria alguém", "emergencia"),
+    ("às vezes queria morrer", "emergencia"),
+    ("sinto que estou morrendo por dentro", "emergencia"),
+    ("ideação suicida", "emergencia"),
+    ("estou com muita tristeza", "dificuldades"),
+    ("ando deprimida", "dificuldades"),
+    ("fico preocupada com tudo", "dificuldades"),
+    # Emergência vence as intenções de menor prioridade
+    ("oi, estou triste e penso em morte", "emergencia"),
+    ("Boa   noite!", "saudacao"),
+    ("sinto dor nas costas", "dor"),
+    ("muito obrigada", "agradecimento"),
+])
+def test_classifica_pela_intencao_de_maior_prioridade(roteador, mensagem, intencao):
+    assert roteador.classificar(mensagem) == intencao
+
+@pytest.mark.parametrize("mensagem", ["noite", "foi tudo bem", "adoro o meu trabalho", "entristecido"])
+def test_palavras_inteiras_nao_casam_dentro_de_outras(roteador, mensagem):
+    assert roteador.classificar(mensagem) is None
+
+def test_radical_e_palavra_exata_na_mesma_tabela():
+    roteador = RoteadorIntencoes((("alta", ("dor*",)), ("baixa", ("dores",)), ("outra", ("do",))))
+    
+    assert roteador.classificar("tenho dores") == "alta"
+    assert roteador.classificar("do lado") == "outra"
+    assert roteador.classificar("adorei") is None
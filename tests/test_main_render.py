@@ -0,0 +1,60 @@
+"""
+Testes do app Flask de main_render.py (processo novo, pasta temporária)
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("flask")
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+def rodar(codigo: str, cwd: Path) -> str:
+    """Executar `codigo` num interpretador novo, contando as instâncias de
+    TriagemRender; devolve a última linha impressa"""
+    preparo = textwrap.dedent("""
+        import main_render
+        instancias = []
+        iniciar = main_render.TriagemRender.__init__
+        def contar(self, *args, **kwargs):
+            instancias.append(self)
+            iniciar(self, *args, **kwargs)
+        main_render.TriagemRender.__init__ = contar
+    """)
+    ambiente = dict(os.environ)
+    ambiente["PYTHONPATH"] = os.pathsep.join(filter(None, [str(RAIZ), ambiente.get("PYTHONPATH")]))
+    ambiente["MODEL_PRELOAD"] = "False"
+    for variavel in ("TELEGRAM_BOT_TOKEN", "HUGGINGFACE_TOKEN"):
+        ambiente.pop(variavel, None)
+    processo = subprocess.run(
+        [sys.executable, "-c", preparo + textwrap.dedent(codigo)],
+        cwd=cwd, env=ambiente, capture_output=True, text=True
+    )
+    assert processo.returncode == 0, processo.stderr
+    return processo.stdout.strip().splitlines()[-1]
+
+def test_importar_nao_cria_o_app(tmp_path):
+    assert rodar("print(len(instancias), main_render._app)", tmp_path) == "0 None"
+
+def test_factory_cria_uma_unica_instancia(tmp_path):
+    # O que `gunicorn "main_render:criar_app()"` faz
+    saida = rodar("""
+        app = main_render.criar_app()
+        print(len(instancias), main_render._app)
+    """, tmp_path)
+    assert saida == "1 None"
+
+def test_app_do_modulo_criado_no_primeiro_acesso(tmp_path):
+    # O que `gunicorn main_render:app` faz (getattr no módulo)
+    saida = rodar("""
+        app = getattr(main_render, "app")
+        assert main_render.app is app
+        assert main_render.triagem is app.config["TRIAGEM"]
+        print(len(instancias), app.test_client().get("/health").status_code)
+    """, tmp_path)
+    assert saida == "1 200"
@@ -0,0 +1,75 @@
+"""
+Testes da reclassificação em lote do histórico (sempre em bancos temporários)
+"""
+
+import itertools
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.chatbot import NIVEIS, DatabaseManager, GravidadeNivel, ProtocolosMedicos
+from tests.test_database import triagem
+
+LIMITES_NOVOS = (
+    (GravidadeNivel.URGENTE, 30, 8),
+    (GravidadeNivel.INTENSO, 22, 6),
+    (GravidadeNivel.MODERADO, 14, 4),
+)
+
+@pytest.mark.parametrize("limites", [None, LIMITES_NOVOS])
+def test_classificar_lote_igual_a_determinar_gravidade(limites):
+    combinacoes = list(itertools.product(range(41), range(13), (False, True)))
+    pontuacao, motivos, criticos = (np.array(coluna) for coluna in zip(*combinacoes))
+    
+    lote = ProtocolosMedicos.classificar_lote(pontuacao, motivos, criticos, limites)
+    
+    esperado = [
+        NIVEIS.index(ProtocolosMedicos.determinar_gravidade(SimpleNamespace(
+            pontuacao_total=pontos, contagem_motivos_positivos=positivos, sintomas_criticos=critico
+        ), limites))
+        for pontos, positivos, critico in combinacoes
+    ]
+    assert lote.tolist() == esperado
+
+@pytest.fixture
+def db(tmp_path):
+    banco = DatabaseManager(tmp_path / "triagem.db")
+    # 15 pontos: LEVE pelos limites atuais (16), MODERADO pelos novos (14)
+    banco.salvar_triagem(triagem("11111111111", GravidadeNivel.LEVE, ansiedade=4, tristeza=4,
+                                 irritabilidade=4, insonia=3))
+    banco.salvar_triagem(triagem("22222222222", GravidadeNivel.LEVE, tristeza=1))
+    yield banco
+    banco.fechar()
+
+def niveis(db):
+    return [nivel for nivel, in db.conexao().execute("SELECT nivel_gravidade FROM triagens ORDER BY id")]
+
+def test_reclassificar_simulacao_nao_grava(db):
+    relatorio = db.reclassificar_triagens(LIMITES_NOVOS, aplicar=False)
+    
+    assert relatorio["alteradas"] == 1
+    assert relatorio["matriz"]["leve"] == {"leve": 1, "moderado": 1}
+    assert niveis(db) == ["leve", "leve"]
+
+def test_reclassificar_aplica_so_as_alteradas(db):
+    relatorio = db.reclassificar_triagens(LIMITES_NOVOS, aplicar=True)
+    
+    assert relatorio["depois"]["moderado"] == 1
+    assert niveis(db) == ["moderado", "leve"]
+    assert db.reclassificar_triagens(LIMITES_NOVOS, aplicar=False)["alteradas"] == 0
+
+def test_sintetico_exige_db(tmp_path):
+    # cwd temporário: se a checagem falhar, o banco padrão é criado lá
+    script = Path(__file__).parent.parent / "reclassificar_triagens.py"
+    processo = subprocess.run(
+        [sys.executable, str(script), "--sintetico", "10"],
+        cwd=tmp_path, capture_output=True, text=True
+    )
+    
+    assert processo.returncode == 2
+    assert "--sintetico exige --db" in processo.stderr
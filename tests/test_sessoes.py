@@ -0,0 +1,190 @@
+"""
+Testes dos armazéns de sessão; o backend Redis roda contra um servidor local
+que fala o protocolo RESP (sem Redis instalado)
+"""
+
+import socketserver
+import threading
+import time
+
+import pytest
+
+from src.chatbot import EtapaTriagem, SessaoTriagem
+from src.sessoes import (
+    ArmazemSessoes, ArmazemSessoesExterno, BackendRedis, BackendSessoes, BackendSQLite,
+)
+
+class RedisLocal(socketserver.ThreadingTCPServer):
+    """Subconjunto do Redis usado pelo BackendRedis: AUTH, SELECT, GET, SET EX, DEL, SCAN"""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, senha: str = None):
+        super().__init__(("127.0.0.1", 0), _HandlerRedis)
+        self.senha = senha
+        self.bancos = {}          # db -> {chave: (valor, expira_em)}
+        self.comandos = []
+        self._lock = threading.Lock()
+    
+    @property
+    def url(self) -> str:
+        credencial = f":{self.senha}@" if self.senha else ""
+        return f"redis://{credencial}127.0.0.1:{self.server_address[1]}/2"
+    
+    def fechar_conexoes(self):
+        """Derrubar os clientes conectados (simula reinício do servidor)"""
+        for handler in list(_HandlerRedis.ativos):
+            handler.request.close()
+
+class _HandlerRedis(socketserver.StreamRequestHandler):
+    ativos = set()
+    
+    def handle(self):
+        _HandlerRedis.ativos.add(self)
+        autenticado = self.server.senha is None
+        db = 0
+        try:
+            while True:
+                comando = self._ler_comando()
+                if comando is None:
+                    return
+                nome, args = comando[0].upper(), comando[1:]
+                with self.server._lock:
+                    self.server.comandos.append(nome)
+                
+                if nome == b"AUTH":
+                    autenticado = args[0].decode() == self.server.senha
+                    self._responder(b"+OK\r\n" if autenticado else b"-WRONGPASS invalid password\r\n")
+                elif not autenticado:
+                    self._responder(b"-NOAUTH Authentication required.\r\n")
+                elif nome == b"SELECT":
+                    db = int(args[0])
+                    self._responder(b"+OK\r\n")
+                else:
+                    self._responder(self._executar(nome, args, db))
+        except OSError:
+            pass
+        finally:
+            _HandlerRedis.ativos.discard(self)
+    
+    def _ler_comando(self):
+        linha = self.rfile.readline()
+        if not linha:
+            return None
+        partes = []
+        for _ in range(int(linha[1:-2])):
+            tamanho = int(self.rfile.readline()[1:-2])
+            partes.append(self.rfile.read(tamanho + 2)[:-2])
+        return partes
+    
+    def _responder(self, dados: bytes):
+        self.wfile.write(dados)
+    
+    def _executar(self, nome: bytes, args, db: int) -> bytes:
+        agora = time.time()
+        with self.server._lock:
+            banco = self.server.bancos.setdefault(db, {})
+            for chave in [c for c, (_, expira) in banco.items() if expira <= agora]:
+                del banco[chave]
+            
+            if nome == b"GET":
+                valor = banco.get(args[0])
+                return b"$-1\r\n" if valor is None else b"$%d\r\n%s\r\n" % (len(valor[0]), valor[0])
+            if nome == b"SET":
+                assert args[2].upper() == b"EX"
+                banco[args[0]] = (args[1], agora + int(args[3]))
+                return b"+OK\r\n"
+            if nome == b"DEL":
+                return b":%d\r\n" % int(banco.pop(args[0], None) is not None)
+            if nome == b"SCAN":
+                prefixo = args[args.index(b"MATCH") + 1].rstrip(b"*")
+                chaves = [c for c in banco if c.startswith(prefixo)]
+                corpo = b"".join(b"$%d\r\n%s\r\n" % (len(c), c) for c in chaves)
+                return b"*2\r\n$1\r\n0\r\n*%d\r\n%s" % (len(chaves), corpo)
+        return b"-ERR unknown command\r\n"
+
+@pytest.fixture
+def redis_local():
+    servidor = RedisLocal(senha="segredo")
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return BackendSQLite(tmp_path / "sessoes.db")
+    return BackendRedis(request.getfixturevalue("redis_local").url)
+
+def test_backend_sessoes_e_abstrato():
+    with pytest.raises(TypeError):
+        BackendSessoes()
+
+def test_backend_grava_le_conta_e_remove(backend):
+    assert backend.carregar("ana") is None
+    backend.salvar("ana", b"\x00\x01dados", 60)
+    backend.salvar("bia", b"outra", 60)
+    
+    assert backend.carregar("ana") == b"\x00\x01dados"
+    assert backend.contar() == 2
+    
+    backend.remover("ana")
+    assert backend.carregar("ana") is None
+    assert backend.contar() == 1
+
+def test_backend_expira_sessoes(backend):
+    backend.salvar("ana", b"dados", 1)
+    time.sleep(1.1)
+    assert backend.carregar("ana") is None
+
+def test_redis_autentica_e_seleciona_o_banco(redis_local):
+    BackendRedis(redis_local.url).salvar("ana", b"dados", 60)
+    
+    assert redis_local.comandos[:2] == [b"AUTH", b"SELECT"]
+    assert list(redis_local.bancos[2]) == [b"triagem:sessao:ana"]
+
+def test_redis_reconecta_depois_de_queda(redis_local):
+    backend = BackendRedis(redis_local.url)
+    backend.salvar("ana", b"dados", 60)
+    
+    redis_local.fechar_conexoes()
+    
+    assert backend.carregar("ana") == b"dados"
+
+def test_progresso_compartilhado_entre_workers(redis_local):
+    """Dois armazéns no mesmo backend: o segundo worker continua de onde o primeiro parou"""
+    worker_a, worker_b = (
+        ArmazemSessoesExterno(BackendRedis(redis_local.url), SessaoTriagem.para_bytes, SessaoTriagem.de_bytes)
+        for _ in range(2)
+    )
+    
+    sessao = SessaoTriagem()
+    sessao.etapa = EtapaTriagem.SINTOMAS_ESCALA
+    sessao.pergunta_motivo_atual = 12
+    sessao.pergunta_sintoma_atual = 3
+    sessao.paciente.nome = "Ana Souza"
+    sessao.sintomas.crises_panico = True
+    sessao.sintomas.ansiedade = 4
+    worker_a.salvar("ana", sessao)
+    
+    recebida = worker_b["ana"]
+    assert recebida.etapa == EtapaTriagem.SINTOMAS_ESCALA
+    assert (recebida.pergunta_motivo_atual, recebida.pergunta_sintoma_atual) == (12, 3)
+    assert recebida.paciente.nome == "Ana Souza"
+    assert recebida.sintomas.crises_panico and recebida.sintomas.ansiedade == 4
+    
+    recebida.pergunta_sintoma_atual = 4
+    worker_b.salvar("ana", recebida)
+    assert worker_a["ana"].pergunta_sintoma_atual == 4
+
+def test_armazem_em_memoria_despeja_lru():
+    armazem = ArmazemSessoes(max_sessoes=2, ttl_segundos=60)
+    armazem["a"], armazem["b"] = "sessao a", "sessao b"
+    armazem.get("a")
+    armazem["c"] = "sessao c"
+    
+    assert "b" not in armazem and "a" in armazem and "c" in armazem
+    assert armazem.despejos_lru == 1
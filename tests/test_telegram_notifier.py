@@ -0,0 +1,162 @@
+"""
+Testes do TelegramNotifier e da outbox contra uma API do Telegram local
+(tests/conftest.py)
+"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from src.chatbot import DatabaseManager
+from src.telegram_notifier import EntregadorOutbox, TelegramNotifier
+
+CASO = {
+    "paciente": {"nome": "Ana Souza", "cpf": "12345678900", "telefone": "11999999999"},
+    "sintomas": {"pontuacao_total": 30, "sintomas_criticos": True},
+    "nivel_gravidade": "urgente",
+}
+
+def test_alerta_urgente_envia_para_os_dois_destinos_em_paralelo(fake_telegram):
+    fake_telegram.atraso = 0.2
+    notifier = TelegramNotifier()
+    
+    async def alertar():
+        try:
+            inicio = time.perf_counter()
+            sucesso = await notifier.notificar_caso_urgente(CASO)
+            return sucesso, time.perf_counter() - inicio
+        finally:
+            await notifier.fechar()
+    
+    sucesso, latencia = asyncio.run(alertar())
+    
+    assert sucesso
+    assert sorted(corpo["chat_id"] for _, corpo in fake_telegram.mensagens) == ["111", "222"]
+    assert all(caminho == "/bot123:teste/sendMessage" for caminho, _ in fake_telegram.mensagens)
+    # Em sequência seriam 2 x 0.2s; em paralelo, uma latência da API só
+    assert latencia < 0.35, f"latência por alerta: {latencia * 1000:.0f}ms"
+
+def test_cliente_reaproveita_conexoes_entre_alertas(fake_telegram):
+    notifier = TelegramNotifier()
+    latencias = []
+    
+    async def alertar(vezes: int):
+        try:
+            for _ in range(vezes):
+                inicio = time.perf_counter()
+                assert await notifier.notificar_caso_urgente(CASO)
+                latencias.append(time.perf_counter() - inicio)
+        finally:
+            await notifier.fechar()
+    
+    asyncio.run(alertar(10))
+    
+    assert len(fake_telegram.mensagens) == 20
+    # Keep-alive: no máximo uma conexão por destino enviado em paralelo
+    assert len(fake_telegram.conexoes) <= 2
+    latencias.sort()
+    print(f"latência por alerta: p50 {latencias[5] * 1000:.1f}ms, máx {latencias[-1] * 1000:.1f}ms")
+
+def test_429_informa_retry_after(fake_telegram):
+    fake_telegram.respostas.append((429, {"ok": False, "parameters": {"retry_after": 7}}))
+    notifier = TelegramNotifier()
+    
+    async def enviar():
+        try:
+            return await notifier.enviar_mensagem_detalhado("111", "teste")
+        finally:
+            await notifier.fechar()
+    
+    resultado = asyncio.run(enviar())
+    
+    assert not resultado.sucesso
+    assert resultado.retry_after == 7
+    assert not resultado.definitivo
+
+def test_erro_4xx_e_definitivo(fake_telegram):
+    fake_telegram.respostas.append((400, {"ok": False, "description": "chat not found"}))
+    notifier = TelegramNotifier()
+    
+    async def enviar():
+        try:
+            return await notifier.enviar_mensagem_detalhado("111", "teste")
+        finally:
+            await notifier.fechar()
+    
+    resultado = asyncio.run(enviar())
+    
+    assert not resultado.sucesso
+    assert resultado.definitivo
+
+def status_outbox(db):
+    return db.conexao().execute("SELECT chat_id, status FROM notificacoes_outbox ORDER BY id").fetchall()
+
+def test_outbox_entrega_urgente_antes_do_relatorio(fake_telegram, tmp_path):
+    db = DatabaseManager(tmp_path / "triagem.db")
+    notifier = TelegramNotifier()
+    entregador = EntregadorOutbox(notifier, db)
+    
+    db.enfileirar_notificacoes([("111", "relatório")], EntregadorOutbox.PRIORIDADES["relatorio"])
+    db.enfileirar_notificacoes(notifier.mensagens_caso_urgente(CASO), EntregadorOutbox.PRIORIDADES["urgente"])
+    
+    async def drenar():
+        try:
+            entregador.LOTE = 1
+            while await entregador.drenar():
+                pass
+        finally:
+            await notifier.fechar()
+    
+    asyncio.run(drenar())
+    
+    textos = [corpo["text"] for _, corpo in fake_telegram.mensagens]
+    assert textos[-1] == "relatório"
+    assert [status for _, status in status_outbox(db)] == ["enviada"] * 3
+    assert db.relatorio_diario()["notificacoes"] == 3
+    db.fechar()
+
+def test_outbox_sem_token_marca_simulada(monkeypatch, tmp_path):
+    monkeypatch.delenv("TELEGRAM_BOT_TOKEN", raising=False)
+    monkeypatch.setenv("DR_JOSE_CHAT_ID", "111")
+    db = DatabaseManager(tmp_path / "triagem.db")
+    notifier = TelegramNotifier()
+    entregador = EntregadorOutbox(notifier, db)
+    
+    db.enfileirar_notificacoes(notifier.mensagens_caso_intenso(CASO), EntregadorOutbox.PRIORIDADES["intenso"])
+    assert asyncio.run(entregador.drenar()) == 1
+    
+    assert status_outbox(db) == [("111", "simulada")]
+    # Relatório diário não conta mensagens que não saíram
+    assert db.relatorio_diario()["notificacoes"] == 0
+    db.fechar()
+
+def test_protocolo_urgente_entra_no_consolidado_do_dia(fake_telegram, tmp_path, monkeypatch):
+    import src.telegram_notifier
+    from src.chatbot import LlamaTriagemBot
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MODEL_PRELOAD", "False")
+    monkeypatch.setattr(src.telegram_notifier, "_telegram_notifier", None)
+    db = DatabaseManager(tmp_path / "triagem.db")
+    bot = LlamaTriagemBot(db=db)
+    try:
+        bot.processar_mensagem("oi", "ana")
+        assert "PROTOCOLO DE EMERGÊNCIA" in bot.processar_mensagem("QUERO MORRER", "ana")
+        
+        relatorio = db.relatorio_diario()
+        assert (relatorio["urgente"], relatorio["total"]) == (1, 1)
+        # Alertas gravados com a triagem, na mesma transação
+        assert db.conexao().execute(
+            "SELECT COUNT(*) FROM notificacoes_outbox WHERE triagem_id IS NOT NULL"
+        ).fetchone()[0] == 2
+        
+        prazo = time.monotonic() + 5
+        while db.relatorio_diario()["notificacoes"] < 2 and time.monotonic() < prazo:
+            time.sleep(0.05)
+        assert db.relatorio_diario()["notificacoes"] == 2
+    finally:
+        bot.agendador_relatorio.parar()
+        bot.entregador.parar()
+        db.fechar()